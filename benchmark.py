@@ -0,0 +1,170 @@
+"""
+Benchmark suite for the signal pipeline. Synthetic recordings of 10, 100 and 1000 pairs are replayed through the full pipeline (candle store update,
+kline parsing, indicators, confirmations and scoring, see data.replay), and for each size the script reports:
+
+- the throughput of the steady-state cycles in pair-candles per second,
+- the latency of every stage per cycle (the mean and the 95th percentile over the cycles, summing the per-pair calls of a stage within a cycle),
+- the duration of the first cycle, which backfills the store and builds the indicator state from the full history,
+- the peak memory traced by tracemalloc (measured in a separate pass, since tracing slows everything down).
+
+The results are compared against the baselines stored in benchmark_baselines.json, and the script exits with status 1 if the throughput dropped
+or the peak memory grew by more than the tolerance. Baselines depend on the machine, so store them again with --save-baseline when switching
+machines.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --pairs 10 100 --cycles 5 --mode panel
+    python benchmark.py --pairs 1000 --screen --higher-timeframes 4h 1d
+    python benchmark.py --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from data.engine import SignalEngine
+from data.metrics import metrics
+from data.replay import Replayer, write_synthetic_recording
+
+BASELINES_PATH = "./benchmark_baselines.json"
+
+# A benchmark is a regression if its throughput drops, or its peak memory grows, by more than this fraction of the baseline
+REGRESSION_TOLERANCE = 0.2
+
+
+def replay(n_pairs: int, timeframe: str, history: int, cycles: int, indicator_mode: str, higher_timeframes: list, screen_pairs: bool = False) -> \
+        Tuple[float, List[Dict[str, float]]]:
+    """
+    Replay a synthetic recording of n_pairs pairs. The metrics are reset after the first cycle, so they only hold the steady-state cycles
+    afterwards.
+
+    Returns:
+        tuple: The duration of the first cycle, and the total seconds of every stage in each steady-state cycle.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recording_dir = os.path.join(tmp_dir, "recording")
+        pairs = [f"PAIR{i:04d}USDT" for i in range(n_pairs)]
+        write_synthetic_recording(recording_dir, pairs, timeframe, history + cycles + 1)
+
+        engine = SignalEngine(timeframe, higher_timeframes, indicator_mode, screen_pairs=screen_pairs)
+        replayer = Replayer(recording_dir, timeframe, engine=engine, candle_history_size=history, candle_store_dir=os.path.join(tmp_dir, "store"))
+
+        first_cycle = {}
+        cycle_stages = []
+        previous_totals = {}
+
+        def on_cycle(cycle_time, scored_pairs):
+            if not first_cycle:
+                first_cycle["seconds"] = metrics.stage_totals["cycle"][1]
+                metrics.reset()
+                return
+
+            # The stage totals are cumulative, so the difference to the previous cycle is the time spent in this cycle
+            totals = {stage: total for stage, (_, total) in metrics.stage_totals.items()}
+            cycle_stages.append({stage: total - previous_totals.get(stage, 0.0) for stage, total in totals.items()})
+            previous_totals.update(totals)
+
+        metrics.reset()
+        asyncio.run(replayer.run(on_cycle, max_cycles=cycles + 1))
+
+    return first_cycle["seconds"], cycle_stages
+
+
+def run_benchmark(n_pairs: int, timeframe: str, history: int, cycles: int, indicator_mode: str, higher_timeframes: list,
+                  screen_pairs: bool = False) -> dict:
+    metrics.summary_window = n_pairs * cycles * (len(higher_timeframes) + 1)
+    first_cycle_seconds, cycle_stages = replay(n_pairs, timeframe, history, cycles, indicator_mode, higher_timeframes, screen_pairs)
+
+    n_cycles, total_seconds = metrics.stage_totals["cycle"]
+    stages = {}
+    for stage in metrics.stage_totals:
+        samples = np.array([stage_seconds.get(stage, 0.0) for stage_seconds in cycle_stages]) * 1000
+        stages[stage] = {"per_cycle_ms": round(float(samples.mean()), 3), "p95_ms": round(float(np.percentile(samples, 95)), 3)}
+
+    tracemalloc.start()
+    replay(n_pairs, timeframe, history, 1, indicator_mode, higher_timeframes, screen_pairs)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "pairs": n_pairs,
+        "cycles": n_cycles,
+        "throughput": round(n_pairs * n_cycles / total_seconds, 1),
+        "first_cycle_s": round(first_cycle_seconds, 3),
+        "peak_memory_mb": round(peak_bytes / 2 ** 20, 1),
+        "stages": stages
+    }
+
+
+def compare(results: dict, baselines: dict) -> list:
+    """
+    Return a description of every result that regressed against its baseline.
+    """
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None:
+            continue
+
+        if result["throughput"] < baseline["throughput"] * (1 - REGRESSION_TOLERANCE):
+            regressions.append(f"{key}: throughput {result['throughput']} pair-candles/s, baseline {baseline['throughput']}")
+        if result["peak_memory_mb"] > baseline["peak_memory_mb"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{key}: peak memory {result['peak_memory_mb']} MB, baseline {baseline['peak_memory_mb']}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the signal pipeline on replayed synthetic candles.")
+    parser.add_argument("--pairs", type=int, nargs="+", default=[10, 100, 1000], help="The pair counts to benchmark.")
+    parser.add_argument("--cycles", type=int, default=10, help="The number of steady-state cycles replayed.")
+    parser.add_argument("--history", type=int, default=500, help="The number of candles stored for each pair.")
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--higher-timeframes", nargs="*", default=[], help="Higher timeframes derived from the base candles, e.g. 4h 1d.")
+    parser.add_argument("--mode", choices=["streaming", "panel"], default="streaming", help="The indicator mode.")
+    parser.add_argument("--screen", action="store_true", help="Screen the pairs before evaluating the higher timeframes and scoring them.")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="The baselines file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baselines.")
+    args = parser.parse_args()
+
+    results = {}
+    for n_pairs in args.pairs:
+        key = f"{args.mode}{'+screen' if args.screen else ''}/{args.timeframe}+{','.join(args.higher_timeframes) or '-'}/{n_pairs}_pairs"
+        start = time.perf_counter()
+        results[key] = run_benchmark(n_pairs, args.timeframe, args.history, args.cycles, args.mode, args.higher_timeframes, args.screen)
+
+        result = results[key]
+        print(f"{key} ({time.perf_counter() - start:.1f}s)")
+        print(f"    throughput: {result['throughput']} pair-candles/s, first cycle: {result['first_cycle_s']}s, "
+              f"peak memory: {result['peak_memory_mb']} MB")
+        for stage, timings in result["stages"].items():
+            print(f"    {stage:<16} {timings['per_cycle_ms']:10.2f} ms/cycle   p95 {timings['p95_ms']:9.3f} ms/cycle")
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as baselines_file:
+            baselines = json.load(baselines_file)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baselines, "w") as baselines_file:
+            json.dump(baselines, baselines_file, indent=4)
+        print(f"Baselines saved to {args.baselines}")
+        return
+
+    regressions = compare(results, baselines)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Vectorized historical backtester. The indicators, every confirmation check, the weighted score and the signal confidence are computed for every
+candle of every pair in a few array operations, instead of replaying the live pipeline candle by candle. A signal is taken whenever the confidence
+category is "Strong Bullish" or "Strong Bearish", like in the live pipeline, and is held for a fixed number of candles.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from data.confirmations import confirmation_series, get_checks, required_indicator_columns
+from data.indicators.panel import CandlePanel, compute_panel_indicators
+from data.indicators.streaming import required_indicators
+from data.scoring import SIGNAL_TYPE_CODES, signal_confidence_series, weighted_score_series
+
+
+class BacktestResult:
+    def __init__(self, pairs: List[str], confirmations: Dict[str, np.ndarray], score: np.ndarray, confidence: Dict[str, np.ndarray],
+                 direction: np.ndarray, forward_returns: np.ndarray, trade_returns: np.ndarray):
+        """
+        All arrays are (pairs x candles).
+
+        Args:
+            pairs (list): The pair of each row of the arrays.
+            confirmations (dict): The confirmation value arrays, keyed by confirmation name.
+            score (np.ndarray): The weighted score.
+            confidence (dict): The signal confidence metric arrays.
+            direction (np.ndarray): 1 for a long entry, -1 for a short entry and 0 where no trade is entered.
+            forward_returns (np.ndarray): The return from the close of each candle to the close holding_period candles later.
+            trade_returns (np.ndarray): The net return of each trade at its entry candle, NaN where no trade is entered.
+        """
+        self.pairs = pairs
+        self.confirmations = confirmations
+        self.score = score
+        self.confidence = confidence
+        self.direction = direction
+        self.forward_returns = forward_returns
+        self.trade_returns = trade_returns
+
+    def stats(self) -> pd.DataFrame:
+        """
+        Summarize the trades of every pair, plus an "ALL" row over all pairs.
+
+        Returns:
+            pd.DataFrame: The number of trades, the hit rate, the mean and total trade return and the information coefficient (the correlation
+            between the weighted score and the forward returns) per pair.
+        """
+        rows = {}
+        for i, pair in enumerate(self.pairs):
+            rows[pair] = self._summarize(self.direction[i], self.trade_returns[i], self.score[i], self.forward_returns[i])
+        rows["ALL"] = self._summarize(self.direction.ravel(), self.trade_returns.ravel(), self.score.ravel(), self.forward_returns.ravel())
+
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    @staticmethod
+    def _summarize(direction: np.ndarray, trade_returns: np.ndarray, score: np.ndarray, forward_returns: np.ndarray) -> dict:
+        traded = ~np.isnan(trade_returns)
+        returns = trade_returns[traded]
+
+        valid = ~np.isnan(score) & ~np.isnan(forward_returns)
+        score_ic = np.nan
+        if valid.sum() > 1 and np.std(score[valid]) > 0 and np.std(forward_returns[valid]) > 0:
+            score_ic = float(np.corrcoef(score[valid], forward_returns[valid])[0, 1])
+
+        return {
+            "trades": int(traded.sum()),
+            "long_trades": int((direction[traded] > 0).sum()),
+            "short_trades": int((direction[traded] < 0).sum()),
+            "hit_rate": float((returns > 0).mean()) if len(returns) else np.nan,
+            "mean_return": float(returns.mean()) if len(returns) else np.nan,
+            "total_return": float(returns.sum()),
+            "score_ic": score_ic
+        }
+
+
+def run_backtest(panel: CandlePanel, weights=None, recent_window_size: int = 5, holding_period: int = 24, fee: float = 0.0,
+                 entries_only_on_change: bool = True, indicator_params: dict = None) -> BacktestResult:
+    """
+    Backtest the confirmation and scoring pipeline over every candle of a panel.
+
+    Args:
+        panel (CandlePanel): The candles of the pairs to backtest.
+        weights (dict, optional): The group and indicator weights used for the weighted score. Defaults to scoring.indicator_weights.
+        recent_window_size (int): The window the crossover checks look back over.
+        holding_period (int): The number of candles each trade is held for.
+        fee (float): The round-trip fee subtracted from the return of each trade, as a fraction (e.g. 0.002 for 0.2%).
+        entries_only_on_change (bool): Only enter a trade on the candle a strong signal appears, instead of on every candle it persists. This
+            matches the live pipeline, which only alerts when the set of signals changes.
+        indicator_params (dict, optional): Keyword arguments passed to compute_panel_indicators() to override the indicator periods.
+
+    Returns:
+        BacktestResult: The per-candle confirmations, scores, confidence metrics and trades.
+    """
+    enabled_indicators = required_indicators(required_indicator_columns(get_checks()))
+    indicators = compute_panel_indicators(panel.high, panel.low, panel.close, indicators=enabled_indicators, **(indicator_params or {}))
+    confirmations = confirmation_series(indicators, panel.high, panel.low, panel.close, recent_window_size)
+
+    score, _ = weighted_score_series(confirmations, weights)
+    confidence = signal_confidence_series(confirmations)
+
+    return evaluate_trades(panel, confirmations, score, confidence, holding_period, fee, entries_only_on_change)
+
+
+def evaluate_trades(panel: CandlePanel, confirmations: Dict[str, np.ndarray], score: np.ndarray, confidence: Dict[str, np.ndarray],
+                    holding_period: int = 24, fee: float = 0.0, entries_only_on_change: bool = True) -> BacktestResult:
+    """
+    Turn the per-candle signal confidence into trades and their returns. Split out of run_backtest() so scores computed with different weights can
+    be evaluated without recomputing the indicators and confirmations.
+    """
+    signal_type = confidence["signal_type"]
+    direction = np.zeros(signal_type.shape, dtype=np.int8)
+    direction[signal_type == SIGNAL_TYPE_CODES["Strong Bullish"]] = 1
+    direction[signal_type == SIGNAL_TYPE_CODES["Strong Bearish"]] = -1
+
+    if entries_only_on_change:
+        previous_direction = np.zeros_like(direction)
+        previous_direction[:, 1:] = direction[:, :-1]
+        direction[direction == previous_direction] = 0
+
+    forward_returns = np.full(panel.close.shape, np.nan)
+    if panel.close.shape[1] > holding_period:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            forward_returns[:, :-holding_period] = panel.close[:, holding_period:] / panel.close[:, :-holding_period] - 1
+
+    trade_returns = np.where(direction != 0, direction * forward_returns - fee, np.nan)
+
+    return BacktestResult(panel.pairs, confirmations, score, confidence, direction, forward_returns, trade_returns)
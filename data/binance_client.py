@@ -0,0 +1,201 @@
+"""
+Long-lived HTTP client for the Binance REST API. All requests share one pooled keep-alive session and are capped by a concurrency semaphore. The
+request weight of the current minute is tracked from the X-MBX-USED-WEIGHT-1M response headers, and requests wait for the next minute once the
+weight budget is used up instead of getting the IP banned. The weight of an endpoint is only an estimate reserved while the request is in flight:
+once it's answered, the used weight Binance reports takes its place. Rate-limit (429/418) and server (5xx) errors, as well as connection errors,
+are retried with exponential backoff.
+"""
+import asyncio
+import time
+from typing import Optional
+
+import aiohttp
+
+from data.metrics import metrics
+
+BINANCE_API_URL = "https://api.binance.com"
+
+# The maximum number of candles the klines endpoint returns per request
+KLINES_LIMIT = 1000
+# The request weight of the klines endpoint, which no longer depends on the limit
+KLINES_WEIGHT = 2
+
+
+class BinanceAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Binance API error {status}: {message}")
+        self.status = status
+
+
+class BinanceClient:
+    # The exception raised for failed requests, and the counter the request weight is added to. Clients of other exchanges that share the request
+    # handling of this class override them.
+    error_class = BinanceAPIError
+    weight_counter = "api_weight_total"
+
+    def __init__(self, base_url: str = BINANCE_API_URL, max_concurrency: int = 10, weight_limit: int = 6000, weight_margin: float = 0.9,
+                 max_retries: int = 5, backoff_base: float = 1.0, max_backoff: float = 60, timeout: float = 30):
+        """
+        Args:
+            base_url (str): The base URL of the REST API.
+            max_concurrency (int): The maximum number of requests in flight at once.
+            weight_limit (int): The request weight allowed per minute.
+            weight_margin (float): The fraction of weight_limit used before waiting for the next minute, leaving room for other clients of the IP.
+            max_retries (int): The number of times a failed request is retried.
+            backoff_base (float): The wait before the first retry in seconds. Doubled on every further retry.
+            max_backoff (float): The maximum wait between retries in seconds.
+            timeout (float): The total timeout of a request in seconds.
+        """
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.weight_budget = int(weight_limit * weight_margin)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.weight_lock = asyncio.Lock()
+
+        # Weight used in the current minute as reported by Binance (plus the requests answered without a report), and the weight reserved for
+        # the requests in flight, which aren't in a report yet
+        self.used_weight = 0
+        self.pending_weight = 0
+        self.weight_minute = 0
+
+    async def __aenter__(self) -> "BinanceClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout), trust_env=True)
+
+        return self.session
+
+    def _start_minute(self):
+        minute = int(time.time() // 60)
+        if minute != self.weight_minute:
+            self.weight_minute = minute
+            self.used_weight = 0
+
+    async def _reserve_weight(self, weight: int):
+        async with self.weight_lock:
+            while True:
+                self._start_minute()
+                if self.used_weight + self.pending_weight + weight <= self.weight_budget:
+                    self.pending_weight += weight
+                    return
+
+                await asyncio.sleep(60 - time.time() % 60 + 0.5)
+
+    def _settle_weight(self, weight: int, headers=None):
+        """
+        Replace the weight reserved for an answered request with the used weight Binance reports, which counts what the request actually cost and
+        the requests of other clients of the IP. The reports grow during the minute, so the latest one is the highest, whatever order the responses
+        arrive in. Without a report (a connection error, or an exchange that doesn't report it), the reserved weight counts as used.
+        """
+        self.pending_weight -= weight
+        self._start_minute()
+
+        used_weight = headers.get("X-MBX-USED-WEIGHT-1M") if headers is not None else None
+        if used_weight is None:
+            self.used_weight += weight
+        else:
+            self.used_weight = max(self.used_weight, int(used_weight))
+            metrics.set_gauge("api_used_weight_1m", self.used_weight)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff_base * 2 ** attempt, self.max_backoff)
+
+    async def get(self, path: str, params: dict, weight: int = 1):
+        """
+        Send a GET request to the REST API and return the decoded JSON response.
+
+        Args:
+            path (str): The endpoint path (e.g., '/api/v3/klines').
+            params (dict): The query parameters.
+            weight (int): The request weight of the endpoint with these parameters, reserved until Binance reports the used weight.
+
+        Raises:
+            BinanceAPIError: If the request is rejected, or still fails after all retries (error_class for other exchanges).
+        """
+        url = f"{self.base_url}{path}"
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            await self._reserve_weight(weight)
+            metrics.increment(self.weight_counter, weight)
+            retry_after = None
+            headers = None
+            try:
+                async with self.semaphore:
+                    async with self._get_session().get(url, params=params) as response:
+                        headers = response.headers
+                        self._settle_weight(weight, headers)
+
+                        if response.status in (418, 429):
+                            # Rate limited or banned, Binance says how long to back off for
+                            retry_after = float(response.headers.get("Retry-After", self._backoff(attempt)))
+                            last_error = self.error_class(response.status, await response.text())
+                        elif response.status >= 500:
+                            last_error = self.error_class(response.status, await response.text())
+                        elif response.status >= 400:
+                            raise self.error_class(response.status, await response.text())
+                        else:
+                            return await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+            finally:
+                if headers is None:
+                    self._settle_weight(weight)
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+
+        raise self.error_class(getattr(last_error, "status", 0), f"Request to {path} failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def get_klines(self, symbol: str, timeframe: str, start_time: int, end_time: int, num_candles: int, timeframe_ms: int) -> list:
+        """
+        Fetch up to num_candles klines starting at start_time, paginating over as many requests as the per-request limit requires.
+
+        Args:
+            symbol (str): The trading pair symbol (e.g., 'BTCUSDT').
+            timeframe (str): The timeframe of the candles (e.g., '1m', '5m', '1h', '1d').
+            start_time (int): The start time in milliseconds since epoch.
+            end_time (int): The end time in milliseconds since epoch.
+            num_candles (int): The maximum number of candles to fetch.
+            timeframe_ms (int): The length of a candle in milliseconds.
+
+        Returns:
+            list: The kline rows in the format of the klines endpoint.
+        """
+        klines = []
+        while len(klines) < num_candles and start_time <= end_time:
+            limit = min(num_candles - len(klines), KLINES_LIMIT)
+            params = {
+                "symbol": symbol,
+                "interval": timeframe,
+                "startTime": start_time,
+                "endTime": end_time,
+                "limit": limit
+            }
+            page = await self.get("/api/v3/klines", params, weight=KLINES_WEIGHT)
+            if not isinstance(page, list):
+                raise BinanceAPIError(0, f"Unexpected kline response: {page}")
+
+            klines.extend(page)
+            if len(page) < limit:
+                break
+            start_time = page[-1][0] + timeframe_ms
+
+        return klines
@@ -0,0 +1,258 @@
+"""
+Persistent candle store. Each pair/timeframe combination is kept as a bounded in-memory CandleBuffer and mirrored to a columnar .npz file on disk,
+so the full history only has to be downloaded once. After the initial backfill, every update only requests the candles whose open time is at or
+after the last stored open time. The last stored candle is always re-requested, since it's usually the still-open candle and its values change
+until it closes.
+
+Updates only change the in-memory buffers. The changed pairs are written to disk by persist(), at most once every persist_interval seconds and in
+a worker thread, so the event loop never waits on the disk. The files only save the history download on a restart, and whatever a crash loses
+since the last persist is fetched again by the next update.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+from data.binance_client import BinanceClient
+from data.candles import VALUE_COLUMNS, CandleBuffer
+from data.exchanges.router import split_pair
+from data.metrics import metrics
+
+
+class CandleStore:
+    VALUE_COLUMNS = VALUE_COLUMNS
+
+    def __init__(self, root_dir: str = "./candle_store", capacity: int = 1000, client: Optional[BinanceClient] = None, dtype=np.float64,
+                 persist_interval: float = 300):
+        """
+        Args:
+            root_dir (str): The directory the candle files are stored in. Each timeframe gets its own subdirectory, and pairs of other exchanges
+                than the default one (e.g. "nobitex:BTCIRT") are kept under a subdirectory per exchange.
+            capacity (int): The maximum number of candles kept for each pair. Older candles are dropped from memory and disk.
+            client (BinanceClient, optional): The client to fetch the candles with, or an ExchangeRouter for pairs of several exchanges. Defaults
+                to the shared client.
+            dtype: The dtype the OHLCV values are kept in, see CandleBuffer.
+            persist_interval (float): The minimum time in seconds between two writes of the changed pairs to disk, see persist().
+        """
+        self.root_dir = root_dir
+        self.capacity = capacity
+        self.client = client
+        self.dtype = dtype
+        self.persist_interval = persist_interval
+        self.buffers: Dict[Tuple[str, str], CandleBuffer] = {}
+
+        # The pairs changed since they were last written to disk
+        self.dirty: Set[Tuple[str, str]] = set()
+        self.last_persist_time = time.monotonic()
+        self.persist_lock = asyncio.Lock()
+
+    def _path(self, pair: str, timeframe: str) -> str:
+        exchange, symbol = split_pair(pair)
+        if exchange is None:
+            return os.path.join(self.root_dir, timeframe, f"{pair}.npz")
+
+        return os.path.join(self.root_dir, exchange, timeframe, f"{symbol}.npz")
+
+    def load(self, pair: str, timeframe: str) -> Optional[CandleBuffer]:
+        """
+        Load the stored candles of a pair from disk into memory. Returns None if the pair has never been stored.
+        """
+        path = self._path(pair, timeframe)
+        if not os.path.exists(path):
+            return None
+
+        candles = CandleBuffer(self.capacity, self.dtype)
+        with np.load(path) as stored:
+            # Files written before volume was stored don't have a volume column
+            candles.extend(stored["time"], {column: stored[column] for column in self.VALUE_COLUMNS if column in stored.files})
+
+        self.buffers[(pair, timeframe)] = candles
+        return candles
+
+    @staticmethod
+    def _write_file(path: str, columns: Dict[str, np.ndarray]):
+        # Written to a temporary path first and then moved into place, so a crash mid-write never leaves a corrupted file behind
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, path)
+
+    def _copy_columns(self, pair: str, timeframe: str) -> Dict[str, np.ndarray]:
+        candles = self.buffers[(pair, timeframe)]
+        return {"time": np.array(candles["time"]), **{column: np.array(candles[column]) for column in self.VALUE_COLUMNS}}
+
+    def save(self, pair: str, timeframe: str):
+        """
+        Write the in-memory candles of a pair to disk right away.
+        """
+        self._write_file(self._path(pair, timeframe), self._copy_columns(pair, timeframe))
+        self.dirty.discard((pair, timeframe))
+
+    async def persist(self, force: bool = False):
+        """
+        Write the pairs changed since the last persist to disk, in a worker thread. The candles are copied on the calling thread first, so the
+        buffers can go on changing while the files are written. Write errors are printed, and the pairs are written again by the next persist.
+
+        Args:
+            force (bool): Write the changed pairs even if the last persist was less than persist_interval seconds ago, e.g. on shutdown.
+        """
+        if not self.dirty or (not force and time.monotonic() - self.last_persist_time < self.persist_interval):
+            return
+
+        async with self.persist_lock:
+            keys = [key for key in self.dirty if key in self.buffers]
+            files = {self._path(pair, timeframe): self._copy_columns(pair, timeframe) for pair, timeframe in keys}
+            self.dirty.clear()
+            self.last_persist_time = time.monotonic()
+
+            def write_files():
+                for path, columns in files.items():
+                    self._write_file(path, columns)
+
+            try:
+                with metrics.stage("persist"):
+                    await asyncio.get_running_loop().run_in_executor(None, write_files)
+            except OSError as e:
+                print(f"Failed to persist the candles of {len(keys)} pairs: {e}")
+                self.dirty.update(keys)
+
+    def get(self, pair: str, timeframe: str) -> Optional[CandleBuffer]:
+        """
+        Return the candles of a pair, loading them from disk if they aren't in memory yet.
+        """
+        candles = self.buffers.get((pair, timeframe))
+        if candles is None:
+            candles = self.load(pair, timeframe)
+
+        return candles
+
+    def last_open_time(self, pair: str, timeframe: str) -> Optional[int]:
+        """
+        Return the open time of the last stored candle in milliseconds since epoch, or None if nothing is stored for the pair.
+        """
+        candles = self.get(pair, timeframe)
+        return None if candles is None else candles.last_time
+
+    def _get_or_create(self, pair: str, timeframe: str) -> CandleBuffer:
+        candles = self.get(pair, timeframe)
+        if candles is None:
+            candles = CandleBuffer(self.capacity, self.dtype)
+            self.buffers[(pair, timeframe)] = candles
+
+        return candles
+
+    def merge(self, pair: str, timeframe: str, new_df: pd.DataFrame) -> CandleBuffer:
+        """
+        Merge newly fetched candles into the stored candles of a pair. Stored candles with an open time at or after the first new candle are
+        replaced, and the oldest candles are dropped beyond the store capacity.
+        """
+        candles = self._get_or_create(pair, timeframe)
+        candles.merge_frame(new_df)
+        self.dirty.add((pair, timeframe))
+
+        return candles
+
+    def append(self, pair: str, timeframe: str, open_time: int, open: float, high: float, low: float, close: float, volume: float) -> CandleBuffer:
+        """
+        Add a single candle to the stored candles of a pair, replacing the last candle if it has the same open time.
+        """
+        candles = self._get_or_create(pair, timeframe)
+        candles.append(open_time, open, high, low, close, volume)
+        self.dirty.add((pair, timeframe))
+
+        return candles
+
+    def _plan_update(self, pairs: List[str], timeframe: str, now: int) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Split the pairs into those that have to be backfilled with the full capacity, and those that only fetch the candles since their last
+        stored open time, which is returned as their start time.
+        """
+        timeframe_ms = utils.timeframe_to_ms(timeframe)
+        backfill_pairs = []
+        start_times = {}
+        for pair in pairs:
+            last_open_time = self.last_open_time(pair, timeframe)
+            if last_open_time is None or (now - last_open_time) // timeframe_ms >= self.capacity:
+                backfill_pairs.append(pair)
+            else:
+                start_times[pair] = last_open_time
+
+        return backfill_pairs, start_times
+
+    def _store_fetched(self, pair: str, timeframe: str, pair_df: pd.DataFrame, backfilled: bool) -> CandleBuffer:
+        with metrics.stage("store"):
+            # Backfilled pairs replace whatever was stored before, since there's a gap between the old and the new candles
+            if backfilled:
+                self._get_or_create(pair, timeframe).clear()
+            candles = self.merge(pair, timeframe, pair_df)
+
+        return candles
+
+    async def update_pair(self, pair: str, timeframe: str) -> CandleBuffer:
+        """
+        Bring the stored candles of a single pair up to date and return them, like update() does for a list of pairs. The pair only requests
+        the candles it needs itself.
+
+        Raises:
+            Exception: The error of the client if the candles couldn't be fetched, or a ValueError if they couldn't be parsed. The stored candles
+                are left unchanged then.
+        """
+        now = utils.now_ms()
+        timeframe_ms = utils.timeframe_to_ms(timeframe)
+        backfill_pairs, start_times = self._plan_update([pair], timeframe, now)
+
+        if backfill_pairs:
+            num_candles = self.capacity
+            start_time = now - num_candles * timeframe_ms
+        else:
+            num_candles = min((now - start_times[pair]) // timeframe_ms + 1, self.capacity)
+            start_time = start_times[pair]
+
+        _, data = await utils.fetch_candlestick_data(self.client or utils.get_default_client(), pair, timeframe, start_time, now, num_candles)
+        with metrics.stage("parse"):
+            pair_df = utils.parse_klines(data)
+        metrics.increment("candles_fetched_total", len(data))
+
+        return self._store_fetched(pair, timeframe, pair_df, backfilled=bool(backfill_pairs))
+
+    async def update(self, pairs: List[str], timeframe: str) -> Dict[str, CandleBuffer]:
+        """
+        Bring the stored candles of the given pairs up to date and return them. Pairs that have no stored candles, or whose stored candles are too
+        old to be caught up in a single request, are backfilled with the full capacity. All other pairs only fetch the candles since their last
+        stored open time.
+
+        Args:
+            pairs (list): A list of trading pair symbols (e.g., ['BTCUSDT', 'ETHUSDT']).
+            timeframe (str): The timeframe of the candles (e.g., '1m', '5m', '1h', '1d').
+
+        Returns:
+            dict: A dictionary where keys are trading pair symbols and values are the CandleBuffers of their candles.
+        """
+        now = utils.now_ms()
+        timeframe_ms = utils.timeframe_to_ms(timeframe)
+        backfill_pairs, start_times = self._plan_update(pairs, timeframe, now)
+
+        fetched_data = {}
+        if backfill_pairs:
+            fetched_data.update(await utils.get_multiple_pairs_data(backfill_pairs, timeframe, self.capacity, client=self.client))
+        if start_times:
+            # Only request as many candles as the pair that is furthest behind needs, which keeps the request weight at its minimum
+            num_candles = min((now - min(start_times.values())) // timeframe_ms + 1, self.capacity)
+            fetched_data.update(await utils.get_multiple_pairs_data(list(start_times.keys()), timeframe, num_candles, start_times=start_times,
+                                                                    client=self.client))
+
+        pairs_data = {}
+        for pair in pairs:
+            if pair in fetched_data:
+                self._store_fetched(pair, timeframe, fetched_data[pair], backfilled=pair in backfill_pairs)
+
+            candles = self.buffers.get((pair, timeframe))
+            if candles is not None:
+                pairs_data[pair] = candles
+
+        return pairs_data
+
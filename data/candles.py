@@ -0,0 +1,160 @@
+"""
+Compact fixed-capacity candle container. A CandleBuffer keeps the open times as int64 milliseconds and the OHLCV values as one contiguous float
+array, in a ring buffer that drops the oldest candle once it's full. Every candle is written twice, at its ring position and capacity positions
+later, so the most recent candles are always one contiguous slice of the storage and can be read as NumPy views without copying or unrolling the
+ring.
+
+Columns are read like DataFrame columns, e.g. candles["close"], but return NumPy arrays and "time" is in milliseconds since epoch. Most readers of
+candles (utils.to_milliseconds(), IndicatorStream.sync(), Confirmations, CandlePanel.from_frames()) accept both.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+
+VALUE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+class CandleBuffer:
+    def __init__(self, capacity: int, dtype=np.float64):
+        """
+        Args:
+            capacity (int): The maximum number of candles kept. Older candles are dropped.
+            dtype: The dtype of the OHLCV values. np.float32 halves the memory, at the cost of the indicators no longer matching the float64 batch
+                indicators exactly.
+        """
+        self.capacity = capacity
+        self.times = np.zeros(2 * capacity, dtype=np.int64)
+        self.values = np.zeros((len(VALUE_COLUMNS), 2 * capacity), dtype=dtype)
+
+        # The ring position the next candle is written to, and the number of stored candles
+        self.head = 0
+        self.size = 0
+
+    @classmethod
+    def from_frame(cls, pair_df: pd.DataFrame, capacity: int = None, dtype=np.float64) -> "CandleBuffer":
+        """
+        Build a buffer from a DataFrame of candles in the format of utils.parse_klines(). Defaults to a capacity of the number of candles.
+        """
+        candles = cls(capacity or max(len(pair_df), 1), dtype)
+        candles.extend(utils.to_milliseconds(pair_df["time"]), {column: np.asarray(pair_df[column]) for column in VALUE_COLUMNS if column in pair_df})
+        return candles
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Return a copy of the candles as a DataFrame in the format of utils.parse_klines().
+        """
+        return pd.DataFrame({
+            "time": pd.to_datetime(self["time"], unit="ms", utc=True),
+            **{column: self[column].astype(np.float64) for column in VALUE_COLUMNS}
+        })
+
+    def __getstate__(self) -> dict:
+        # Only the stored candles are pickled, not the doubled ring storage, which keeps engine snapshots small
+        return {
+            "capacity": self.capacity,
+            "dtype": self.values.dtype,
+            "times": np.array(self["time"]),
+            "values": {column: np.array(self[column]) for column in VALUE_COLUMNS}
+        }
+
+    def __setstate__(self, state: dict):
+        self.__init__(state["capacity"], state["dtype"])
+        self.extend(state["times"], state["values"])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, column: str) -> bool:
+        return column == "time" or column in VALUE_COLUMNS
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """
+        Return a read-only view of a column of the stored candles, oldest first.
+        """
+        start = (self.head - self.size) % self.capacity
+        if column == "time":
+            view = self.times[start:start + self.size]
+        else:
+            view = self.values[VALUE_COLUMNS.index(column), start:start + self.size]
+
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def empty(self) -> bool:
+        return self.size == 0
+
+    @property
+    def last_time(self) -> Optional[int]:
+        """
+        The open time of the last candle in milliseconds since epoch, or None if the buffer is empty.
+        """
+        return int(self.times[(self.head - 1) % self.capacity]) if self.size else None
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    def append(self, open_time: int, open: float, high: float, low: float, close: float, volume: float = np.nan):
+        """
+        Add a candle. Stored candles with an open time at or after it are replaced, so the still-open candle can be updated in place.
+        """
+        if self.size and open_time <= self.last_time:
+            self.truncate(self.size - int(np.searchsorted(self["time"], open_time, side="left")))
+
+        for position in (self.head, self.head + self.capacity):
+            self.times[position] = open_time
+            self.values[:, position] = (open, high, low, close, volume)
+
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, times: np.ndarray, values: Dict[str, np.ndarray]):
+        """
+        Add several candles at once.
+
+        Args:
+            times (np.ndarray): The open times of the candles in milliseconds since epoch, sorted and after the last stored candle.
+            values (dict): The value arrays of the candles, keyed by column. Missing columns are stored as NaN.
+        """
+        times = np.asarray(times, dtype=np.int64)[-self.capacity:]
+        n_candles = len(times)
+        if n_candles == 0:
+            return
+
+        positions = (self.head + np.arange(n_candles)) % self.capacity
+        for offset in (0, self.capacity):
+            self.times[positions + offset] = times
+            for i, column in enumerate(VALUE_COLUMNS):
+                self.values[i, positions + offset] = np.asarray(values[column])[-n_candles:] if column in values else np.nan
+
+        self.head = (self.head + n_candles) % self.capacity
+        self.size = min(self.size + n_candles, self.capacity)
+
+    def truncate(self, n_candles: int):
+        """
+        Drop the last n_candles candles.
+        """
+        n_candles = min(n_candles, self.size)
+        self.head = (self.head - n_candles) % self.capacity
+        self.size -= n_candles
+
+    def merge(self, times: np.ndarray, values: Dict[str, np.ndarray]):
+        """
+        Merge newly fetched candles. Stored candles with an open time at or after the first new candle are replaced.
+        """
+        if len(times) == 0:
+            return
+
+        self.truncate(self.size - int(np.searchsorted(self["time"], times[0], side="left")))
+        self.extend(times, values)
+
+    def merge_frame(self, new_df: pd.DataFrame):
+        """
+        Merge newly fetched candles from a DataFrame in the format of utils.parse_klines().
+        """
+        self.merge(utils.to_milliseconds(new_df["time"]), {column: np.asarray(new_df[column]) for column in VALUE_COLUMNS if column in new_df})
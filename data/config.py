@@ -0,0 +1,159 @@
+"""
+Hot-reloadable strategy configuration. The settings are read from a JSON file whose modification time is checked between cycles, so weights,
+indicator parameters, thresholds and the pair list can be changed without restarting the engine and downloading the history again. Settings left
+out of the file keep their defaults.
+
+A file that can't be parsed or holds invalid settings is ignored as a whole and the previous settings stay in place, so a half-written file never
+applies part of a change.
+"""
+import json
+import os
+from typing import Callable, Dict, Iterable, Optional
+
+from data import utils
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_str_list(name: str, value, config: dict):
+    if not all(isinstance(item, str) and item for item in value):
+        raise ValueError(f"'{name}' must be a list of non-empty strings")
+
+
+def validate_positive_int(name: str, value, config: dict):
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"'{name}' must be a positive integer")
+
+
+def _is_timeframe(value) -> bool:
+    try:
+        return isinstance(value, str) and utils.timeframe_to_ms(value) > 0
+    except ValueError:
+        return False
+
+
+def validate_timeframe(name: str, value, config: dict):
+    if not _is_timeframe(value):
+        raise ValueError(f"'{name}' must be a timeframe like '1h', got {value!r}")
+
+
+def validate_timeframe_list(name: str, value, config: dict):
+    invalid_timeframes = [item for item in value if not _is_timeframe(item)]
+    if invalid_timeframes:
+        raise ValueError(f"'{name}' must be a list of timeframes like '4h', got {invalid_timeframes}")
+
+
+def number_dict_validator(allowed_keys: Iterable[str]) -> Callable:
+    """
+    Return a validator accepting a dict of non-negative numbers with only the given keys, e.g. for the signal thresholds.
+    """
+    allowed_keys = set(allowed_keys)
+
+    def validate(name: str, value, config: dict):
+        unknown_keys = set(value) - allowed_keys
+        if unknown_keys:
+            raise ValueError(f"unknown keys in '{name}': {sorted(unknown_keys)}")
+        for key, item in value.items():
+            if not _is_number(item) or item < 0:
+                raise ValueError(f"'{name}.{key}' must be a non-negative number")
+
+    return validate
+
+
+def weights_validator(known_checks: Iterable[str], checks_setting: str = None) -> Callable:
+    """
+    Return a validator for group weights in the format of scoring.indicator_weights: every group has a numeric 'total_weight' and an
+    'indicators' dict of numeric weights, keyed by known confirmation checks. If checks_setting is given, the weighted checks must also be
+    among the checks enabled by that setting (when it's not None), since the weighted score reads every weighted check.
+    """
+    known_checks = set(known_checks)
+
+    def validate(name: str, value, config: dict):
+        enabled_checks = config.get(checks_setting) if checks_setting is not None else None
+        for group_name, group_config in value.items():
+            if not isinstance(group_config, dict) or set(group_config) != {"total_weight", "indicators"}:
+                raise ValueError(f"'{name}.{group_name}' must have exactly 'total_weight' and 'indicators'")
+            if not _is_number(group_config["total_weight"]) or not isinstance(group_config["indicators"], dict):
+                raise ValueError(f"'{name}.{group_name}' must have a numeric 'total_weight' and an 'indicators' object")
+
+            for check_name, weight in group_config["indicators"].items():
+                if check_name not in known_checks:
+                    raise ValueError(f"unknown confirmation check '{check_name}' in '{name}.{group_name}'")
+                if enabled_checks is not None and check_name not in enabled_checks:
+                    raise ValueError(f"'{name}.{group_name}' weights the disabled check '{check_name}'")
+                if not _is_number(weight):
+                    raise ValueError(f"'{name}.{group_name}.indicators.{check_name}' must be a number")
+
+    return validate
+
+
+class ConfigWatcher:
+    def __init__(self, path: str, defaults: dict, validators: Dict[str, Callable] = None):
+        """
+        Args:
+            path (str): The JSON config file. It doesn't have to exist, in which case the defaults are used.
+            defaults (dict): The default value of every setting. Only these settings are accepted in the file, and their values must have the same
+                type as the default (None defaults accept any value).
+            validators (dict, optional): Further checks of the contents of a setting, keyed by setting name. Each validator is called with the
+                setting name, its value and the whole new config, and raises a ValueError if the value is invalid.
+        """
+        self.path = path
+        self.defaults = defaults
+        self.validators = validators or {}
+        self.config = dict(defaults)
+        self.mtime: Optional[int] = None
+
+    def validate(self, loaded: dict):
+        """
+        Raise a ValueError if the loaded settings aren't a dict of known settings with values of the right type, or if a validator rejects the
+        contents of a setting.
+        """
+        if not isinstance(loaded, dict):
+            raise ValueError("the config must be a JSON object")
+
+        for key, value in loaded.items():
+            if key not in self.defaults:
+                raise ValueError(f"unknown setting '{key}'")
+
+            default = self.defaults[key]
+            expected_type = (int, float) if isinstance(default, (int, float)) and not isinstance(default, bool) else type(default)
+            if default is not None and (not isinstance(value, expected_type) or isinstance(value, bool) != isinstance(default, bool)):
+                raise ValueError(f"'{key}' must be of type {type(default).__name__}")
+
+        # The validators see the whole config the file would result in, so settings that depend on each other are checked together
+        new_config = {**self.defaults, **loaded}
+        for key, validator in self.validators.items():
+            if new_config[key] is not None:
+                validator(key, new_config[key], new_config)
+
+    def poll(self) -> dict:
+        """
+        Reload the file if it was modified since the last poll.
+
+        Returns:
+            dict: The settings whose values changed, with their new values. Empty if the file didn't change, is missing or is invalid.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        if mtime == self.mtime:
+            return {}
+        self.mtime = mtime
+
+        try:
+            with open(self.path) as config_file:
+                loaded = json.load(config_file)
+            self.validate(loaded)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring the invalid config file {self.path}: {e}")
+            return {}
+
+        new_config = {**self.defaults, **loaded}
+        changes = {key: value for key, value in new_config.items() if value != self.config[key]}
+        self.config = new_config
+
+        return changes
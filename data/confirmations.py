@@ -1,19 +1,152 @@
 """
-This file will contain different confirmation checks for the signals. The confirmation class will have a method for each confirmation check. The
-methods will take the indicators_df dataframe as input and return a boolean value indicating whether the confirmation check is met or not. At the end,
-all the confirmation checks will be aggregated using an AND operation to generate the final signal.
+The confirmation checks for the signals. Each check is a method of the Confirmations class that looks at the latest indicator values of a pair and
+returns a value between -1 (bearish) and 1 (bullish). Checks are registered with the @confirmation decorator, which declares the indicator columns
+the check reads, how many candles it looks back over, and a vectorized version of the check that evaluates every candle of a (pairs x candles)
+panel at once. The registry is built once at import, so evaluating the checks needs no reflection, and the pipeline can skip computing indicators
+that no enabled check needs.
 """
-import inspect
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 import pandas as pd
 import numpy as np
 
 
+class ConfirmationCheck:
+    def __init__(self, name: str, method: Callable, requires: tuple, lookback: int, uses_recent_window: bool, series: Optional[Callable]):
+        """
+        Args:
+            name (str): The name of the check, which is also its key in the confirmations dict.
+            method (callable): The Confirmations method evaluating the check on the latest candle.
+            requires (tuple): The indicator columns the check reads.
+            lookback (int): The number of most recent candles the check reads.
+            uses_recent_window (bool): Whether the check reads the last recent_window_size candles, on top of lookback.
+            series (callable, optional): The vectorized version of the check, taking (indicators, high, low, close, recent_window_size).
+        """
+        self.name = name
+        self.method = method
+        self.requires = requires
+        self.lookback = lookback
+        self.uses_recent_window = uses_recent_window
+        self.series = series
+
+    def get_lookback(self, recent_window_size: int) -> int:
+        return max(self.lookback, recent_window_size) if self.uses_recent_window else self.lookback
+
+
+# Registered checks by name, filled in by the @confirmation decorators in the Confirmations class
+CONFIRMATION_CHECKS: Dict[str, ConfirmationCheck] = {}
+
+
+def confirmation(requires: Iterable[str] = (), lookback: int = 1, uses_recent_window: bool = False, series: Callable = None):
+    """
+    Register a Confirmations method as a confirmation check.
+
+    Args:
+        requires (list): The indicator columns the check reads.
+        lookback (int): The number of most recent candles the check reads.
+        uses_recent_window (bool): Whether the check reads the last recent_window_size candles.
+        series (callable, optional): The vectorized version of the check.
+    """
+    def register(method: Callable) -> Callable:
+        CONFIRMATION_CHECKS[method.__name__] = ConfirmationCheck(method.__name__, method, tuple(requires), lookback, uses_recent_window, series)
+        return method
+
+    return register
+
+
+def get_checks(enabled_checks: Iterable[str] = None) -> List[ConfirmationCheck]:
+    """
+    Return the registered checks with the given names, or every registered check if no names are given.
+    """
+    if enabled_checks is None:
+        return list(CONFIRMATION_CHECKS.values())
+
+    unknown_checks = set(enabled_checks) - set(CONFIRMATION_CHECKS)
+    if unknown_checks:
+        raise ValueError(f"Unknown confirmation checks: {sorted(unknown_checks)}")
+
+    return [check for name, check in CONFIRMATION_CHECKS.items() if name in enabled_checks]
+
+
+def required_indicator_columns(checks: Iterable[ConfirmationCheck]) -> Set[str]:
+    """
+    Return the indicator columns read by the given checks.
+    """
+    return {column for check in checks for column in check.requires}
+
+
+def _shift(values: np.ndarray, shift_size: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    if shift_size > 0:
+        result[..., shift_size:] = values[..., :-shift_size]
+    else:
+        result[:] = values
+
+    return result
+
+
+# Vectorized versions of the checks. Every candle is evaluated with the same branching and rounding as the corresponding Confirmations method, so
+# the value at each candle is what the method would have returned if that candle had been the last one.
+
+def _ichimoku_crossover_series(indicators, high, low, close, recent_window_size):
+    # Compare the difference at the start and at the end of the recent window
+    tenkan_sen_diff = indicators["tenkan"] - indicators["kijun"]
+    window_start_diff = _shift(tenkan_sen_diff, recent_window_size - 1)
+
+    return np.where((window_start_diff > 0) & (tenkan_sen_diff < 0), -1.0, np.where((window_start_diff < 0) & (tenkan_sen_diff > 0), 1.0, 0.0))
+
+
+def _ichimoku_kumo_relative_position_series(indicators, high, low, close, recent_window_size):
+    # This mirrors max(lead_span_b, lead_span_a) and min(lead_span_b, lead_span_a), including how they treat NaN
+    lead_span_a = indicators["lead_span_a"]
+    lead_span_b = indicators["lead_span_b"]
+    cloud_top = np.where(lead_span_a > lead_span_b, lead_span_a, lead_span_b)
+    cloud_bottom = np.where(lead_span_a < lead_span_b, lead_span_a, lead_span_b)
+
+    return np.where(close > cloud_top, 1.0, np.where(close < cloud_bottom, -1.0, 0.0))
+
+
+def _ichimoku_cloud_color_series(indicators, high, low, close, recent_window_size):
+    lead_span_a = indicators["lead_span_a"]
+    lead_span_b = indicators["lead_span_b"]
+
+    return np.where(lead_span_a > lead_span_b, 1.0, np.where(lead_span_a < lead_span_b, -1.0, 0.0))
+
+
+def _rsi_series(indicators, high, low, close, recent_window_size):
+    return np.round((50 - indicators["rsi"]) / 100, 2)
+
+
+def _keltner_series(indicators, high, low, close, recent_window_size):
+    return np.select(
+        [high > indicators["upper_keltner_band"],
+         low < indicators["lower_keltner_band"],
+         high > indicators["middle_keltner_band"],
+         low < indicators["middle_keltner_band"]],
+        [-1.0, 1.0, 0.5, 0.5],
+        default=0.0
+    )
+
+
+def _stochastic_osc_series(indicators, high, low, close, recent_window_size):
+    stoch_k = indicators["stoch_k"]
+
+    return np.select([stoch_k > 80, stoch_k < 20, stoch_k > indicators["stoch_d"]], [-1.0, 1.0, 0.5], default=-0.5)
+
+
 class Confirmations:
-    def __init__(self, indicators_df: pd.DataFrame, pair_df: pd.DataFrame, recent_window_size: int):
+    def __init__(self, indicators_df: pd.DataFrame, pair_df: pd.DataFrame, recent_window_size: int, enabled_checks: Iterable[str] = None):
+        """
+        Args:
+            indicators_df (pd.DataFrame): The indicator rows of the pair.
+            pair_df (pd.DataFrame): The candles of the pair, as a DataFrame or a CandleBuffer.
+            recent_window_size (int): The window the crossover checks look back over.
+            enabled_checks (list, optional): The names of the confirmation checks to evaluate. Defaults to every registered check.
+        """
         self.indicators_df = indicators_df
         self.pair_df = pair_df
         self.recent_window_size = recent_window_size
+        self.checks = get_checks(enabled_checks)
 
     def update_indicators(self, indicators_df: pd.DataFrame, pair_df: pd.DataFrame):
         self.indicators_df = indicators_df
@@ -21,36 +154,14 @@ class Confirmations:
 
     def aggregate_sentiments(self) -> dict:
         """
-        This method aggregates all the confirmations and summarizes them into a pandas DataFrame with a column containing the final signal. The other
-        columns wil contain the results of the individual checks.
+        Evaluate every enabled confirmation check on the latest candle.
 
         Returns:
-            dict: A Pandas dataframe with a single row containing the confirmation data
+            dict: The rounded value of each confirmation check, keyed by its name.
         """
-        methods = inspect.getmembers(self, predicate=inspect.ismethod)
-        total_sum = 0
-        total_weight = 0
-
-        confirmations_dict = dict()
-
-        for name, method in methods:
-            if not name.startswith('__') and name != 'update_indicators' and name != 'aggregate_sentiments':
-                confirmation_value = round(method(), 2)
-
-                # If the confirmation value is small, give it half the weight
-                weight = 1
-                if -0.1 < confirmation_value < 0.1:
-                    weight = 0.5
-
-                total_sum += confirmation_value
-                total_weight += weight
-
-                confirmations_dict[name] = confirmation_value
-
-        # confirmations_dict["confidence"] = round(float(1 - np.var(list(confirmations_dict.values()))), 2)
-
-        return confirmations_dict
+        return {check.name: round(check.method(self), 2) for check in self.checks}
 
+    @confirmation(requires=("tenkan", "kijun"), uses_recent_window=True, series=_ichimoku_crossover_series)
     def ichimoku_crossover(self) -> int:
         """
         Check if the Tenkan-sen line crosses above the Kijun-sen line. This is checked by seeing if the lines cross over in a window of size
@@ -74,11 +185,12 @@ class Confirmations:
         else:
             return 0
 
+    @confirmation(requires=("lead_span_a", "lead_span_b"), series=_ichimoku_kumo_relative_position_series)
     def ichimoku_kumo_relative_position(self) -> int:
         """
         If the last close price is above both lead span A and B, it's a RISING signal. Otherwise, it's a FALLING signal.
         """
-        last_close = self.pair_df.close.iloc[-1]
+        last_close = np.asarray(self.pair_df["close"])[-1]
         lead_span_a = self.indicators_df["lead_span_a"].iloc[-1]
         lead_span_b = self.indicators_df["lead_span_b"].iloc[-1]
 
@@ -91,6 +203,7 @@ class Confirmations:
         else:
             return 0
 
+    @confirmation(requires=("lead_span_a", "lead_span_b"), series=_ichimoku_cloud_color_series)
     def ichimoku_cloud_color(self):
         """
         If the lead span A is above the lead span B, it's a RISING signal. If the lead span A is below the lead span B, it's a FALLING signal.
@@ -107,6 +220,7 @@ class Confirmations:
         else:
             return 0
 
+    @confirmation(requires=("rsi",), series=_rsi_series)
     def rsi(self) -> float:
         """
         Return a float value for the RSI.
@@ -116,6 +230,7 @@ class Confirmations:
 
         return float((50 - rsi) / 100)
 
+    # @confirmation(requires=("macd_line", "signal_line"), uses_recent_window=True)
     # def macd(self) -> int:
     #     """
     #     MACD-based confirmation. If the MACD line crosses above the Signal line, it's a RISING signal, or an output of 1. If the MACD line crosses
@@ -139,24 +254,27 @@ class Confirmations:
     #     else:
     #         return 0
 
+    @confirmation(requires=("upper_keltner_band", "lower_keltner_band", "middle_keltner_band"), series=_keltner_series)
     def keltner(self):
         """
         Generate confirmation signal based on Bollinger Bands
         """
-        last_candle = self.pair_df.iloc[-1]
+        last_high = np.asarray(self.pair_df["high"])[-1]
+        last_low = np.asarray(self.pair_df["low"])[-1]
         keltner_band_values = self.indicators_df.iloc[-1]
 
-        if last_candle.high > keltner_band_values['upper_keltner_band']:
+        if last_high > keltner_band_values['upper_keltner_band']:
             return -1  # Potentially overbought
-        elif last_candle.low < keltner_band_values['lower_keltner_band']:
+        elif last_low < keltner_band_values['lower_keltner_band']:
             return 1  # Potentially oversold
-        elif last_candle.high > keltner_band_values['middle_keltner_band']:
+        elif last_high > keltner_band_values['middle_keltner_band']:
             return +0.5  # Mild bullish
-        elif last_candle.low < keltner_band_values['middle_keltner_band']:
+        elif last_low < keltner_band_values['middle_keltner_band']:
             return 0.5  # Mild bearish
         else:
             return 0  # Neutral
 
+    @confirmation(requires=("stoch_k", "stoch_d"), series=_stochastic_osc_series)
     def stochastic_osc(self) -> float:
         last_indicator = self.indicators_df.iloc[-1]
 
@@ -169,3 +287,47 @@ class Confirmations:
             return 0.5  # Bullish momentum
         else:
             return -0.5  # Bearish momentum
+
+
+# Keep the checks in name order, which is the order the confirmations dict has always been in
+CONFIRMATION_CHECKS = dict(sorted(CONFIRMATION_CHECKS.items()))
+
+
+def confirmation_series(indicators, high: np.ndarray, low: np.ndarray, close: np.ndarray, recent_window_size: int,
+                        enabled_checks: Iterable[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Evaluate the vectorized version of every enabled check for every candle of a (pairs x candles) panel.
+
+    Args:
+        indicators: The indicator arrays, indexable by indicator column name (e.g. the structured array from compute_panel_indicators()).
+        high (np.ndarray): The high prices.
+        low (np.ndarray): The low prices.
+        close (np.ndarray): The close prices.
+        recent_window_size (int): The window the crossover checks look back over.
+        enabled_checks (list, optional): The names of the checks to evaluate. Defaults to every registered check.
+
+    Returns:
+        dict: The confirmation value arrays, keyed by check name, in the same order as aggregate_sentiments().
+    """
+    with np.errstate(invalid="ignore"):
+        return {check.name: check.series(indicators, high, low, close, recent_window_size) for check in get_checks(enabled_checks)}
+
+
+def evaluate_batch(indicators, high: np.ndarray, low: np.ndarray, close: np.ndarray, recent_window_size: int,
+                   enabled_checks: Iterable[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Evaluate every enabled check on the latest candle of every pair of a panel at once. Only the last candles each check looks back over are
+    passed to the vectorized checks, so the cost doesn't grow with the length of the history.
+
+    Returns:
+        dict: An array with the value of each pair, keyed by check name, in the same order as aggregate_sentiments().
+    """
+    confirmations = {}
+    with np.errstate(invalid="ignore"):
+        for check in get_checks(enabled_checks):
+            lookback = check.get_lookback(recent_window_size)
+            recent_indicators = {column: indicators[column][:, -lookback:] for column in check.requires}
+            values = check.series(recent_indicators, high[:, -lookback:], low[:, -lookback:], close[:, -lookback:], recent_window_size)
+            confirmations[check.name] = values[:, -1]
+
+    return confirmations
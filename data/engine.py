@@ -0,0 +1,351 @@
+"""
+The per-pair evaluation of the signal pipeline. A SignalEngine owns the indicator state of the pairs it evaluates (the streaming indicators and the
+higher-timeframe resamplers) and turns their candles into confirmation values on the base timeframe and on every higher timeframe. Scoring and
+alerting are left to the caller, so several engines (e.g. one per worker process, see data.sharding) can feed a single scoring step.
+
+The indicator state can be snapshotted to disk and restored after a restart, so the indicators only have to be fed the candles that closed while
+the process was down instead of being recomputed from the whole history.
+"""
+import os
+import pickle
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+from data.confirmations import Confirmations, evaluate_batch, required_indicator_columns
+from data.indicators.panel import CandlePanel, compute_panel_indicators
+from data.indicators.streaming import INDICATOR_PARAMS, IndicatorStream, required_indicators, stream_arguments
+from data.metrics import metrics
+from data.resample import CandleResampler
+from data.screener import ScreeningIndex
+
+# Bumped whenever the pickled indicator state changes in an incompatible way, so old snapshots are ignored instead of restored
+SNAPSHOT_VERSION = 1
+
+
+class SignalEngine:
+    def __init__(self, timeframe: str = "1h", higher_timeframes: Iterable[str] = (), indicator_mode: str = "streaming",
+                 indicator_history_size: int = 100, recent_window_size: int = 5, enabled_confirmations: List[str] = None,
+                 indicator_params: dict = None, screen_pairs: bool = False):
+        """
+        Args:
+            timeframe (str): The base timeframe of the candles the engine is fed.
+            higher_timeframes (list): The higher timeframes derived from the base candles and evaluated as well.
+            indicator_mode (str): "streaming" keeps per-pair indicator state and only feeds new candles, "panel" recomputes every pair at once as a
+                vectorized (pairs x candles) panel, which scales better when the pair list has hundreds of symbols.
+            indicator_history_size (int): The number of recent indicator rows kept by each indicator stream.
+            recent_window_size (int): The window the crossover checks look back over.
+            enabled_confirmations (list, optional): The confirmation checks to evaluate, None for every registered check. Only the indicators
+                these checks read are computed.
+            indicator_params (dict, optional): Indicator parameters overriding the defaults, e.g. {"rsi_window": 10}. See
+                streaming.INDICATOR_PARAMS for the parameter names.
+            screen_pairs (bool): Whether to screen the pairs before the full evaluation, see data.screener. Only the pairs that can reach a strong
+                signal (and the pairs passed as keep_pairs to evaluate()) are evaluated on the higher timeframes and returned.
+        """
+        self.timeframe = timeframe
+        self.indicator_mode = indicator_mode
+        self.indicator_history_size = indicator_history_size
+        self.higher_timeframes: List[str] = []
+        self.enabled_indicators: Set[str] = set()
+        self.indicator_params: dict = {}
+
+        # One streaming indicator state per pair and timeframe, so each cycle only feeds the candles that are new since the last one
+        self.indicator_streams: Dict[Tuple[str, str], IndicatorStream] = {}
+        self.resamplers: Dict[Tuple[str, str], CandleResampler] = {}
+        self.screening_index = ScreeningIndex() if screen_pairs else None
+
+        self.configure(higher_timeframes, recent_window_size, enabled_confirmations, indicator_params)
+
+    def configure(self, higher_timeframes: Iterable[str], recent_window_size: int, enabled_confirmations: List[str] = None,
+                  indicator_params: dict = None) -> Set[str]:
+        """
+        Apply new settings between two cycles. Only the indicator state that depends on a changed setting is dropped: the indicators that were
+        enabled or whose parameters changed are recomputed on the next cycle, and the state of removed higher timeframes is discarded. A changed
+        recent window only affects the confirmation checks, so no indicator is recomputed for it.
+
+        Args:
+            higher_timeframes (list): The higher timeframes derived from the base candles and evaluated as well.
+            recent_window_size (int): The window the crossover checks look back over.
+            enabled_confirmations (list, optional): The confirmation checks to evaluate, None for every registered check.
+            indicator_params (dict, optional): Indicator parameters overriding the defaults.
+
+        Returns:
+            set: The names of the indicators that will be recomputed.
+        """
+        indicator_params = dict(indicator_params or {})
+        known_params = {param for params in INDICATOR_PARAMS.values() for param in params}
+        unknown_params = set(indicator_params) - known_params
+        if unknown_params:
+            raise TypeError(f"Unknown indicator parameters: {sorted(unknown_params)}")
+        for higher_timeframe in higher_timeframes:
+            # Raises a ValueError for timeframes that can't be derived from the base timeframe
+            CandleResampler(self.timeframe, higher_timeframe, capacity=1)
+
+        confirmations = Confirmations(pd.DataFrame(), pd.DataFrame(), recent_window_size, enabled_confirmations)
+        enabled_indicators = required_indicators(required_indicator_columns(confirmations.checks))
+        changed_indicators = {name for name in enabled_indicators if name not in self.enabled_indicators or
+                              stream_arguments(name, indicator_params) != stream_arguments(name, self.indicator_params)}
+
+        self.higher_timeframes = list(higher_timeframes)
+        self.recent_window_size = recent_window_size
+        self.enabled_confirmations = enabled_confirmations
+        self.confirmations = confirmations
+        self.enabled_indicators = enabled_indicators
+        self.indicator_params = indicator_params
+
+        for key in [key for key in self.resamplers if key[1] not in self.higher_timeframes]:
+            del self.resamplers[key]
+        for (pair, pairs_timeframe), indicator_stream in list(self.indicator_streams.items()):
+            if pairs_timeframe != self.timeframe and pairs_timeframe not in self.higher_timeframes:
+                del self.indicator_streams[(pair, pairs_timeframe)]
+            else:
+                indicator_stream.configure(enabled_indicators, indicator_params)
+
+        return changed_indicators
+
+    def drop_pairs(self, pairs: Iterable[str]):
+        """
+        Discard the indicator state of pairs that are no longer evaluated.
+        """
+        pairs = set(pairs)
+        for state in (self.indicator_streams, self.resamplers):
+            for key in [key for key in state if key[0] in pairs]:
+                del state[key]
+
+    def save_snapshot(self, path: str):
+        """
+        Write the indicator streams and the higher-timeframe resamplers of every pair to a binary snapshot file. The file is written to a
+        temporary path first and then moved into place, so a crash mid-write never leaves a corrupted snapshot behind.
+        """
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "timeframe": self.timeframe,
+            "indicator_history_size": self.indicator_history_size,
+            "indicator_streams": self.indicator_streams,
+            "resamplers": self.resamplers
+        }
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            pickle.dump(snapshot, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str, pairs: Iterable[str] = None) -> int:
+        """
+        Restore the indicator state saved by save_snapshot(). The restored streams continue from the last candle they were fed, so the next
+        evaluation only feeds the candles that closed since the snapshot (or rebuilds a pair whose candles don't continue it). The current
+        settings are applied to the restored streams like configure() does, so indicators whose parameters changed are recomputed. A snapshot of
+        another base timeframe, history size or snapshot version is ignored. Only load snapshots written by this process, since they are pickles.
+
+        Args:
+            path (str): The snapshot file.
+            pairs (list, optional): The pairs to restore. Defaults to every pair in the snapshot.
+
+        Returns:
+            int: The number of restored indicator streams.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, "rb") as snapshot_file:
+                snapshot = pickle.load(snapshot_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"Ignoring the unreadable snapshot {path}: {e}")
+            return 0
+
+        if (snapshot.get("version"), snapshot.get("timeframe"), snapshot.get("indicator_history_size")) != \
+                (SNAPSHOT_VERSION, self.timeframe, self.indicator_history_size):
+            print(f"Ignoring the snapshot {path}, it was taken with other settings")
+            return 0
+
+        pairs = None if pairs is None else set(pairs)
+        timeframes = {self.timeframe, *self.higher_timeframes}
+        for (pair, pairs_timeframe), indicator_stream in snapshot["indicator_streams"].items():
+            if pairs_timeframe in timeframes and (pairs is None or pair in pairs):
+                indicator_stream.configure(self.enabled_indicators, self.indicator_params)
+                self.indicator_streams[(pair, pairs_timeframe)] = indicator_stream
+        for (pair, higher_timeframe), resampler in snapshot["resamplers"].items():
+            if higher_timeframe in self.higher_timeframes and (pairs is None or pair in pairs):
+                self.resamplers[(pair, higher_timeframe)] = resampler
+
+        return len(self.indicator_streams)
+
+    def _get_stream(self, pair: str, pairs_timeframe: str) -> IndicatorStream:
+        indicator_stream = self.indicator_streams.get((pair, pairs_timeframe))
+        if indicator_stream is None:
+            indicator_stream = IndicatorStream(history_size=self.indicator_history_size, indicators=self.enabled_indicators,
+                                               params=self.indicator_params)
+            self.indicator_streams[(pair, pairs_timeframe)] = indicator_stream
+
+        return indicator_stream
+
+    def _panel_batch(self, pairs_data: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        panel = CandlePanel.from_frames(pairs_data)
+        with metrics.stage("indicators"):
+            panel_indicators = compute_panel_indicators(panel.high, panel.low, panel.close, indicators=self.enabled_indicators,
+                                                        **self.indicator_params)
+        with metrics.stage("confirmations"):
+            batch = evaluate_batch(panel_indicators, panel.high, panel.low, panel.close, self.recent_window_size, self.enabled_confirmations)
+
+        return panel.pairs, batch
+
+    def _stream_batch(self, pairs_data: Dict[str, pd.DataFrame], pairs_timeframe: str) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """
+        Bring the indicator stream of every pair up to date and evaluate the vectorized checks on the latest candle of every pair at once. Only
+        the last rows the checks look back over are stacked, so no indicator DataFrame is built. Pairs with fewer rows than that are left out (see
+        screen() for those with an active signal).
+        """
+        checks = [check for check in self.confirmations.checks if check.series is not None]
+        lookback = max((check.get_lookback(self.recent_window_size) for check in checks), default=1)
+        columns = required_indicator_columns(checks)
+        timeframe_ms = utils.timeframe_to_ms(pairs_timeframe)
+
+        pairs = []
+        rows = {column: [] for column in columns}
+        prices = {"high": [], "low": [], "close": []}
+        for pair, pair_df in pairs_data.items():
+            try:
+                with metrics.stage("indicators", pair):
+                    indicator_stream = self._get_stream(pair, pairs_timeframe)
+                    indicator_stream.sync(pair_df, timeframe_ms, as_frame=False)
+                    values = indicator_stream.recent_values(columns, lookback)
+            except Exception as e:
+                print(e)
+                continue
+
+            if len(pair_df) < lookback or any(len(column_values) < lookback for column_values in values.values()):
+                continue
+            pairs.append(pair)
+            for column in columns:
+                rows[column].append(values[column])
+            for price in prices:
+                prices[price].append(np.asarray(pair_df[price], dtype=np.float64)[-lookback:])
+
+        indicators = {column: np.array(rows[column]).reshape(len(pairs), lookback) for column in columns}
+        high, low, close = (np.array(prices[price]).reshape(len(pairs), lookback) for price in ("high", "low", "close"))
+        with metrics.stage("confirmations"):
+            batch = evaluate_batch(indicators, high, low, close, self.recent_window_size, [check.name for check in checks])
+
+        return pairs, batch
+
+    def evaluate_confirmations(self, pairs_data: Dict[str, pd.DataFrame], pairs_timeframe: str = None) -> Dict[str, dict]:
+        """
+        Evaluate the enabled confirmation checks on the latest candle of every pair, using the configured indicator mode.
+        """
+        pairs_timeframe = pairs_timeframe or self.timeframe
+        if self.indicator_mode == "panel":
+            pairs, batch = self._panel_batch(pairs_data)
+            return {pair: {name: float(values[i]) for name, values in batch.items()} for i, pair in enumerate(pairs)}
+
+        confirmations_data = {}
+        for pair, pair_df in pairs_data.items():
+            try:
+                indicator_stream = self._get_stream(pair, pairs_timeframe)
+                with metrics.stage("indicators", pair):
+                    indicators_df = indicator_stream.sync(pair_df, utils.timeframe_to_ms(pairs_timeframe))
+                with metrics.stage("confirmations", pair):
+                    self.confirmations.update_indicators(indicators_df, pair_df)
+                    confirmations_data[pair] = self.confirmations.aggregate_sentiments()
+            except Exception as e:
+                print(e)
+                continue
+
+        return confirmations_data
+
+    def screen(self, pairs_data: Dict[str, pd.DataFrame], keep_pairs: Iterable[str] = ()) -> Dict[str, dict]:
+        """
+        Screen every pair with the vectorized checks and evaluate the confirmations of the pairs that can reach a strong signal, and of
+        keep_pairs. If every enabled check has a vectorized version, the screen already has the confirmation values and nothing is evaluated
+        twice. The pairs of keep_pairs the screen left out (e.g. with too little history for the vectorized checks) are evaluated like without
+        screening, so a pair with an active signal is never dropped.
+
+        Returns:
+            dict: The confirmation values of the pairs that passed the screen.
+        """
+        if self.indicator_mode == "panel":
+            pairs, batch = self._panel_batch(pairs_data)
+        else:
+            pairs, batch = self._stream_batch(pairs_data, self.timeframe)
+
+        keep_pairs = [pair for pair in keep_pairs if pair in pairs_data]
+        self.screening_index.update(pairs, batch, len(self.confirmations.checks))
+        candidates = self.screening_index.candidates(keep_pairs)
+        metrics.increment("pairs_screened_out_total", len(pairs) - len(candidates))
+
+        indices = {pair: i for i, pair in enumerate(pairs)}
+        unscreened_pairs = [pair for pair in keep_pairs if pair not in indices]
+        if len(batch) == len(self.confirmations.checks):
+            confirmations_data = {pair: {name: float(values[indices[pair]]) for name, values in batch.items()} for pair in candidates}
+            if unscreened_pairs:
+                confirmations_data.update(self.evaluate_confirmations({pair: pairs_data[pair] for pair in unscreened_pairs}))
+            return confirmations_data
+
+        return self.evaluate_confirmations({pair: pairs_data[pair] for pair in candidates + unscreened_pairs})
+
+    def derive_timeframe(self, pairs_data: Dict[str, pd.DataFrame], higher_timeframe: str) -> Dict[str, pd.DataFrame]:
+        """
+        Derive the candles of a higher timeframe from the base timeframe candles of every pair.
+        """
+        derived_data = {}
+        for pair, pair_df in pairs_data.items():
+            resampler = self.resamplers.get((pair, higher_timeframe))
+            if resampler is None:
+                resampler = CandleResampler(self.timeframe, higher_timeframe, capacity=self.indicator_history_size * 2)
+                self.resamplers[(pair, higher_timeframe)] = resampler
+            derived_data[pair] = resampler.update(pair_df)
+
+        return derived_data
+
+    def prepare(self, pair: str, pair_df: pd.DataFrame) -> Optional[Tuple[Dict[str, dict], Dict[str, Dict[str, dict]]]]:
+        """
+        Do the CPU-heavy part of the evaluation of a single pair, so it can run pair by pair as the candles arrive (see data.pipeline).
+
+        In streaming mode without screening, a pair's evaluation doesn't depend on the other pairs, so the pair is fully evaluated and the result
+        is returned. When the engine screens the pairs, only the base timeframe indicator stream is brought up to date, since the screen compares
+        all the pairs and only the pairs that pass it need their higher timeframes. Panel mode computes every pair at once, so nothing is done.
+
+        Returns:
+            tuple: The result of evaluate() for the pair, or None if evaluate() has to run on all the pairs once they are prepared.
+        """
+        if self.indicator_mode == "panel":
+            return None
+        if self.screening_index is None:
+            return self.evaluate({pair: pair_df})
+
+        try:
+            with metrics.stage("indicators", pair):
+                self._get_stream(pair, self.timeframe).sync(pair_df, utils.timeframe_to_ms(self.timeframe), as_frame=False)
+        except Exception as e:
+            print(e)
+
+        return None
+
+    def evaluate(self, pairs_data: Dict[str, pd.DataFrame], keep_pairs: Iterable[str] = ()) -> Tuple[Dict[str, dict], Dict[str, Dict[str, dict]]]:
+        """
+        Evaluate the confirmations of every pair on the base timeframe and on every higher timeframe. If the engine screens the pairs, only the
+        pairs that passed the screen are evaluated on the higher timeframes and returned.
+
+        Args:
+            pairs_data (dict): The base timeframe candles of every pair.
+            keep_pairs (list): The pairs that are evaluated even if they can't reach a strong signal, when the engine screens the pairs.
+
+        Returns:
+            tuple: The confirmation values of every pair on the base timeframe, and those on each higher timeframe keyed by timeframe.
+        """
+        if self.screening_index is None:
+            confirmations_data = self.evaluate_confirmations(pairs_data)
+        else:
+            confirmations_data = self.screen(pairs_data, keep_pairs)
+            pairs_data = {pair: pairs_data[pair] for pair in confirmations_data}
+        metrics.increment("pairs_evaluated_total", len(confirmations_data))
+
+        higher_confirmations_data = {}
+        for higher_timeframe in self.higher_timeframes:
+            with metrics.stage("resample"):
+                derived_data = self.derive_timeframe(pairs_data, higher_timeframe)
+            higher_confirmations_data[higher_timeframe] = self.evaluate_confirmations(derived_data, higher_timeframe)
+
+        return confirmations_data, higher_confirmations_data
@@ -0,0 +1,41 @@
+"""
+Candle source reading kline recordings from disk, in the layout of data.replay (<recording_dir>/<timeframe>/<pair>.json). The files are read
+again whenever they change, so a process that keeps appending to the recordings can feed the live pipeline like an exchange would.
+"""
+import os
+from typing import Dict, Tuple
+
+from data.replay import ReplayClient, load_recording
+
+
+class LocalFileClient:
+    def __init__(self, recording_dir: str):
+        """
+        Args:
+            recording_dir (str): The directory of the recordings.
+        """
+        self.recording_dir = recording_dir
+
+        # The modification time and the client serving each loaded recording file, keyed by (symbol, timeframe)
+        self.recordings: Dict[Tuple[str, str], Tuple[int, ReplayClient]] = {}
+
+    def _get_client(self, symbol: str, timeframe: str) -> ReplayClient:
+        mtime = os.stat(os.path.join(self.recording_dir, timeframe, f"{symbol}.json")).st_mtime_ns
+        loaded = self.recordings.get((symbol, timeframe))
+        if loaded is None or loaded[0] != mtime:
+            loaded = (mtime, ReplayClient(load_recording(self.recording_dir, timeframe, [symbol])))
+            self.recordings[(symbol, timeframe)] = loaded
+
+        return loaded[1]
+
+    async def get_klines(self, symbol: str, timeframe: str, start_time: int, end_time: int, num_candles: int, timeframe_ms: int) -> list:
+        """
+        Return up to num_candles recorded klines of the symbol that opened between start_time and end_time.
+
+        Raises:
+            FileNotFoundError: If the symbol has no recording for the timeframe.
+        """
+        return await self._get_client(symbol, timeframe).get_klines(symbol, timeframe, start_time, end_time, num_candles, timeframe_ms)
+
+    async def close(self):
+        pass
@@ -0,0 +1,103 @@
+"""
+HTTP client for the Nobitex market data API. Candles come from the TradingView UDF history endpoint, which takes resolutions instead of Binance
+intervals and times in seconds, and returns one array per column. get_klines() converts them to kline rows in the format of the Binance klines
+endpoint, so the candles of both exchanges go through the same parsing, candle store and indicator pipeline.
+
+The session handling and retries are shared with BinanceClient. Nobitex doesn't report a request weight, so the weight budget is a plain number
+of requests per minute.
+"""
+from typing import Optional
+
+from data.binance_client import BinanceClient
+
+NOBITEX_API_URL = "https://api.nobitex.ir"
+
+# The UDF resolution of each supported timeframe
+NOBITEX_RESOLUTIONS = {
+    "1m": "1",
+    "5m": "5",
+    "15m": "15",
+    "30m": "30",
+    "1h": "60",
+    "3h": "180",
+    "4h": "240",
+    "6h": "360",
+    "12h": "720",
+    "1d": "D",
+    "2d": "2D",
+    "3d": "3D"
+}
+
+# The maximum number of candles requested at once
+NOBITEX_CANDLES_LIMIT = 500
+
+
+class NobitexAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Nobitex API error {status}: {message}")
+        self.status = status
+
+
+def udf_to_klines(history: dict, timeframe_ms: int) -> list:
+    """
+    Convert a UDF history response into kline rows in the format of the Binance klines endpoint.
+    """
+    return [
+        [open_time * 1000, str(open), str(high), str(low), str(close), str(volume), open_time * 1000 + timeframe_ms - 1, "0", 0, "0", "0", "0"]
+        for open_time, open, high, low, close, volume in zip(history["t"], history["o"], history["h"], history["l"], history["c"], history["v"])
+    ]
+
+
+class NobitexClient(BinanceClient):
+    error_class = NobitexAPIError
+    weight_counter = "nobitex_requests_total"
+
+    def __init__(self, base_url: str = NOBITEX_API_URL, max_concurrency: int = 5, requests_per_minute: int = 60, max_retries: int = 5,
+                 backoff_base: float = 1.0, max_backoff: float = 60, timeout: float = 30):
+        """
+        Args:
+            base_url (str): The base URL of the API.
+            max_concurrency (int): The maximum number of requests in flight at once.
+            requests_per_minute (int): The number of requests sent per minute at most.
+            max_retries (int): The number of times a failed request is retried.
+            backoff_base (float): The wait before the first retry in seconds. Doubled on every further retry.
+            max_backoff (float): The maximum wait between retries in seconds.
+            timeout (float): The total timeout of a request in seconds.
+        """
+        super().__init__(base_url, max_concurrency, weight_limit=requests_per_minute, weight_margin=1.0, max_retries=max_retries,
+                         backoff_base=backoff_base, max_backoff=max_backoff, timeout=timeout)
+
+    async def get_klines(self, symbol: str, timeframe: str, start_time: int, end_time: int, num_candles: int, timeframe_ms: int) -> list:
+        """
+        Fetch up to num_candles candles starting at start_time, in as many requests as NOBITEX_CANDLES_LIMIT requires. The arguments are the same
+        as those of BinanceClient.get_klines(), with the symbol in Nobitex format (e.g. 'BTCIRT').
+
+        Returns:
+            list: The candles as kline rows in the format of the Binance klines endpoint. Periods without trades have no candle.
+        """
+        resolution: Optional[str] = NOBITEX_RESOLUTIONS.get(timeframe)
+        if resolution is None:
+            raise ValueError(f"Timeframe {timeframe} isn't supported by Nobitex")
+
+        # Pages are aligned to the candle open times, so no candle falls between the end of a page and the start of the next one
+        start_time = -(-start_time // timeframe_ms) * timeframe_ms
+        klines = []
+        while len(klines) < num_candles and start_time <= end_time:
+            page_end_time = min(end_time, start_time + (min(num_candles - len(klines), NOBITEX_CANDLES_LIMIT) - 1) * timeframe_ms)
+            params = {
+                "symbol": symbol,
+                "resolution": resolution,
+                "from": start_time // 1000,
+                "to": page_end_time // 1000
+            }
+            history = await self.get("/market/udf/history", params)
+
+            status = history.get("s") if isinstance(history, dict) else None
+            if status == "ok":
+                klines.extend(row for row in udf_to_klines(history, timeframe_ms) if start_time <= row[0] <= page_end_time)
+            elif status != "no_data":
+                raise NobitexAPIError(0, f"Unexpected history response: {history}")
+
+            start_time = page_end_time + timeframe_ms
+
+        return klines[:num_candles]
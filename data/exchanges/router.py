@@ -0,0 +1,64 @@
+"""
+Routing of candle requests to the clients of several exchanges. A pair is identified as "<exchange>:<symbol>" (e.g. "nobitex:BTCIRT"), and pairs
+without an exchange prefix belong to the default exchange, so a plain Binance pair list keeps working unchanged.
+
+Every client implements the interface of BinanceClient that the candle store uses:
+
+- async get_klines(symbol, timeframe, start_time, end_time, num_candles, timeframe_ms) returning kline rows in the format of the Binance klines
+  endpoint,
+- async close().
+
+The ExchangeRouter implements the same interface over the pair identifiers, so a single CandleStore caches the normalized candles of every
+exchange, and a single CandleStore.update() fetches all of them concurrently in one event loop. Each client keeps its own concurrency and rate
+limits, so a slow exchange only adds waiting for its own pairs.
+"""
+from typing import Dict, Optional, Tuple
+
+EXCHANGE_SEPARATOR = ":"
+
+
+def split_pair(pair: str, default_exchange: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """
+    Split a pair identifier into its exchange and its symbol. Pairs without an exchange prefix get default_exchange.
+    """
+    exchange, separator, symbol = pair.partition(EXCHANGE_SEPARATOR)
+    if not separator:
+        return default_exchange, pair
+
+    return exchange, symbol
+
+
+class ExchangeRouter:
+    def __init__(self, clients: Dict[str, object], default_exchange: str = "binance", symbols: Dict[str, Dict[str, str]] = None):
+        """
+        Args:
+            clients (dict): The client of each exchange, keyed by exchange name.
+            default_exchange (str): The exchange of pairs without an exchange prefix.
+            symbols (dict, optional): Per exchange, the symbols that are named differently on the exchange than in the pair list, e.g.
+                {"nobitex": {"BTCUSDT": "BTCUSDT", "BTCTMN": "BTCIRT"}}. Other symbols are sent as they are.
+        """
+        self.clients = clients
+        self.default_exchange = default_exchange
+        self.symbols = symbols or {}
+
+    def resolve(self, pair: str) -> Tuple[object, str]:
+        """
+        Return the client of the exchange of a pair, and the symbol of the pair on that exchange.
+
+        Raises:
+            ValueError: If the exchange of the pair has no client.
+        """
+        exchange, symbol = split_pair(pair, self.default_exchange)
+        client = self.clients.get(exchange)
+        if client is None:
+            raise ValueError(f"No client for the exchange of {pair}")
+
+        return client, self.symbols.get(exchange, {}).get(symbol, symbol)
+
+    async def get_klines(self, pair: str, timeframe: str, start_time: int, end_time: int, num_candles: int, timeframe_ms: int) -> list:
+        client, symbol = self.resolve(pair)
+        return await client.get_klines(symbol, timeframe, start_time, end_time, num_candles, timeframe_ms)
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
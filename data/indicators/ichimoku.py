@@ -1,18 +1,27 @@
 import pandas as pd
 
+from data.indicators import kernels
+from data.indicators.rolling import RollingMax, RollingMin, Shift
+
 
 class Ichimoku:
     def __init__(self, pair_df: pd.DataFrame):
         self.pair_df: pd.DataFrame = pair_df
         self.ichimoku_df: pd.DataFrame = pd.DataFrame()
 
+    def midpoints(self, windows: tuple) -> dict:
+        """
+        Calculate the midpoint between the highest high and the lowest low of several windows, in one pass over the candles.
+        """
+        highest_highs = kernels.rolling_max(self.pair_df.high.to_numpy(dtype=float), windows)
+        lowest_lows = kernels.rolling_min(self.pair_df.low.to_numpy(dtype=float), windows)
+        return {window: pd.Series((highest_highs[window] + lowest_lows[window]) / 2, index=self.pair_df.index) for window in windows}
+
     def tenkan_line(self, window_size: int = 9) -> pd.Series:
         """
         Calculate the Tenka line.
         """
-        tenka_highs = self.pair_df.high.rolling(window_size).max()
-        tenka_lows = self.pair_df.low.rolling(window_size).min()
-        return (tenka_highs + tenka_lows) / 2
+        return self.midpoints((window_size,))[window_size]
 
     def kijun_line(self, window_size: int = 26) -> pd.Series:
         """
@@ -20,19 +29,22 @@ class Ichimoku:
         """
         return self.tenkan_line(window_size=window_size)
 
-    def lead_span_a(self, shift_size: int = 26) -> pd.Series:
+    def lead_span_a(self, shift_size: int = 26, tenkan: pd.Series = None, kijun: pd.Series = None) -> pd.Series:
         """
-        Calculate the Lead Span A line.
+        Calculate the Lead Span A line. Already calculated Tenkan and Kijun lines can be passed in to avoid calculating them again.
         """
-        return ((self.tenkan_line() + self.kijun_line()) / 2).shift(shift_size)
+        if tenkan is None:
+            tenkan = self.tenkan_line()
+        if kijun is None:
+            kijun = self.kijun_line()
+
+        return ((tenkan + kijun) / 2).shift(shift_size)
 
     def lead_span_b(self, window_size: int = 52, shift_size: int = 26) -> pd.Series:
         """
         Calculate the Lead Span B line.
         """
-        highest_high = self.pair_df.high.rolling(window_size).max()
-        lowest_low = self.pair_df.low.rolling(window_size).min()
-        return ((highest_high + lowest_low) / 2).shift(shift_size)
+        return self.midpoints((window_size,))[window_size].shift(shift_size)
 
     def lagging_span(self, shift_size: int = 26) -> pd.Series:
         """
@@ -46,12 +58,16 @@ class Ichimoku:
         """
         self.pair_df = pair_df
 
-        lead_span_a_series = self.lead_span_a()
-        lead_span_b_series = self.lead_span_b()
+        # The Tenkan, Kijun and Lead Span B windows share one pass of the rolling extrema kernels
+        midpoints = self.midpoints((9, 26, 52))
+        tenkan_series = midpoints[9]
+        kijun_series = midpoints[26]
+        lead_span_a_series = self.lead_span_a(tenkan=tenkan_series, kijun=kijun_series)
+        lead_span_b_series = midpoints[52].shift(26)
 
         self.ichimoku_df = pd.DataFrame({
-            "tenkan": self.tenkan_line(),
-            "kijun": self.kijun_line(),
+            "tenkan": tenkan_series,
+            "kijun": kijun_series,
             "lead_span_a": lead_span_a_series,
             "lead_span_b": lead_span_b_series,
             "lagging_span": self.lagging_span(),
@@ -59,3 +75,52 @@ class Ichimoku:
         })
 
         return self.ichimoku_df
+
+
+class IchimokuStream:
+    """
+    Streaming version of Ichimoku.update_ichimoku_df(). Each call to update() consumes one candle and returns the Ichimoku values for it. The
+    lagging span isn't included, since it's the close price 26 candles in the future and is always NaN for the newest candle.
+    """
+
+    def __init__(self, tenkan_window: int = 9, kijun_window: int = 26, lead_span_b_window: int = 52, shift_size: int = 26):
+        self.tenkan_high = RollingMax(tenkan_window)
+        self.tenkan_low = RollingMin(tenkan_window)
+        self.kijun_high = RollingMax(kijun_window)
+        self.kijun_low = RollingMin(kijun_window)
+        self.lead_span_b_high = RollingMax(lead_span_b_window)
+        self.lead_span_b_low = RollingMin(lead_span_b_window)
+
+        self.lead_span_a_shift = Shift(shift_size)
+        self.lead_span_b_shift = Shift(shift_size)
+
+    def update(self, high: float, low: float) -> dict:
+        tenkan = (self.tenkan_high.update(high) + self.tenkan_low.update(low)) / 2
+        kijun = (self.kijun_high.update(high) + self.kijun_low.update(low)) / 2
+
+        lead_span_a = self.lead_span_a_shift.update((tenkan + kijun) / 2)
+        lead_span_b = self.lead_span_b_shift.update((self.lead_span_b_high.update(high) + self.lead_span_b_low.update(low)) / 2)
+
+        return self._values(tenkan, kijun, lead_span_a, lead_span_b)
+
+    def peek(self, high: float, low: float) -> dict:
+        """
+        Return the values update() would return for this candle, without changing the state.
+        """
+        tenkan = (self.tenkan_high.peek(high) + self.tenkan_low.peek(low)) / 2
+        kijun = (self.kijun_high.peek(high) + self.kijun_low.peek(low)) / 2
+
+        lead_span_a = self.lead_span_a_shift.peek((tenkan + kijun) / 2)
+        lead_span_b = self.lead_span_b_shift.peek((self.lead_span_b_high.peek(high) + self.lead_span_b_low.peek(low)) / 2)
+
+        return self._values(tenkan, kijun, lead_span_a, lead_span_b)
+
+    @staticmethod
+    def _values(tenkan: float, kijun: float, lead_span_a: float, lead_span_b: float) -> dict:
+        return {
+            "tenkan": tenkan,
+            "kijun": kijun,
+            "lead_span_a": lead_span_a,
+            "lead_span_b": lead_span_b,
+            "kumo": lead_span_a - lead_span_b
+        }
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from data.indicators.rolling import EWMean, RollingMean
+
 
 def keltner(pair_df: pd.DataFrame, window_size=20, atr_period=14, multiplier=2) -> pd.DataFrame:
     """
@@ -32,3 +34,30 @@ def keltner(pair_df: pd.DataFrame, window_size=20, atr_period=14, multiplier=2)
         "upper_keltner_band": upper_band,
         "lower_keltner_band": lower_band
     })
+
+
+class KeltnerStream:
+    """
+    Streaming version of keltner(). Each call to update() consumes one candle and returns the Keltner band values for it.
+    """
+
+    def __init__(self, window_size=20, atr_period=14, multiplier=2):
+        self.middle_band = EWMean(window_size)
+        self.atr = RollingMean(atr_period)
+        self.multiplier = multiplier
+
+    def update(self, high: float, low: float, close: float) -> dict:
+        return self._bands(self.middle_band.update(close), self.atr.update(high - low))
+
+    def peek(self, high: float, low: float, close: float) -> dict:
+        """
+        Return the values update() would return for this candle, without changing the state.
+        """
+        return self._bands(self.middle_band.peek(close), self.atr.peek(high - low))
+
+    def _bands(self, middle_band: float, atr: float) -> dict:
+        return {
+            "middle_keltner_band": middle_band,
+            "upper_keltner_band": middle_band + (atr * self.multiplier),
+            "lower_keltner_band": middle_band - (atr * self.multiplier)
+        }
@@ -0,0 +1,204 @@
+"""
+Array kernels shared by the batch and panel indicators. Every kernel takes a 1-D series or a 2-D (pairs x candles) panel and works along the last
+axis.
+
+- rolling_max() / rolling_min() compute several windows in one pass. The extrema over spans of 1, 2, 4, ... candles are built by doubling (the
+  extremum of two adjacent spans), and each window is the extremum of two overlapping spans of the largest power of two that fits in it. The
+  doubling levels are shared by every window, so the Ichimoku windows 9, 26 and 52 cost about as much as the largest of them alone.
+- wilder_mean() is Wilder's smoothed moving average: the mean of the first window values, then avg = (avg * (window - 1) + value) / window.
+  NaN values are skipped: their result is NaN and the average carries over to the next value.
+- wilder_rsi() is the RSI with Wilder smoothing of the gains and losses.
+
+The results are exact: the rolling extrema equal pandas rolling().max()/min() (NaN while the window isn't full or contains a NaN), and
+wilder_mean() sums its seed window sequentially, like the streaming rolling.WilderMean. If numba is installed, compiled loops are used instead of
+the NumPy versions, giving the same results.
+"""
+from typing import Dict, Iterable
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Whether the compiled kernels are used. Can be switched off to compare against the NumPy versions.
+JIT_ENABLED = numba is not None
+
+
+def _as_panel(values) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values.reshape(1, -1) if values.ndim == 1 else values
+
+
+def _rolling_extrema_numpy(values: np.ndarray, windows: list, extremum: np.ufunc) -> Dict[int, np.ndarray]:
+    n_candles = values.shape[-1]
+    results = {}
+
+    # level[..., i] is the extremum of the span candles ending at candle i
+    level = values
+    span = 1
+    for window in windows:
+        while span * 2 <= window:
+            shifted = np.full(values.shape, np.nan)
+            if span < n_candles:
+                shifted[..., span:] = level[..., :-span]
+            level = extremum(level, shifted)
+            span *= 2
+
+        result = np.full(values.shape, np.nan)
+        if n_candles >= window:
+            # Two spans, ending at candle i and at candle i - offset, cover the window ending at candle i
+            offset = window - span
+            result[..., window - 1:] = extremum(level[..., window - 1:], level[..., window - 1 - offset:n_candles - offset])
+        results[window] = result
+
+    return results
+
+
+def _wilder_mean_numpy(values: np.ndarray, window: int) -> np.ndarray:
+    n_rows, n_candles = values.shape
+    result = np.full(values.shape, np.nan)
+
+    # Every row starts at its first value, so NaN padding in front of shorter histories is skipped, and so are later NaN values
+    count = np.zeros(n_rows, dtype=np.int64)
+    total = np.zeros(n_rows)
+    average = np.full(n_rows, np.nan)
+    for i in range(n_candles):
+        value = values[:, i]
+        valid = ~np.isnan(value)
+        seeding = valid & (count < window)
+        smoothing = valid & ~seeding
+
+        total[seeding] += value[seeding]
+        count[seeding] += 1
+        seeded = seeding & (count == window)
+        average[seeded] = total[seeded] / window
+        average[smoothing] = (average[smoothing] * (window - 1) + value[smoothing]) / window
+
+        done = seeded | smoothing
+        result[done, i] = average[done]
+
+    return result
+
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _rolling_extrema_jit(values, windows, is_max):
+        n_rows, n_candles = values.shape
+        results = np.full((len(windows), n_rows, n_candles), np.nan)
+        queue = np.empty(n_candles, dtype=np.int64)
+
+        # A monotonic queue of candle indices per window, like rolling.RollingMax
+        for w in range(len(windows)):
+            window = windows[w]
+            for row in range(n_rows):
+                head = 0
+                tail = 0
+                last_nan_index = -window - 1
+                for i in range(n_candles):
+                    value = values[row, i]
+                    if value != value:
+                        last_nan_index = i
+                    else:
+                        while tail > head and ((values[row, queue[tail - 1]] <= value) if is_max else (values[row, queue[tail - 1]] >= value)):
+                            tail -= 1
+                        queue[tail] = i
+                        tail += 1
+
+                    while tail > head and queue[head] <= i - window:
+                        head += 1
+
+                    if i + 1 >= window and last_nan_index <= i - window:
+                        results[w, row, i] = values[row, queue[head]]
+
+        return results
+
+    @numba.njit(cache=True)
+    def _wilder_mean_jit(values, window):
+        n_rows, n_candles = values.shape
+        result = np.full(values.shape, np.nan)
+
+        for row in range(n_rows):
+            count = 0
+            total = 0.0
+            average = np.nan
+            for i in range(n_candles):
+                value = values[row, i]
+                if value != value:
+                    continue
+                if count < window:
+                    total += value
+                    count += 1
+                    if count == window:
+                        average = total / window
+                        result[row, i] = average
+                else:
+                    average = (average * (window - 1) + value) / window
+                    result[row, i] = average
+
+        return result
+
+
+def _rolling_extrema(values, windows: Iterable[int], is_max: bool) -> Dict[int, np.ndarray]:
+    panel = _as_panel(values)
+    windows = sorted(set(windows))
+
+    if JIT_ENABLED:
+        stacked = _rolling_extrema_jit(panel, np.array(windows, dtype=np.int64), is_max)
+        results = {window: stacked[i] for i, window in enumerate(windows)}
+    else:
+        results = _rolling_extrema_numpy(panel, windows, np.maximum if is_max else np.minimum)
+
+    return {window: result.reshape(np.shape(values)) for window, result in results.items()}
+
+
+def rolling_max(values, windows: Iterable[int]) -> Dict[int, np.ndarray]:
+    """
+    Rolling maximum over several windows at once. Equivalent to pd.Series.rolling(window).max() for every window.
+
+    Args:
+        values: A 1-D series or a 2-D (pairs x candles) panel.
+        windows (list): The window sizes.
+
+    Returns:
+        dict: The rolling maximum for each window, in the shape of values.
+    """
+    return _rolling_extrema(values, windows, is_max=True)
+
+
+def rolling_min(values, windows: Iterable[int]) -> Dict[int, np.ndarray]:
+    """
+    Rolling minimum over several windows at once. Equivalent to pd.Series.rolling(window).min() for every window.
+    """
+    return _rolling_extrema(values, windows, is_max=False)
+
+
+def wilder_mean(values, window: int) -> np.ndarray:
+    """
+    Wilder's smoothed moving average, seeded with the mean of the first window values of each row. NaN values are skipped: they're NaN in the
+    result and don't change the average.
+    """
+    panel = _as_panel(values)
+    result = _wilder_mean_jit(panel, window) if JIT_ENABLED else _wilder_mean_numpy(panel, window)
+
+    return result.reshape(np.shape(values))
+
+
+def wilder_rsi(close, window: int = 14) -> np.ndarray:
+    """
+    The RSI with Wilder smoothing of the average gains and losses, instead of the simple moving averages of rsi(). The first window changes of
+    each row seed the averages, so the first value is at the window-th candle after the first close. A change from or to a NaN close is NaN, and
+    is skipped by the averages like a missing candle, so a gap doesn't end the RSI.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.full(close.shape, np.nan)
+    delta[..., 1:] = close[..., 1:] - close[..., :-1]
+
+    # NaN changes (the first candle, padding and gaps) stay NaN, so they don't count as candles without a gain or loss
+    gain = np.where(np.isnan(delta), np.nan, np.where(delta > 0, delta, 0.0))
+    loss = np.where(np.isnan(delta), np.nan, np.where(delta < 0, -delta, 0.0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = wilder_mean(gain, window) / wilder_mean(loss, window)
+        return 100 - (100 / (1 + rs))
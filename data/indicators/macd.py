@@ -1,5 +1,7 @@
 import pandas as pd
 
+from data.indicators.rolling import EWMean
+
 
 def macd(pair_df: pd.DataFrame, short_window: int = 12, long_window: int = 26, signal_window: int = 9) -> pd.DataFrame:
     """
@@ -24,3 +26,33 @@ def macd(pair_df: pd.DataFrame, short_window: int = 12, long_window: int = 26, s
         "macd_line": macd_line,
         "signal_line": signal_line
     })
+
+
+class MACDStream:
+    """
+    Streaming version of macd(). Each call to update() consumes one close price and returns the MACD and Signal line values for it.
+    """
+
+    def __init__(self, short_window: int = 12, long_window: int = 26, signal_window: int = 9):
+        self.short_ema = EWMean(short_window)
+        self.long_ema = EWMean(long_window)
+        self.signal_ema = EWMean(signal_window)
+
+    def update(self, close: float) -> dict:
+        macd_line = self.short_ema.update(close) - self.long_ema.update(close)
+
+        return {
+            "macd_line": macd_line,
+            "signal_line": self.signal_ema.update(macd_line)
+        }
+
+    def peek(self, close: float) -> dict:
+        """
+        Return the values update() would return for this close price, without changing the state.
+        """
+        macd_line = self.short_ema.peek(close) - self.long_ema.peek(close)
+
+        return {
+            "macd_line": macd_line,
+            "signal_line": self.signal_ema.peek(macd_line)
+        }
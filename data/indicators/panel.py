@@ -0,0 +1,226 @@
+"""
+Vectorized indicator computation over a panel of pairs. The candles of all pairs are laid out as aligned (pairs x candles) NumPy arrays, and every
+indicator is computed for every pair at once with a handful of array operations, instead of building and concatenating DataFrames pair by pair.
+Rolling means and EWMs go through pandas on the transposed 2-D array, so the results match the per-pair batch functions exactly.
+"""
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+from data.indicators import kernels
+from data.indicators.streaming import INDICATOR_COLUMNS
+
+INDICATOR_DTYPE = np.dtype([(column, np.float64) for column in INDICATOR_COLUMNS])
+
+
+class CandlePanel:
+    def __init__(self, pairs: List[str], time: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        """
+        Args:
+            pairs (list): The pair of each row of the arrays.
+            time (np.ndarray): The candle open times in milliseconds since epoch, -1 where a pair has no candle.
+            open (np.ndarray): The open prices, NaN where a pair has no candle.
+            high (np.ndarray): The high prices, NaN where a pair has no candle.
+            low (np.ndarray): The low prices, NaN where a pair has no candle.
+            close (np.ndarray): The close prices, NaN where a pair has no candle.
+        """
+        self.pairs = pairs
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+
+    @classmethod
+    def from_frames(cls, pairs_data: Dict[str, pd.DataFrame], length: int = None) -> "CandlePanel":
+        """
+        Build a panel from per-pair candle DataFrames or CandleBuffers. The candles of each pair are aligned on the right, so the last column
+        holds the latest candle of every pair. Pairs with fewer candles than the panel length are padded with NaN at the start, which gives the
+        same indicator values as computing them over the shorter history.
+
+        Args:
+            pairs_data (dict): A dictionary where keys are trading pair symbols and values are DataFrames or CandleBuffers of their candles.
+            length (int, optional): The number of candles in the panel. Defaults to the longest history in pairs_data.
+
+        Returns:
+            CandlePanel: The aligned panel.
+        """
+        pairs = list(pairs_data.keys())
+        if length is None:
+            length = max((len(pair_df) for pair_df in pairs_data.values()), default=0)
+
+        shape = (len(pairs), length)
+        time = np.full(shape, -1, dtype=np.int64)
+        prices = {column: np.full(shape, np.nan) for column in ["open", "high", "low", "close"]}
+
+        for i, pair in enumerate(pairs):
+            pair_df = pairs_data[pair]
+            n_candles = min(len(pair_df), length)
+            if n_candles == 0:
+                continue
+
+            time[i, -n_candles:] = utils.to_milliseconds(pair_df["time"])[-n_candles:]
+            for column, values in prices.items():
+                values[i, -n_candles:] = np.asarray(pair_df[column], dtype=np.float64)[-n_candles:]
+
+        return cls(pairs, time, **prices)
+
+
+def _rolling_mean(values: np.ndarray, window_size: int) -> np.ndarray:
+    return pd.DataFrame(values.T).rolling(window_size).mean().to_numpy().T
+
+
+def _ewm_mean(values: np.ndarray, span: int) -> np.ndarray:
+    return pd.DataFrame(values.T).ewm(span=span, adjust=False).mean().to_numpy().T
+
+
+def _shift(values: np.ndarray, shift_size: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    if shift_size > 0:
+        result[:, shift_size:] = values[:, :-shift_size]
+    elif shift_size < 0:
+        result[:, :shift_size] = values[:, -shift_size:]
+    else:
+        result[:] = values
+
+    return result
+
+
+def ichimoku_panel(high: np.ndarray, low: np.ndarray, close: np.ndarray, tenkan_window: int = 9, kijun_window: int = 26,
+                   lead_span_b_window: int = 52, ichimoku_shift: int = 26) -> Dict[str, np.ndarray]:
+    """
+    Panel version of Ichimoku.update_ichimoku_df().
+    """
+    windows = (tenkan_window, kijun_window, lead_span_b_window)
+    highest_highs = kernels.rolling_max(high, windows)
+    lowest_lows = kernels.rolling_min(low, windows)
+
+    tenkan = (highest_highs[tenkan_window] + lowest_lows[tenkan_window]) / 2
+    kijun = (highest_highs[kijun_window] + lowest_lows[kijun_window]) / 2
+    lead_span_a = _shift((tenkan + kijun) / 2, ichimoku_shift)
+    lead_span_b = _shift((highest_highs[lead_span_b_window] + lowest_lows[lead_span_b_window]) / 2, ichimoku_shift)
+
+    return {
+        "tenkan": tenkan,
+        "kijun": kijun,
+        "lead_span_a": lead_span_a,
+        "lead_span_b": lead_span_b,
+        "lagging_span": _shift(close, -ichimoku_shift),
+        "kumo": lead_span_a - lead_span_b
+    }
+
+
+def rsi_panel(high: np.ndarray, low: np.ndarray, close: np.ndarray, rsi_window: int = 14, rsi_smoothing: str = "sma") -> Dict[str, np.ndarray]:
+    """
+    Panel version of rsi().
+    """
+    if rsi_smoothing == "wilder":
+        return {"rsi": kernels.wilder_rsi(close, rsi_window)}
+
+    # The first delta of a pair is NaN and counts as no gain or loss, but the padding in front of shorter histories must stay NaN
+    delta = close - _shift(close, 1)
+    padding = np.isnan(close)
+    gain = np.where(padding, np.nan, np.where(delta > 0, delta, 0.0))
+    loss = -np.where(padding, np.nan, np.where(delta < 0, delta, 0.0))
+    rs = _rolling_mean(gain, rsi_window) / _rolling_mean(loss, rsi_window)
+
+    return {"rsi": 100 - (100 / (1 + rs))}
+
+
+def macd_panel(high: np.ndarray, low: np.ndarray, close: np.ndarray, macd_short_window: int = 12, macd_long_window: int = 26,
+               macd_signal_window: int = 9) -> Dict[str, np.ndarray]:
+    """
+    Panel version of macd().
+    """
+    macd_line = _ewm_mean(close, macd_short_window) - _ewm_mean(close, macd_long_window)
+
+    return {
+        "macd_line": macd_line,
+        "signal_line": _ewm_mean(macd_line, macd_signal_window)
+    }
+
+
+def keltner_panel(high: np.ndarray, low: np.ndarray, close: np.ndarray, keltner_window: int = 20, keltner_atr_period: int = 14,
+                  keltner_multiplier: int = 2) -> Dict[str, np.ndarray]:
+    """
+    Panel version of keltner().
+    """
+    middle_band = _ewm_mean(close, keltner_window)
+    atr = _rolling_mean(high - low, keltner_atr_period)
+
+    return {
+        "middle_keltner_band": middle_band,
+        "upper_keltner_band": middle_band + (atr * keltner_multiplier),
+        "lower_keltner_band": middle_band - (atr * keltner_multiplier)
+    }
+
+
+def stochastic_panel(high: np.ndarray, low: np.ndarray, close: np.ndarray, stochastic_window: int = 9) -> Dict[str, np.ndarray]:
+    """
+    Panel version of stochastic_osc().
+    """
+    lowest_low = kernels.rolling_min(low, (stochastic_window,))[stochastic_window]
+    highest_high = kernels.rolling_max(high, (stochastic_window,))[stochastic_window]
+    stoch_k = (close - lowest_low) / (highest_high - lowest_low) * 100
+
+    return {
+        "stoch_k": stoch_k,
+        "stoch_d": _rolling_mean(stoch_k, 3)
+    }
+
+
+# The panel function of each indicator and the names of the parameters it takes. Every parameter name is unique across the indicators, so a single
+# flat dict of parameters can be split between them.
+PANEL_INDICATORS = {
+    "ichimoku": (ichimoku_panel, ("tenkan_window", "kijun_window", "lead_span_b_window", "ichimoku_shift")),
+    "rsi": (rsi_panel, ("rsi_window", "rsi_smoothing")),
+    "macd": (macd_panel, ("macd_short_window", "macd_long_window", "macd_signal_window")),
+    "keltner": (keltner_panel, ("keltner_window", "keltner_atr_period", "keltner_multiplier")),
+    "stochastic_osc": (stochastic_panel, ("stochastic_window",))
+}
+
+
+def compute_panel_indicator(name: str, high: np.ndarray, low: np.ndarray, close: np.ndarray, **params) -> Dict[str, np.ndarray]:
+    """
+    Compute a single indicator of PANEL_INDICATORS for every pair of a panel. Parameters that belong to other indicators are ignored.
+
+    Returns:
+        dict: The (pairs x candles) arrays of the indicator columns.
+    """
+    panel_function, param_names = PANEL_INDICATORS[name]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return panel_function(high, low, close, **{param: value for param, value in params.items() if param in param_names})
+
+
+def compute_panel_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray, indicators: Iterable[str] = None, **params) -> np.ndarray:
+    """
+    Compute every indicator for every pair of a (pairs x candles) panel in one vectorized pass. The parameter defaults are the same as the
+    defaults of the per-pair indicator functions, see PANEL_INDICATORS for the parameter names.
+
+    Args:
+        high (np.ndarray): The (pairs x candles) high prices.
+        low (np.ndarray): The (pairs x candles) low prices.
+        close (np.ndarray): The (pairs x candles) close prices.
+        indicators (list, optional): The names of the indicators to compute. The columns of the other indicators are left as NaN. Defaults to all
+            of them.
+        **params: Indicator parameters overriding the defaults (e.g. tenkan_window=7).
+
+    Returns:
+        np.ndarray: A (pairs x candles) structured array with one float64 field per indicator column. pd.DataFrame(result[i]) gives the same
+        DataFrame as concatenating the batch indicator DataFrames of pair i.
+    """
+    unknown_params = set(params) - {param for _, param_names in PANEL_INDICATORS.values() for param in param_names}
+    if unknown_params:
+        raise TypeError(f"Unknown indicator parameters: {sorted(unknown_params)}")
+
+    result = np.full(close.shape, np.nan, dtype=INDICATOR_DTYPE)
+    for name in PANEL_INDICATORS:
+        if indicators is not None and name not in indicators:
+            continue
+
+        for column, values in compute_panel_indicator(name, high, low, close, **params).items():
+            result[column] = values
+
+    return result
@@ -0,0 +1,288 @@
+"""
+Constant-time streaming building blocks for the indicators. Each class keeps only the state it needs to produce the next value when a new value is
+appended. The arithmetic mirrors the pandas rolling/ewm implementations step by step (including the Kahan-compensated running sums used by
+rolling().mean()), so feeding a series through these classes one value at a time gives exactly the same floats as the batch pandas functions.
+
+Every class also has a peek() method, which returns the value update() would return without changing the state, so a candle that is still open
+can be evaluated without copying the state.
+"""
+import math
+from collections import deque
+
+NaN = float("nan")
+
+
+def divide(numerator: float, denominator: float) -> float:
+    """
+    Divide two floats with NumPy semantics, returning inf/-inf/nan for a zero denominator instead of raising ZeroDivisionError.
+    """
+    if denominator == 0:
+        if numerator == 0 or numerator != numerator:
+            return NaN
+        return math.copysign(math.inf, numerator) * math.copysign(1, denominator)
+
+    return numerator / denominator
+
+
+class ScalarState:
+    """
+    Base of the classes whose state is only scalar attributes, which peek() saves and restores around update().
+    """
+
+    def update(self, value: float) -> float:
+        raise NotImplementedError
+
+    def peek(self, value: float) -> float:
+        state = self.__dict__.copy()
+        result = self.update(value)
+        self.__dict__.update(state)
+
+        return result
+
+
+class RollingMax:
+    """
+    Rolling maximum over a fixed window using a monotonic deque. Equivalent to pd.Series.rolling(window_size).max().
+    """
+
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self.index = -1
+        self.last_nan_index = -window_size - 1
+        self.window: deque = deque()
+
+    def _dominates(self, kept: float, new: float) -> bool:
+        return kept > new
+
+    def update(self, value: float) -> float:
+        self.index += 1
+
+        if value != value:
+            self.last_nan_index = self.index
+        else:
+            while self.window and not self._dominates(self.window[-1][1], value):
+                self.window.pop()
+            self.window.append((self.index, value))
+
+        while self.window and self.window[0][0] <= self.index - self.window_size:
+            self.window.popleft()
+
+        # Like pandas, the result is NaN until the window is full and while it contains a NaN
+        if self.index + 1 < self.window_size or self.last_nan_index > self.index - self.window_size:
+            return NaN
+
+        return self.window[0][1]
+
+    def peek(self, value: float) -> float:
+        index = self.index + 1
+        if value != value or index + 1 < self.window_size or self.last_nan_index > index - self.window_size:
+            return NaN
+
+        # The first kept value still in the window is the current extreme, unless the new value replaces it
+        for kept_index, kept in self.window:
+            if kept_index > index - self.window_size:
+                return kept if self._dominates(kept, value) else value
+
+        return value
+
+
+class RollingMin(RollingMax):
+    """
+    Rolling minimum over a fixed window using a monotonic deque. Equivalent to pd.Series.rolling(window_size).min().
+    """
+
+    def _dominates(self, kept: float, new: float) -> bool:
+        return kept < new
+
+
+class RollingMean:
+    """
+    Rolling mean over a fixed window using a running sum. Equivalent to pd.Series.rolling(window_size).mean(), including its Kahan summation and
+    its handling of signs and repeated values.
+    """
+
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self.window: deque = deque()
+        self.started = False
+
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.num_consecutive_same_value = 0
+        self.prev_value = NaN
+
+    def _add(self, value: float):
+        if value != value:
+            return
+
+        self.nobs += 1
+        y = value - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1, value) < 0:
+            self.neg_ct += 1
+
+        if value == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = value
+
+    def _remove(self, value: float):
+        if value != value:
+            return
+
+        self.nobs -= 1
+        y = -value - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1, value) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value: float) -> float:
+        if not self.started:
+            self.started = True
+            self.prev_value = value
+
+        self.window.append(value)
+        if len(self.window) > self.window_size:
+            self._remove(self.window.popleft())
+        self._add(value)
+
+        return self._result()
+
+    def peek(self, value: float) -> float:
+        # The window itself isn't changed, only the running sums, which are restored afterwards
+        state = self.__dict__.copy()
+        if not self.started:
+            self.prev_value = value
+        if len(self.window) >= self.window_size:
+            self._remove(self.window[0])
+        self._add(value)
+
+        result = self._result()
+        self.__dict__.update(state)
+        return result
+
+    def _result(self) -> float:
+        if self.nobs < self.window_size or self.nobs == 0:
+            return NaN
+
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+
+        return result
+
+
+class EWMean(ScalarState):
+    """
+    Exponentially weighted mean with adjust=False. Equivalent to pd.Series.ewm(span=span, adjust=False).mean().
+    """
+
+    def __init__(self, span: int):
+        center_of_mass = (span - 1) / 2
+        alpha = 1.0 / (1.0 + center_of_mass)
+        self.old_weight_factor = 1.0 - alpha
+        self.new_weight = alpha
+
+        self.weighted = NaN
+        self.old_weight = 1.0
+        self.nobs = 0
+        self.started = False
+
+    def update(self, value: float) -> float:
+        is_observation = value == value
+
+        if not self.started:
+            self.started = True
+            self.weighted = value
+            self.nobs = int(is_observation)
+        else:
+            self.nobs += is_observation
+            if self.weighted == self.weighted:
+                self.old_weight *= self.old_weight_factor
+                if is_observation:
+                    if self.weighted != value:
+                        self.weighted = self.old_weight * self.weighted + self.new_weight * value
+                        self.weighted /= (self.old_weight + self.new_weight)
+                    self.old_weight = 1.0
+            elif is_observation:
+                self.weighted = value
+
+        return self.weighted if self.nobs >= 1 else NaN
+
+
+class WilderMean(ScalarState):
+    """
+    Wilder's smoothed moving average. Equivalent to kernels.wilder_mean(): the first window_size values seed the average with their mean, and
+    every later value is smoothed in with a weight of 1 / window_size. NaN values are skipped, returning NaN without changing the average.
+    """
+
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self.count = 0
+        self.total = 0.0
+        self.average = NaN
+
+    def update(self, value: float) -> float:
+        if value != value:
+            return NaN
+
+        if self.count < self.window_size:
+            self.total += value
+            self.count += 1
+            if self.count == self.window_size:
+                self.average = self.total / self.window_size
+            return self.average
+
+        self.average = (self.average * (self.window_size - 1) + value) / self.window_size
+        return self.average
+
+
+class Shift:
+    """
+    Delay a series by a fixed number of steps. Equivalent to pd.Series.shift(shift_size) for a positive shift_size.
+    """
+
+    def __init__(self, shift_size: int):
+        self.window: deque = deque(maxlen=shift_size + 1)
+
+    def update(self, value: float) -> float:
+        self.window.append(value)
+        if len(self.window) < self.window.maxlen:
+            return NaN
+
+        return self.window[0]
+
+    def peek(self, value: float) -> float:
+        # The position of the front of the window after appending value, where len(window) is the appended value itself
+        position = len(self.window) + 1 - self.window.maxlen
+        if position < 0:
+            return NaN
+
+        return self.window[position] if position < len(self.window) else value
+
+
+class Diff(ScalarState):
+    """
+    Difference to the previous value. Equivalent to pd.Series.diff().
+    """
+
+    def __init__(self):
+        self.prev_value = NaN
+
+    def update(self, value: float) -> float:
+        delta = value - self.prev_value
+        self.prev_value = value
+
+        return delta
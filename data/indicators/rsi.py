@@ -1,24 +1,67 @@
 import pandas as pd
 
+from data.indicators import kernels
+from data.indicators.rolling import NaN, Diff, RollingMean, WilderMean, divide
 
-def rsi(pair_df: pd.DataFrame, window_size=14) -> pd.DataFrame:
+
+def rsi(pair_df: pd.DataFrame, window_size=14, smoothing="sma") -> pd.DataFrame:
     """
     Calculate the Relative Strength Index (RSI) for a given pair DataFrame.
 
     Args:
         pair_df (pd.DataFrame): The dataframe containing the candlesticks for a pair
         window_size(int): The window for calculating the RSI averages. Default is 14.
+        smoothing (str): "sma" averages the gains and losses with a simple moving average, "wilder" with Wilder's smoothing, which skips
+            the changes from or to a NaN close (see kernels.wilder_rsi()).
 
     Returns:
         pd.DataFrame: A dataframe containing the RSI data, with a single "rsi" column.
     """
+    if smoothing == "wilder":
+        return pd.DataFrame({"rsi": kernels.wilder_rsi(pair_df.close.to_numpy(dtype=float), window_size)}, index=pair_df.index)
+
     delta = pair_df.close.diff()
     gain = delta.where(delta > 0, 0)
     loss = -delta.where(delta < 0, 0)
 
-    avg_gain = gain.rolling(window=14).mean()
-    avg_loss = loss.rolling(window=14).mean()
+    avg_gain = gain.rolling(window=window_size).mean()
+    avg_loss = loss.rolling(window=window_size).mean()
 
     rs = avg_gain / avg_loss
 
     return 100 - (100 / (1 + rs)).to_frame(name="rsi")
+
+
+class RSIStream:
+    """
+    Streaming version of rsi(). Each call to update() consumes one close price and returns the RSI for it, matching the batch function.
+    """
+
+    def __init__(self, window_size=14, smoothing="sma"):
+        self.smoothing = smoothing
+        self.delta = Diff()
+        average_class = WilderMean if smoothing == "wilder" else RollingMean
+        self.avg_gain = average_class(window_size)
+        self.avg_loss = average_class(window_size)
+
+    def update(self, close: float) -> dict:
+        gain, loss = self._gain_loss(self.delta.update(close))
+        rs = divide(self.avg_gain.update(gain), self.avg_loss.update(loss))
+
+        return {"rsi": 100 - divide(100, 1 + rs)}
+
+    def peek(self, close: float) -> dict:
+        """
+        Return the values update() would return for this close price, without changing the state.
+        """
+        gain, loss = self._gain_loss(self.delta.peek(close))
+        rs = divide(self.avg_gain.peek(gain), self.avg_loss.peek(loss))
+
+        return {"rsi": 100 - divide(100, 1 + rs)}
+
+    def _gain_loss(self, delta: float) -> tuple:
+        # Like the batch versions, a NaN change is no gain or loss for the simple moving averages, and is skipped by Wilder's smoothing
+        if self.smoothing == "wilder" and delta != delta:
+            return NaN, NaN
+
+        return delta if delta > 0 else 0.0, -(delta if delta < 0 else 0.0)
@@ -1,5 +1,8 @@
 import pandas as pd
 
+from data.indicators import kernels
+from data.indicators.rolling import RollingMax, RollingMean, RollingMin, divide
+
 
 def stochastic_osc(pair_df: pd.DataFrame, window_size=9) -> pd.DataFrame:
     """
@@ -13,8 +16,8 @@ def stochastic_osc(pair_df: pd.DataFrame, window_size=9) -> pd.DataFrame:
         pd.DataFrame: Dataframe containing %K and %D data for stochastic oscillator.
     """
 
-    lowest_low: pd.Series = pair_df['low'].rolling(window=window_size).min()
-    highest_high: pd.Series = pair_df['high'].rolling(window=window_size).max()
+    lowest_low = pd.Series(kernels.rolling_min(pair_df['low'].to_numpy(dtype=float), (window_size,))[window_size], index=pair_df.index)
+    highest_high = pd.Series(kernels.rolling_max(pair_df['high'].to_numpy(dtype=float), (window_size,))[window_size], index=pair_df.index)
 
     # %K Line (raw stochastic)
     stoch_k: pd.Series = (pair_df['close'] - lowest_low) / (highest_high - lowest_low) * 100
@@ -26,3 +29,39 @@ def stochastic_osc(pair_df: pd.DataFrame, window_size=9) -> pd.DataFrame:
         "stoch_k": stoch_k,
         "stoch_d": stoch_d
     })
+
+
+class StochasticStream:
+    """
+    Streaming version of stochastic_osc(). Each call to update() consumes one candle and returns the %K and %D values for it.
+    """
+
+    def __init__(self, window_size=9):
+        self.lowest_low = RollingMin(window_size)
+        self.highest_high = RollingMax(window_size)
+        self.stoch_d = RollingMean(3)
+
+    def update(self, high: float, low: float, close: float) -> dict:
+        lowest_low = self.lowest_low.update(low)
+        highest_high = self.highest_high.update(high)
+
+        stoch_k = divide(close - lowest_low, highest_high - lowest_low) * 100
+
+        return {
+            "stoch_k": stoch_k,
+            "stoch_d": self.stoch_d.update(stoch_k)
+        }
+
+    def peek(self, high: float, low: float, close: float) -> dict:
+        """
+        Return the values update() would return for this candle, without changing the state.
+        """
+        lowest_low = self.lowest_low.peek(low)
+        highest_high = self.highest_high.peek(high)
+
+        stoch_k = divide(close - lowest_low, highest_high - lowest_low) * 100
+
+        return {
+            "stoch_k": stoch_k,
+            "stoch_d": self.stoch_d.peek(stoch_k)
+        }
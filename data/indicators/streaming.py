@@ -0,0 +1,247 @@
+"""
+Per-pair streaming indicator state. An IndicatorStream owns one streaming instance of every indicator and feeds each new candle through all of them,
+so keeping the indicators of a pair up to date costs a constant amount of work per candle instead of recomputing every window over the whole
+history. The results are identical to the batch indicator functions run over the same candles.
+"""
+from collections import deque
+from typing import Iterable, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+from data.indicators.ichimoku import IchimokuStream
+from data.indicators.keltner import KeltnerStream
+from data.indicators.macd import MACDStream
+from data.indicators.rsi import RSIStream
+from data.indicators.stochastic_osc import StochasticStream
+
+# The columns each indicator produces, in the same order as concatenating the batch indicator DataFrames
+INDICATOR_OUTPUTS = {
+    "ichimoku": ["tenkan", "kijun", "lead_span_a", "lead_span_b", "lagging_span", "kumo"],
+    "rsi": ["rsi"],
+    "macd": ["macd_line", "signal_line"],
+    "keltner": ["middle_keltner_band", "upper_keltner_band", "lower_keltner_band"],
+    "stochastic_osc": ["stoch_k", "stoch_d"]
+}
+INDICATOR_COLUMNS = [column for columns in INDICATOR_OUTPUTS.values() for column in columns]
+
+INDICATOR_STREAMS = {
+    "ichimoku": IchimokuStream,
+    "rsi": RSIStream,
+    "macd": MACDStream,
+    "keltner": KeltnerStream,
+    "stochastic_osc": StochasticStream
+}
+
+# The parameters of each indicator, named as in the panel indicators, and the argument of the streaming class each of them is passed as
+INDICATOR_PARAMS = {
+    "ichimoku": {"tenkan_window": "tenkan_window", "kijun_window": "kijun_window", "lead_span_b_window": "lead_span_b_window",
+                 "ichimoku_shift": "shift_size"},
+    "rsi": {"rsi_window": "window_size", "rsi_smoothing": "smoothing"},
+    "macd": {"macd_short_window": "short_window", "macd_long_window": "long_window", "macd_signal_window": "signal_window"},
+    "keltner": {"keltner_window": "window_size", "keltner_atr_period": "atr_period", "keltner_multiplier": "multiplier"},
+    "stochastic_osc": {"stochastic_window": "window_size"}
+}
+
+
+def required_indicators(columns: Iterable[str]) -> Set[str]:
+    """
+    Return the names of the indicators that produce the given indicator columns.
+    """
+    columns = set(columns)
+    return {name for name, outputs in INDICATOR_OUTPUTS.items() if columns & set(outputs)}
+
+
+def stream_arguments(name: str, params: dict) -> dict:
+    """
+    Return the constructor arguments of the streaming class of an indicator, from a flat dict of indicator parameters (e.g. rsi_window=10).
+    Parameters that belong to other indicators are ignored.
+    """
+    return {argument: params[param] for param, argument in INDICATOR_PARAMS[name].items() if param in params}
+
+
+class IndicatorStream:
+    def __init__(self, history_size: int = 100, lagging_shift: int = 26, indicators: Iterable[str] = None, params: dict = None):
+        """
+        Args:
+            history_size (int): The number of most recent indicator rows to keep. This only has to cover the windows the confirmations look at.
+            lagging_shift (int): The shift of the Ichimoku lagging span, unless ichimoku_shift is given in params.
+            indicators (list, optional): The names of the indicators to compute (see INDICATOR_OUTPUTS). Defaults to all of them.
+            params (dict, optional): Indicator parameters overriding the defaults, named as in INDICATOR_PARAMS (e.g. rsi_window=10).
+        """
+        self.history_size = history_size
+        self.default_lagging_shift = lagging_shift
+        self.indicators = set()
+        self.params = {}
+        self.streams = {}
+        self.stale_indicators = set()
+        self.configure(set(INDICATOR_OUTPUTS) if indicators is None else indicators, params or {})
+        self.reset()
+
+    def configure(self, indicators: Iterable[str], params: dict) -> Set[str]:
+        """
+        Change the computed indicators or their parameters. The indicators that were added or whose parameters changed are recomputed over the
+        candles of the pair on the next sync(), the state of the other indicators is kept.
+
+        Returns:
+            set: The names of the indicators that will be recomputed.
+        """
+        indicators = set(indicators)
+        changed = {name for name in indicators
+                   if name not in self.indicators or stream_arguments(name, params) != stream_arguments(name, self.params)}
+
+        self.indicators = indicators
+        self.params = dict(params)
+        self.lagging_shift = self.params.get("ichimoku_shift", self.default_lagging_shift)
+        self.columns = [column for name, outputs in INDICATOR_OUTPUTS.items() if name in self.indicators for column in outputs]
+
+        self.streams = {name: stream for name, stream in self.streams.items() if name in indicators and name not in changed}
+        self.stale_indicators = (self.stale_indicators | changed) & indicators
+        return changed
+
+    def _new_streams(self, names: Iterable[str]) -> dict:
+        return {name: stream_class(**stream_arguments(name, self.params)) for name, stream_class in INDICATOR_STREAMS.items() if name in names}
+
+    def reset(self):
+        """
+        Drop all indicator state. The next candle fed to the stream is treated as the first candle of the pair.
+        """
+        self.streams = self._new_streams(self.indicators)
+        self.stale_indicators = set()
+        self.rows: deque = deque(maxlen=self.history_size)
+        self.closes: deque = deque(maxlen=self.history_size)
+        self.last_closed_time: Optional[int] = None
+        self.open_candle: Optional[tuple] = None
+
+    @staticmethod
+    def _compute(streams: dict, high: float, low: float, close: float, peek: bool = False) -> dict:
+        row = {}
+        for name, stream in streams.items():
+            step = stream.peek if peek else stream.update
+            if name in ("rsi", "macd"):
+                row.update(step(close))
+            elif name == "ichimoku":
+                row.update(step(high, low))
+            else:
+                row.update(step(high, low, close))
+
+        return row
+
+    def update(self, open_time: int, high: float, low: float, close: float, closed: bool = True) -> dict:
+        """
+        Feed one candle into the stream and return its indicator values.
+
+        Args:
+            open_time (int): The open time of the candle in milliseconds since epoch.
+            high (float): The high price of the candle.
+            low (float): The low price of the candle.
+            close (float): The close price of the candle.
+            closed (bool): Whether the candle is closed. A candle that is still open is only peeked at by the indicators, without changing their
+                state, so it can be replaced by its updated values (or by the closed candle) on the next call.
+
+        Returns:
+            dict: The indicator values of the candle.
+        """
+        if closed:
+            row = self._compute(self.streams, high, low, close)
+            self.rows.append(row)
+            self.closes.append(close)
+            self.last_closed_time = open_time
+            self.open_candle = None
+        else:
+            row = self._compute(self.streams, high, low, close, peek=True)
+            self.open_candle = (row, close)
+
+        return row
+
+    def _rebuild_stale(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> bool:
+        """
+        Recompute the stale indicators over the closed candles the stream has already seen and patch their columns into the kept rows.
+
+        Returns:
+            bool: False if the candles don't cover the kept rows anymore, in which case the whole stream has to be rebuilt.
+        """
+        if len(closes) < len(self.rows):
+            return False
+
+        streams = self._new_streams(self.stale_indicators)
+        first_kept_row = len(closes) - len(self.rows)
+        for i in range(len(closes)):
+            row = self._compute(streams, float(highs[i]), float(lows[i]), float(closes[i]))
+            if i >= first_kept_row:
+                self.rows[i - first_kept_row].update(row)
+
+        self.streams.update(streams)
+        self.stale_indicators = set()
+        # The open candle is fed again by sync(), with every indicator
+        self.open_candle = None
+        return True
+
+    def sync(self, pair_df: pd.DataFrame, timeframe_ms: int, now_ms: Optional[int] = None, as_frame: bool = True) -> Optional[pd.DataFrame]:
+        """
+        Feed the candles of pair_df that the stream hasn't seen yet and return the recent indicator rows. If the candles don't continue where the
+        stream left off (first call, or a gap in the data), the state is rebuilt from all the candles in pair_df. Indicators reconfigured since the
+        last call are recomputed from the candles in pair_df.
+
+        Args:
+            pair_df (pd.DataFrame): The candles of the pair, as a DataFrame or a CandleBuffer.
+            timeframe_ms (int): The length of a candle in milliseconds, used to tell closed candles apart from the currently open one.
+            now_ms (int, optional): The current time in milliseconds since epoch. Defaults to the system time.
+            as_frame (bool): Whether to build and return the DataFrame of the recent rows. Callers that only read the last few values use
+                recent_values() instead.
+
+        Returns:
+            pd.DataFrame: The most recent indicator rows, in the same format as the concatenated batch indicator DataFrames, or None if as_frame
+            is False.
+        """
+        now_ms = utils.now_ms() if now_ms is None else now_ms
+        times = utils.to_milliseconds(pair_df["time"])
+
+        start = 0
+        if self.last_closed_time is not None:
+            start = int(np.searchsorted(times, self.last_closed_time, side="right"))
+            if start == 0 or (start < len(times) and times[start] != self.last_closed_time + timeframe_ms):
+                start = 0
+
+        highs = np.asarray(pair_df["high"])
+        lows = np.asarray(pair_df["low"])
+        closes = np.asarray(pair_df["close"])
+
+        if start > 0 and self.stale_indicators and not self._rebuild_stale(highs[:start], lows[:start], closes[:start]):
+            start = 0
+        if start == 0:
+            self.reset()
+
+        for i in range(start, len(times)):
+            self.update(int(times[i]), float(highs[i]), float(lows[i]), float(closes[i]), closed=times[i] + timeframe_ms <= now_ms)
+
+        return self.to_frame() if as_frame else None
+
+    def recent_values(self, columns: Iterable[str], n_rows: int) -> dict:
+        """
+        Return the values of the last n_rows indicator rows, including the currently open candle if there is one, as one array per column.
+        The lagging span isn't available, since it's only computed by to_frame().
+        """
+        rows = list(self.rows)
+        if self.open_candle is not None:
+            rows.append(self.open_candle[0])
+        rows = rows[-n_rows:]
+
+        return {column: np.array([row[column] for row in rows], dtype=np.float64) for column in columns}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Return the recent indicator rows, including the currently open candle if there is one.
+        """
+        rows = list(self.rows)
+        closes = list(self.closes)
+        if self.open_candle is not None:
+            rows.append(self.open_candle[0])
+            closes.append(self.open_candle[1])
+
+        indicators_df = pd.DataFrame(rows, columns=self.columns)
+        if "ichimoku" in self.indicators:
+            indicators_df["lagging_span"] = pd.Series(closes, dtype=float).shift(-self.lagging_shift)
+
+        return indicators_df
@@ -0,0 +1,108 @@
+"""
+Event-driven kline ingestion over the Binance WebSocket API. The pairs are subscribed to through combined streams, split over as few connections as
+the per-connection stream limit allows. Only closed klines are written to the candle store, and the callback is triggered once per candle close
+for all the pairs that closed, instead of polling the REST API in a loop. Whenever a connection is (re)established, the candles missed in the
+meantime are backfilled through the REST API. The closed candles are written to disk after the callback, as often as the candle store's
+persist_interval allows.
+"""
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, List, Set
+
+import aiohttp
+
+from data.candle_store import CandleStore
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443"
+
+
+class KlineStream:
+    def __init__(self, candle_store: CandleStore, pairs: List[str], timeframe: str, on_candle_close: Callable[[List[str]], Awaitable],
+                 stream_url: str = BINANCE_STREAM_URL, streams_per_connection: int = 200, settle_delay: float = 1.0, max_backoff: float = 60):
+        """
+        Args:
+            candle_store (CandleStore): The store the closed candles are written to and the REST backfill goes through.
+            pairs (list): The trading pair symbols to subscribe to (e.g., ['BTCUSDT', 'ETHUSDT']).
+            timeframe (str): The timeframe of the candles (e.g., '1m', '5m', '1h', '1d').
+            on_candle_close (callable): Coroutine function called with the list of pairs whose candle closed.
+            stream_url (str): The base URL of the WebSocket API. Can point to a local server replaying recorded klines.
+            streams_per_connection (int): The maximum number of pairs subscribed to over one connection.
+            settle_delay (float): Seconds to wait after the first kline of a candle close arrives, so the closes of the other pairs are collected
+                into the same callback.
+            max_backoff (float): The maximum number of seconds to wait between reconnection attempts.
+        """
+        self.candle_store = candle_store
+        self.pairs = pairs
+        self.timeframe = timeframe
+        self.on_candle_close = on_candle_close
+        self.stream_url = stream_url
+        self.streams_per_connection = streams_per_connection
+        self.settle_delay = settle_delay
+        self.max_backoff = max_backoff
+
+        # Pairs whose candle closed, keyed by the open time of the closed candle
+        self.closed_pairs: Dict[int, Set[str]] = {}
+        self.flush_tasks: Set[asyncio.Task] = set()
+
+    def _connection_url(self, pairs: List[str]) -> str:
+        streams = "/".join(f"{pair.lower()}@kline_{self.timeframe}" for pair in pairs)
+        return f"{self.stream_url}/stream?streams={streams}"
+
+    async def run(self):
+        """
+        Connect to the streams of all pairs and keep the connections alive forever.
+        """
+        chunks = [self.pairs[i:i + self.streams_per_connection] for i in range(0, len(self.pairs), self.streams_per_connection)]
+
+        async with aiohttp.ClientSession(trust_env=True) as session:
+            await asyncio.gather(*[self._run_connection(session, chunk) for chunk in chunks])
+
+    async def _run_connection(self, session: aiohttp.ClientSession, pairs: List[str]):
+        backoff = 1
+        while True:
+            try:
+                async with session.ws_connect(self._connection_url(pairs), heartbeat=30) as ws:
+                    backoff = 1
+                    # Fill in whatever was missed before this connection was established
+                    await self.candle_store.update(pairs, self.timeframe)
+
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            self._handle_message(json.loads(message.data))
+                        elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+
+                print(f"Kline stream for {len(pairs)} pairs closed, reconnecting")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Kline stream for {len(pairs)} pairs failed: {e}")
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _handle_message(self, message: dict):
+        kline = message.get("data", message).get("k")
+        if kline is None or not kline["x"]:
+            return
+
+        pair = kline["s"]
+        self.candle_store.append(pair, self.timeframe, kline["t"], float(kline["o"]), float(kline["h"]), float(kline["l"]), float(kline["c"]),
+                                 float(kline["v"]))
+
+        open_time = kline["t"]
+        if open_time not in self.closed_pairs:
+            self.closed_pairs[open_time] = set()
+            flush_task = asyncio.get_running_loop().create_task(self._flush(open_time))
+            self.flush_tasks.add(flush_task)
+            flush_task.add_done_callback(self.flush_tasks.discard)
+        self.closed_pairs[open_time].add(pair)
+
+    async def _flush(self, open_time: int):
+        await asyncio.sleep(self.settle_delay)
+        pairs = sorted(self.closed_pairs.pop(open_time))
+
+        try:
+            await self.on_candle_close(pairs)
+        except Exception as e:
+            print(f"Candle close callback failed: {e}")
+
+        await self.candle_store.persist()
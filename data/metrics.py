@@ -0,0 +1,168 @@
+"""
+Instrumentation of the signal cycle. Stages are timed with the Metrics.stage() context manager, optionally per pair, and counters/gauges record
+things like candles processed, API weight used and the latency from candle close to signal. The metrics can be scraped from a local
+Prometheus-style /metrics endpoint, and a rolling summary of the stage timings is printed periodically.
+
+For deeper digging, a single cycle can be run under cProfile (requested through the /profile endpoint or Metrics.profile_next_cycle). The dump is
+written to the profile directory and can be turned into a flamegraph with tools like flameprof or snakeviz.
+"""
+import cProfile
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from aiohttp import web
+
+METRIC_PREFIX = "equilibrium"
+
+
+class Metrics:
+    def __init__(self, summary_window: int = 100, profile_dir: str = "./profiles"):
+        """
+        Args:
+            summary_window (int): The number of most recent timings of each stage kept for the quantiles and the summary log.
+            profile_dir (str): The directory cProfile dumps are written to.
+        """
+        self.summary_window = summary_window
+        self.profile_dir = profile_dir
+        self.profile_next_cycle = False
+
+        self.stage_timings: Dict[str, deque] = {}
+        self.stage_totals: Dict[str, Tuple[int, float]] = {}
+        self.pair_timings: Dict[Tuple[str, str], float] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+
+        self.server_runner: Optional[web.AppRunner] = None
+
+    def reset(self):
+        """
+        Drop every recorded timing, counter and gauge.
+        """
+        self.stage_timings = {}
+        self.stage_totals = {}
+        self.pair_timings = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, stage: str, seconds: float, pair: str = None):
+        """
+        Record the duration of a stage. If a pair is given, the duration is also kept as the last timing of that pair and stage.
+        """
+        if stage not in self.stage_timings:
+            self.stage_timings[stage] = deque(maxlen=self.summary_window)
+            self.stage_totals[stage] = (0, 0.0)
+
+        self.stage_timings[stage].append(seconds)
+        count, total = self.stage_totals[stage]
+        self.stage_totals[stage] = (count + 1, total + seconds)
+
+        if pair is not None:
+            self.pair_timings[(pair, stage)] = seconds
+
+    @contextmanager
+    def stage(self, stage: str, pair: str = None):
+        """
+        Time the body of the with block as the given stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, pair)
+
+    def increment(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    @contextmanager
+    def cycle(self):
+        """
+        Time a whole cycle. If profiling was requested, the cycle runs under cProfile and the dump is written to the profile directory.
+        """
+        profiler = None
+        if self.profile_next_cycle:
+            self.profile_next_cycle = False
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        try:
+            with self.stage("cycle"):
+                yield
+        finally:
+            self.increment("cycles_total")
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile_path = os.path.join(self.profile_dir, f"cycle-{int(time.time())}.prof")
+                profiler.dump_stats(profile_path)
+                print(f"Cycle profile written to {profile_path}")
+
+    def summary(self) -> str:
+        """
+        Return a summary of the recent timings of every stage.
+        """
+        lines = [f"Stage timings over the last {self.summary_window} samples (ms):"]
+        for stage, timings in self.stage_timings.items():
+            values = np.array(timings) * 1000
+            lines.append(f"    {stage:<16} n={len(values):<5} mean={values.mean():9.2f} p95={np.percentile(values, 95):9.2f} max={values.max():9.2f}")
+
+        for name, value in {**self.counters, **self.gauges}.items():
+            lines.append(f"    {name}: {value:g}")
+
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines = [f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+        for stage, timings in self.stage_timings.items():
+            values = np.array(timings)
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {np.quantile(values, quantile):.6f}')
+            count, total = self.stage_totals[stage]
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_pair_stage_seconds gauge")
+        for (pair, stage), seconds in self.pair_timings.items():
+            lines.append(f'{METRIC_PREFIX}_pair_stage_seconds{{pair="{pair}",stage="{stage}"}} {seconds:.6f}')
+
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            lines.append(f"{METRIC_PREFIX}_{name} {value:g}")
+
+        for name, value in self.gauges.items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            lines.append(f"{METRIC_PREFIX}_{name} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render_prometheus(), content_type="text/plain")
+
+    async def _handle_profile(self, request: web.Request) -> web.Response:
+        self.profile_next_cycle = True
+        return web.Response(text="The next cycle will be profiled\n")
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 9100):
+        """
+        Serve the metrics on http://host:port/metrics from the running event loop. Requesting /profile profiles the next cycle.
+        """
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        app.router.add_get("/profile", self._handle_profile)
+
+        self.server_runner = web.AppRunner(app)
+        await self.server_runner.setup()
+        await web.TCPSite(self.server_runner, host, port).start()
+
+
+# The metrics shared by the whole process
+metrics = Metrics()
@@ -0,0 +1,248 @@
+"""
+Asynchronous Telegram notifications. Messages are put on a queue and sent by a background task over a pooled session, so notifying never blocks
+the event loop. The messages queued by a cycle are batched into as few Telegram messages as the message size limit allows, rate-limit responses
+are retried after the wait Telegram asks for, and messages with a deduplication key are dropped if the same key was sent recently.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from data.metrics import metrics
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+# The maximum length of the text of a single message
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+class TelegramAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Telegram API error {status}: {message}")
+        self.status = status
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    Split a text into chunks of at most limit characters, at line breaks where possible.
+    """
+    chunks = []
+    while len(text) > limit:
+        split_at = text.rfind("\n", 0, limit)
+        if split_at <= 0:
+            split_at = limit
+        chunks.append(text[:split_at])
+        text = text[split_at:].lstrip("\n")
+
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def batch_messages(messages: List[Tuple[str, Optional[str]]], limit: int = TELEGRAM_MESSAGE_LIMIT,
+                   separator: str = "\n\n") -> List[Tuple[str, List[str]]]:
+    """
+    Join consecutive messages into as few texts of at most limit characters as possible. Messages that are too long on their own are split.
+
+    Args:
+        messages (list): (text, dedup_key) tuples, in the order they should be sent.
+        limit (int): The maximum length of a text.
+        separator (str): The separator between joined messages.
+
+    Returns:
+        list: (text, dedup_keys) tuples, with the deduplication keys of the messages each text contains.
+    """
+    batches = []
+    text, keys = "", []
+    for message, dedup_key in messages:
+        for chunk in split_message(message, limit):
+            if text and len(text) + len(separator) + len(chunk) > limit:
+                batches.append((text, keys))
+                text, keys = "", []
+
+            text = f"{text}{separator}{chunk}" if text else chunk
+            if dedup_key is not None and dedup_key not in keys:
+                keys.append(dedup_key)
+
+    if text:
+        batches.append((text, keys))
+    return batches
+
+
+class TelegramNotifier:
+    def __init__(self, bot_token: str, chat_id: str, base_url: str = TELEGRAM_API_URL, dedup_ttl: float = 4 * 3600, max_queue_size: int = 1000,
+                 batch_delay: float = 0.5, min_interval: float = 1.0, max_retries: int = 5, backoff_base: float = 1.0, max_backoff: float = 60,
+                 timeout: float = 30):
+        """
+        Args:
+            bot_token (str): The token of the Telegram bot.
+            chat_id (str): The chat the messages are sent to.
+            base_url (str): The base URL of the Bot API.
+            dedup_ttl (float): How long in seconds a deduplication key blocks messages with the same key.
+            max_queue_size (int): The maximum number of queued messages. Messages queued beyond this are dropped.
+            batch_delay (float): How long in seconds the sender waits after the first queued message for more messages to batch with it.
+            min_interval (float): The minimum time in seconds between two sent messages, to stay under the per-chat rate limit.
+            max_retries (int): The number of times a failed message is retried.
+            backoff_base (float): The wait before the first retry in seconds. Doubled on every further retry.
+            max_backoff (float): The maximum wait between retries in seconds.
+            timeout (float): The total timeout of a request in seconds.
+        """
+        self.url = f"{base_url}/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+        self.dedup_ttl = dedup_ttl
+        self.batch_delay = batch_delay
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.sender_task: Optional[asyncio.Task] = None
+        self.last_send_time = 0.0
+
+        # The time each deduplication key was last queued
+        self.sent_keys: Dict[str, float] = {}
+
+    def start(self) -> asyncio.Task:
+        """
+        Start the background sender task in the running event loop.
+        """
+        if self.sender_task is None or self.sender_task.done():
+            self.sender_task = asyncio.create_task(self.run())
+        return self.sender_task
+
+    async def close(self):
+        """
+        Send the queued messages, then stop the sender and close the session.
+        """
+        if self.sender_task is not None and not self.sender_task.done():
+            await self.queue.join()
+            self.sender_task.cancel()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def is_duplicate(self, dedup_key: str) -> bool:
+        """
+        Return whether a message with this deduplication key was queued within the deduplication TTL.
+        """
+        now = time.time()
+        self.sent_keys = {key: sent_time for key, sent_time in self.sent_keys.items() if now - sent_time < self.dedup_ttl}
+        return dedup_key in self.sent_keys
+
+    def notify(self, message: str, dedup_key: str = None) -> bool:
+        """
+        Queue a message without waiting for it to be sent.
+
+        Args:
+            message (str): The text of the message.
+            dedup_key (str, optional): Messages with the same key are only sent once per deduplication TTL.
+
+        Returns:
+            bool: Whether the message was queued, False if it was a duplicate or the queue is full.
+        """
+        if dedup_key is None:
+            return self.notify_many({}, header=message) > 0
+        return self.notify_many({dedup_key: message}) > 0
+
+    def notify_many(self, messages: Dict[str, str], header: str = None) -> int:
+        """
+        Queue several messages keyed by their deduplication keys, preceded by a header. The header is only queued if at least one of the messages
+        isn't a duplicate.
+
+        Returns:
+            int: The number of queued messages, including the header.
+        """
+        new_messages = [(message, dedup_key) for dedup_key, message in messages.items() if not self.is_duplicate(dedup_key)]
+        if messages and not new_messages:
+            return 0
+        if header is not None:
+            new_messages.insert(0, (header, None))
+
+        queued = 0
+        for message, dedup_key in new_messages:
+            try:
+                self.queue.put_nowait((message, dedup_key))
+            except asyncio.QueueFull:
+                print(f"Notification queue is full, dropped {len(new_messages) - queued} messages")
+                break
+
+            if dedup_key is not None:
+                self.sent_keys[dedup_key] = time.time()
+            queued += 1
+
+        return queued
+
+    async def run(self):
+        """
+        Send the queued messages forever, batching the messages that are queued close together.
+        """
+        while True:
+            messages = [await self.queue.get()]
+            await asyncio.sleep(self.batch_delay)
+            while not self.queue.empty():
+                messages.append(self.queue.get_nowait())
+
+            for text, dedup_keys in batch_messages(messages):
+                try:
+                    await self._send(text)
+                except Exception as e:
+                    print(f"Failed to send Telegram message: {e}")
+                    # Let the next cycle send these signals again
+                    for dedup_key in dedup_keys:
+                        self.sent_keys.pop(dedup_key, None)
+
+            for _ in messages:
+                self.queue.task_done()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout), trust_env=True)
+
+        return self.session
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.backoff_base * 2 ** attempt, self.max_backoff)
+
+    async def _send(self, text: str):
+        """
+        Send a single message, retrying rate-limit and server errors.
+
+        Raises:
+            TelegramAPIError: If the message is rejected, or still fails after all retries.
+        """
+        payload = {
+            "chat_id": self.chat_id,
+            "text": text,
+        }
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(max(0.0, self.last_send_time + self.min_interval - time.monotonic()))
+            self.last_send_time = time.monotonic()
+
+            retry_after = None
+            try:
+                async with self._get_session().post(self.url, json=payload) as response:
+                    if response.status == 429:
+                        # Rate limited, Telegram says how long to back off for
+                        body = await response.json(content_type=None)
+                        retry_after = float(body.get("parameters", {}).get("retry_after", self._backoff(attempt)))
+                        last_error = TelegramAPIError(response.status, body.get("description", ""))
+                    elif response.status >= 500:
+                        last_error = TelegramAPIError(response.status, await response.text())
+                    elif response.status >= 400:
+                        raise TelegramAPIError(response.status, await response.text())
+                    else:
+                        metrics.increment("telegram_messages_sent_total")
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+
+        raise TelegramAPIError(getattr(last_error, "status", 0), f"Message failed after {self.max_retries + 1} attempts: {last_error}")
@@ -0,0 +1,231 @@
+"""
+Parallel parameter sweep over the indicator periods and the indicator weights. Every combination is backtested over the same historical candles
+using a process pool. The candle arrays are placed in shared memory once and attached to by every worker, instead of being pickled for each task.
+
+The combinations are grouped by their indicator parameters, so the indicators and confirmations of a parameter set are computed once and then
+scored with every weight set. Inside each worker, the output of every indicator is also cached by its own parameters only, so e.g. sweeping the
+Tenkan window doesn't recompute the RSI, MACD, Keltner and stochastic indicators.
+
+Note that the weights only affect the weighted score, while the trades follow the signal confidence like the live pipeline. The trade statistics
+are the same for every weight set, so a sweep over several weight sets is ranked by "score_ic" (the information coefficient of the score).
+"""
+import copy
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data.backtest import evaluate_trades
+from data.confirmations import confirmation_series, get_checks, required_indicator_columns
+from data.indicators.panel import CandlePanel, PANEL_INDICATORS, compute_panel_indicator
+from data.indicators.streaming import required_indicators
+from data.scoring import indicator_weights, signal_confidence_series, weighted_score_series
+
+PRICE_COLUMNS = ["high", "low", "close"]
+
+# The BacktestResult.stats() columns that depend on the weights
+WEIGHT_OBJECTIVES = ["score_ic"]
+
+# Per-worker state, set up by _init_worker()
+_worker_panel = None
+_worker_blocks = []
+
+
+def expand_weight_grid(weight_grid: Dict[str, Sequence[float]], base_weights: dict = None) -> List[dict]:
+    """
+    Build every combination of a grid of weights. The keys are dotted paths into the weights dict: "<group>" for the total weight of a group and
+    "<group>.<indicator>" for the weight of an indicator within its group.
+
+    Args:
+        weight_grid (dict): The values to try for each weight, e.g. {"momentum_group": [0, 0.5, 1], "ichimoku_group.ichimoku_crossover": [0.3, 0.5]}.
+        base_weights (dict, optional): The weights the grid is applied on top of. Defaults to scoring.indicator_weights.
+
+    Returns:
+        list: A weights dict for every combination.
+    """
+    base_weights = indicator_weights if base_weights is None else base_weights
+    paths = list(weight_grid.keys())
+
+    return [_apply_weights(base_weights, dict(zip(paths, values))) for values in itertools.product(*weight_grid.values())]
+
+
+def _apply_weights(base_weights: dict, values: Dict[str, float]) -> dict:
+    weights = copy.deepcopy(base_weights)
+    for path, value in values.items():
+        group_name, _, ind_name = path.partition(".")
+        if ind_name:
+            weights[group_name]['indicators'][ind_name] = value
+        else:
+            weights[group_name]['total_weight'] = value
+
+    return weights
+
+
+def _init_worker(pairs: List[str], shape: Tuple[int, int], block_names: Dict[str, str]):
+    global _worker_panel, _worker_blocks
+
+    _worker_blocks = [shared_memory.SharedMemory(name=block_name) for block_name in block_names.values()]
+    arrays = {column: np.ndarray(shape, dtype=np.float64, buffer=block.buf) for column, block in zip(block_names.keys(), _worker_blocks)}
+    _worker_panel = CandlePanel(pairs, None, None, **arrays)
+
+
+@lru_cache(maxsize=32)
+def _cached_indicator(name: str, params: Tuple[Tuple[str, int], ...]) -> Dict[str, np.ndarray]:
+    return compute_panel_indicator(name, _worker_panel.high, _worker_panel.low, _worker_panel.close, **dict(params))
+
+
+def _evaluate_parameter_set(indicator_params: dict, weight_sets: List[dict], settings: dict) -> List[dict]:
+    panel = _worker_panel
+
+    indicators = {}
+    enabled_indicators = required_indicators(required_indicator_columns(get_checks()))
+    for name, (_, param_names) in PANEL_INDICATORS.items():
+        if name not in enabled_indicators:
+            continue
+
+        own_params = tuple(sorted((param, value) for param, value in indicator_params.items() if param in param_names))
+        indicators.update(_cached_indicator(name, own_params))
+
+    confirmations = confirmation_series(indicators, panel.high, panel.low, panel.close, settings["recent_window_size"])
+    confidence = signal_confidence_series(confirmations)
+
+    results = []
+    for weights in weight_sets:
+        score, _ = weighted_score_series(confirmations, weights)
+        backtest_result = evaluate_trades(panel, confirmations, score, confidence, settings["holding_period"], settings["fee"])
+        results.append(backtest_result.stats().loc["ALL"].to_dict())
+
+    return results
+
+
+def run_sweep(panel: CandlePanel, parameter_sets: List[Tuple[dict, dict]], objective: str = None, min_trades: int = 1,
+              recent_window_size: int = 5, holding_period: int = 24, fee: float = 0.0, max_workers: int = None) -> pd.DataFrame:
+    """
+    Backtest a list of (indicator parameters, weights) combinations in parallel and rank them by an objective.
+
+    Args:
+        panel (CandlePanel): The historical candles to backtest over.
+        parameter_sets (list): (indicator_params, weights) tuples. indicator_params are keyword arguments of compute_panel_indicators().
+        objective (str, optional): The BacktestResult.stats() column the combinations are ranked by, highest first. Defaults to "score_ic" if
+            the combinations have different weights, and to "mean_return" otherwise.
+        min_trades (int): Combinations with fewer trades than this are ranked last.
+        recent_window_size (int): The window the crossover checks look back over.
+        holding_period (int): The number of candles each trade is held for.
+        fee (float): The round-trip fee subtracted from the return of each trade.
+        max_workers (int, optional): The number of worker processes. Defaults to the number of CPU cores.
+
+    Returns:
+        pd.DataFrame: One row per combination with its parameters (weights as dotted paths) and its backtest statistics, sorted by the objective.
+
+    Raises:
+        ValueError: If the combinations have different weights and the objective doesn't depend on the weights, which would rank the weight sets
+            arbitrarily.
+    """
+    weights_vary = len({tuple(sorted(_flatten_weights(weights).items())) for _, weights in parameter_sets}) > 1
+    if objective is None:
+        objective = WEIGHT_OBJECTIVES[0] if weights_vary else "mean_return"
+    elif weights_vary and objective not in WEIGHT_OBJECTIVES:
+        raise ValueError(f"The objective {objective} is the same for every weight set, rank a weight sweep by one of {WEIGHT_OBJECTIVES}")
+
+    # Group the combinations by indicator parameters, so each parameter set is computed by a single task
+    grouped_sets: Dict[Tuple, List[int]] = {}
+    for i, (indicator_params, _) in enumerate(parameter_sets):
+        grouped_sets.setdefault(tuple(sorted(indicator_params.items())), []).append(i)
+
+    settings = {"recent_window_size": recent_window_size, "holding_period": holding_period, "fee": fee}
+    shape = panel.close.shape
+
+    blocks = {}
+    try:
+        for column in PRICE_COLUMNS:
+            values = np.ascontiguousarray(getattr(panel, column), dtype=np.float64)
+            blocks[column] = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(shape, dtype=np.float64, buffer=blocks[column].buf)[:] = values
+
+        block_names = {column: block.name for column, block in blocks.items()}
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(panel.pairs, shape, block_names)) as executor:
+            futures = {
+                executor.submit(_evaluate_parameter_set, dict(params_key), [parameter_sets[i][1] for i in indices], settings): indices
+                for params_key, indices in grouped_sets.items()
+            }
+
+            rows = [None] * len(parameter_sets)
+            for future, indices in futures.items():
+                for i, stats in zip(indices, future.result()):
+                    rows[i] = {**parameter_sets[i][0], **_flatten_weights(parameter_sets[i][1]), **stats}
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+    results_df = pd.DataFrame(rows)
+    results_df["eligible"] = results_df["trades"] >= min_trades
+
+    return results_df.sort_values(["eligible", objective], ascending=False, na_position="last").drop(columns="eligible").reset_index(drop=True)
+
+
+def _flatten_weights(weights: dict) -> Dict[str, float]:
+    flat_weights = {}
+    for group_name, group_config in weights.items():
+        flat_weights[group_name] = group_config['total_weight']
+        for ind_name, ind_weight in group_config['indicators'].items():
+            flat_weights[f"{group_name}.{ind_name}"] = ind_weight
+
+    return flat_weights
+
+
+def grid_search(panel: CandlePanel, indicator_grid: Dict[str, Sequence[int]] = None, weight_grid: Dict[str, Sequence[float]] = None,
+                **sweep_kwargs) -> pd.DataFrame:
+    """
+    Backtest every combination of a grid of indicator parameters and weights.
+
+    Args:
+        panel (CandlePanel): The historical candles to backtest over.
+        indicator_grid (dict, optional): The values to try for each indicator parameter, e.g. {"tenkan_window": [7, 9, 11], "rsi_window": [14, 21]}.
+        weight_grid (dict, optional): The values to try for each weight, see expand_weight_grid().
+        **sweep_kwargs: Passed on to run_sweep().
+
+    Returns:
+        pd.DataFrame: The ranked results, see run_sweep().
+    """
+    indicator_grid = indicator_grid or {}
+    indicator_sets = [dict(zip(indicator_grid.keys(), values)) for values in itertools.product(*indicator_grid.values())]
+    weight_sets = expand_weight_grid(weight_grid or {})
+
+    return run_sweep(panel, list(itertools.product(indicator_sets, weight_sets)), **sweep_kwargs)
+
+
+def random_search(panel: CandlePanel, n_samples: int, indicator_space: Dict[str, Sequence[int]] = None,
+                  weight_space: Dict[str, Tuple[float, float]] = None, seed: int = None, **sweep_kwargs) -> pd.DataFrame:
+    """
+    Backtest randomly sampled combinations of indicator parameters and weights.
+
+    Args:
+        panel (CandlePanel): The historical candles to backtest over.
+        n_samples (int): The number of combinations to sample.
+        indicator_space (dict, optional): The values to sample from for each indicator parameter, e.g. {"tenkan_window": range(5, 15)}.
+        weight_space (dict, optional): The (low, high) range to sample uniformly from for each weight, keyed like expand_weight_grid().
+        seed (int, optional): The random seed.
+        **sweep_kwargs: Passed on to run_sweep().
+
+    Returns:
+        pd.DataFrame: The ranked results, see run_sweep().
+    """
+    rng = random.Random(seed)
+    indicator_space = indicator_space or {}
+    weight_space = weight_space or {}
+
+    parameter_sets = []
+    for _ in range(n_samples):
+        indicator_params = {param: rng.choice(list(values)) for param, values in indicator_space.items()}
+        weights = _apply_weights(indicator_weights, {path: rng.uniform(low, high) for path, (low, high) in weight_space.items()})
+        parameter_sets.append((indicator_params, weights))
+
+    return run_sweep(panel, parameter_sets, **sweep_kwargs)
@@ -0,0 +1,128 @@
+"""
+Staged signal cycle, overlapping the candle downloads with the indicator computation. Instead of waiting for every pair's candles before computing
+anything, the cycle runs two stages concurrently:
+
+- fetch: up to fetch_window pairs are requested at once. As each response arrives, its candles are merged into the candle store and the pair is
+  put on a bounded queue, and the next pair is requested.
+- compute: the pairs are taken off the queue and prepared by the engine (SignalEngine.prepare()) in a worker thread, so the event loop keeps
+  receiving responses meanwhile. In streaming mode without screening this fully evaluates the pair; otherwise it updates the indicator streams,
+  and the engine evaluates all the pairs together once every pair is prepared, which is cheap at that point.
+
+The queue holds at most queue_size pairs. When the compute stage falls behind, the fetch stage waits for room before it requests more pairs, so
+the candles waiting in memory stay bounded. The cycle's confirmations are scored together at the end, since the screening and the signal state
+look at all the pairs of a cycle. A cycle then takes about as long as the slower of the two stages instead of their sum.
+
+The engine is only ever touched from the single compute thread, so its per-pair state needs no locking.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data.candle_store import CandleStore
+from data.candles import CandleBuffer
+from data.engine import SignalEngine
+from data.metrics import metrics
+
+
+class StagedPipeline:
+    def __init__(self, candle_store: CandleStore, fetch_window: int = 20, queue_size: int = 50):
+        """
+        Args:
+            candle_store (CandleStore): The candle store the pairs are fetched into.
+            fetch_window (int): The maximum number of pairs being fetched at once. The client limits the requests actually in flight further.
+            queue_size (int): The maximum number of fetched pairs waiting for the compute stage.
+        """
+        self.candle_store = candle_store
+        self.fetch_window = fetch_window
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="signal-compute")
+
+    async def _fetch(self, pair: str, timeframe: str) -> Tuple[str, Optional[CandleBuffer]]:
+        try:
+            return pair, await self.candle_store.update_pair(pair, timeframe)
+        except Exception as e:
+            # Like CandleStore.update(), a pair that fails to fetch is evaluated on its stored candles
+            print(f"Failed to fetch data for {pair}: {e}")
+            return pair, self.candle_store.get(pair, timeframe)
+
+    async def _fetch_stage(self, pairs: List[str], timeframe: str, queue: asyncio.Queue):
+        remaining = iter(pairs)
+        pending = set()
+        try:
+            with metrics.stage("fetch"):
+                while True:
+                    for pair in remaining:
+                        pending.add(asyncio.ensure_future(self._fetch(pair, timeframe)))
+                        if len(pending) >= self.fetch_window:
+                            break
+                    if not pending:
+                        break
+
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        pair, candles = task.result()
+                        if candles is not None:
+                            # Waits while the compute stage is behind, which holds back the next requests
+                            await queue.put((pair, candles))
+                    metrics.set_gauge("pipeline_queue_depth", queue.qsize())
+        finally:
+            for task in pending:
+                task.cancel()
+
+        await queue.put(None)
+
+    async def _compute_stage(self, engine: SignalEngine, queue: asyncio.Queue, pairs_data: Dict[str, CandleBuffer], results: dict):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+
+            pair, candles = item
+            pairs_data[pair] = candles
+            results[pair] = await loop.run_in_executor(self.executor, engine.prepare, pair, candles)
+
+    async def run_cycle(self, engine: SignalEngine, pairs: List[str], timeframe: str, keep_pairs: Iterable[str] = ()) -> \
+            Tuple[Dict[str, dict], Dict[str, Dict[str, dict]]]:
+        """
+        Fetch and evaluate every pair, overlapping the two stages.
+
+        Args:
+            engine (SignalEngine): The engine evaluating the pairs.
+            pairs (list): The pairs to evaluate.
+            timeframe (str): The base timeframe of the engine.
+            keep_pairs (list): The pairs evaluated even if they don't pass the screen, see SignalEngine.evaluate().
+
+        Returns:
+            tuple: The confirmation values of every pair on the base timeframe, and those on each higher timeframe keyed by timeframe.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        pairs_data: Dict[str, CandleBuffer] = {}
+        results = {}
+
+        stages = [asyncio.ensure_future(self._fetch_stage(pairs, timeframe, queue)),
+                  asyncio.ensure_future(self._compute_stage(engine, queue, pairs_data, results))]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            # If one stage fails, the other one would wait on the queue forever
+            for stage in stages:
+                stage.cancel()
+
+        # In the pair list order, which is the order of the panel and the screening index
+        pairs = [pair for pair in pairs if pair in pairs_data]
+        if all(results[pair] is not None for pair in pairs):
+            confirmations_data = {}
+            higher_confirmations_data = {higher_timeframe: {} for higher_timeframe in engine.higher_timeframes}
+            for pair in pairs:
+                pair_confirmations, pair_higher_confirmations = results[pair]
+                confirmations_data.update(pair_confirmations)
+                for higher_timeframe, higher_data in pair_higher_confirmations.items():
+                    higher_confirmations_data[higher_timeframe].update(higher_data)
+            return confirmations_data, higher_confirmations_data
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, engine.evaluate, {pair: pairs_data[pair] for pair in pairs}, list(keep_pairs))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,214 @@
+"""
+Replay of recorded klines through the full signal pipeline, without the live Binance API. A recording is one JSON file per pair with the kline
+rows in the format of the klines endpoint, stored under <recording_dir>/<timeframe>/<pair>.json. Recordings are made from the live API with
+record_klines(), or generated with write_synthetic_recording() for benchmarks.
+
+During a replay the clock read by utils.now_ms() is replaced by a virtual clock that steps from one candle close to the next, and a ReplayClient
+stands in for the BinanceClient, serving only the recorded candles that opened before the virtual time. Every cycle runs the same stages as
+main.py: CandleStore.update() -> utils.get_multiple_pairs_data() -> SignalEngine (indicators and confirmations) -> scoring.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from data import utils
+from data.binance_client import BinanceClient
+from data.candle_store import CandleStore
+from data.engine import SignalEngine
+from data.metrics import metrics
+from data.pipeline import StagedPipeline
+from data.scoring import score_pairs
+
+
+def _recording_path(recording_dir: str, timeframe: str, pair: str) -> str:
+    return os.path.join(recording_dir, timeframe, f"{pair}.json")
+
+
+def load_recording(recording_dir: str, timeframe: str, pairs: List[str] = None) -> Dict[str, list]:
+    """
+    Load the recorded kline rows of the given pairs, or of every recorded pair.
+    """
+    timeframe_dir = os.path.join(recording_dir, timeframe)
+    if pairs is None:
+        pairs = sorted(file_name[:-len(".json")] for file_name in os.listdir(timeframe_dir) if file_name.endswith(".json"))
+
+    recording = {}
+    for pair in pairs:
+        with open(_recording_path(recording_dir, timeframe, pair)) as recording_file:
+            recording[pair] = json.load(recording_file)
+
+    return recording
+
+
+def save_recording(recording_dir: str, timeframe: str, recording: Dict[str, list]):
+    """
+    Write the kline rows of every pair to the recording directory.
+    """
+    os.makedirs(os.path.join(recording_dir, timeframe), exist_ok=True)
+    for pair, klines in recording.items():
+        with open(_recording_path(recording_dir, timeframe, pair), "w") as recording_file:
+            json.dump(klines, recording_file)
+
+
+async def record_klines(pairs: List[str], timeframe: str, num_candles: int, recording_dir: str, client: Optional[BinanceClient] = None):
+    """
+    Record the last num_candles klines of every pair from the live API.
+    """
+    client = client or utils.get_default_client()
+    timeframe_ms = utils.timeframe_to_ms(timeframe)
+    end_time = utils.now_ms()
+    start_time = end_time - num_candles * timeframe_ms
+
+    klines = await asyncio.gather(*(client.get_klines(pair, timeframe, start_time, end_time, num_candles, timeframe_ms) for pair in pairs))
+    save_recording(recording_dir, timeframe, dict(zip(pairs, klines)))
+
+
+def generate_klines(start_time: int, num_candles: int, timeframe_ms: int, seed: int = 0) -> list:
+    """
+    Generate random-walk kline rows in the format of the klines endpoint.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, num_candles)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, num_candles)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, num_candles)))
+    volume = np.abs(rng.normal(1000, 200, num_candles))
+
+    return [
+        [start_time + i * timeframe_ms, f"{open_[i]:.8f}", f"{high[i]:.8f}", f"{low[i]:.8f}", f"{close[i]:.8f}", f"{volume[i]:.8f}",
+         start_time + (i + 1) * timeframe_ms - 1, "0", 0, "0", "0", "0"]
+        for i in range(num_candles)
+    ]
+
+
+def write_synthetic_recording(recording_dir: str, pairs: List[str], timeframe: str, num_candles: int, start_time: int = 1_700_000_000_000,
+                              seed: int = 0):
+    """
+    Write a reproducible random-walk recording of num_candles candles for every pair.
+    """
+    timeframe_ms = utils.timeframe_to_ms(timeframe)
+    start_time = start_time // timeframe_ms * timeframe_ms
+    save_recording(recording_dir, timeframe, {
+        pair: generate_klines(start_time, num_candles, timeframe_ms, seed + i) for i, pair in enumerate(pairs)
+    })
+
+
+class ReplayClient:
+    def __init__(self, recording: Dict[str, list]):
+        """
+        A stand-in for BinanceClient that serves klines from a recording. Only the candles that opened at or before the requested end time (the
+        virtual time during a replay) are returned. The closed candles have their final recorded values, but the recording doesn't know how a
+        candle still open at the end time looked then, so it's returned as it opened: its high, low and close are the open price and it has no
+        volume yet. Its final values would be lookahead.
+
+        Args:
+            recording (dict): The recorded kline rows of every pair.
+        """
+        self.recording = recording
+        self.open_times = {pair: np.array([row[0] for row in klines], dtype=np.int64) for pair, klines in recording.items()}
+
+    async def get_klines(self, symbol: str, timeframe: str, start_time: int, end_time: int, num_candles: int, timeframe_ms: int) -> list:
+        open_times = self.open_times[symbol]
+        start = int(np.searchsorted(open_times, start_time, side="left"))
+        end = int(np.searchsorted(open_times, end_time, side="right"))
+        klines = self.recording[symbol][start:min(end, start + num_candles)]
+
+        if klines and klines[-1][6] >= end_time:
+            row = klines[-1]
+            klines = klines[:-1] + [[row[0], row[1], row[1], row[1], row[1], "0", row[6], "0", 0, "0", "0", "0"]]
+
+        return klines
+
+    async def close(self):
+        pass
+
+
+class Replayer:
+    def __init__(self, recording_dir: str, timeframe: str = "1h", pairs: List[str] = None, engine: SignalEngine = None,
+                 candle_history_size: int = 1000, speed: float = None, candle_close_delay: float = 2, candle_store_dir: str = None,
+                 pipelined: bool = False):
+        """
+        Args:
+            recording_dir (str): The directory of the recording.
+            timeframe (str): The timeframe of the recorded candles.
+            pairs (list, optional): The pairs to replay. Defaults to every recorded pair.
+            engine (SignalEngine, optional): The engine evaluating the pairs. Defaults to a streaming engine on the recorded timeframe.
+            candle_history_size (int): The capacity of the candle store, and the number of candles before the first replayed cycle.
+            speed (float, optional): How many times faster than real time the candles are replayed, e.g. 3600 replays an hour per second. None
+                replays as fast as possible.
+            candle_close_delay (float): How long after each candle close the cycle runs, in virtual seconds.
+            candle_store_dir (str, optional): The directory of the candle store. Defaults to a new temporary directory.
+            pipelined (bool): Whether the cycles overlap fetching and computing like the live pipeline, see data.pipeline.
+        """
+        self.recording = load_recording(recording_dir, timeframe, pairs)
+        self.pairs = list(self.recording.keys())
+        self.timeframe = timeframe
+        self.timeframe_ms = utils.timeframe_to_ms(timeframe)
+        self.engine = engine or SignalEngine(timeframe)
+        self.candle_history_size = candle_history_size
+        self.speed = speed
+        self.candle_close_delay = candle_close_delay
+
+        self.client = ReplayClient(self.recording)
+        self.candle_store = CandleStore(candle_store_dir or tempfile.mkdtemp(prefix="replay_"), capacity=candle_history_size, client=self.client)
+        self.pipeline = StagedPipeline(self.candle_store) if pipelined else None
+        self.virtual_time = 0.0
+
+    def cycle_times(self) -> List[int]:
+        """
+        Return the virtual times (in milliseconds) of the replayed cycles: right after every recorded candle close, starting once
+        candle_history_size candles are available.
+        """
+        first_open_time = min(int(open_times[0]) for open_times in self.client.open_times.values() if len(open_times))
+        last_open_time = max(int(open_times[-1]) for open_times in self.client.open_times.values() if len(open_times))
+        delay_ms = int(self.candle_close_delay * 1000)
+
+        return list(range(first_open_time + self.candle_history_size * self.timeframe_ms + delay_ms, last_open_time + delay_ms + 1,
+                          self.timeframe_ms))
+
+    async def run(self, on_cycle: Callable[[int, Dict[str, dict]], Optional[Awaitable]] = None, max_cycles: int = None) -> int:
+        """
+        Replay the recording cycle by cycle.
+
+        Args:
+            on_cycle (callable, optional): Called with the virtual time and the scored pairs (see scoring.score_pairs()) after every cycle. May be
+                a coroutine function.
+            max_cycles (int, optional): Stop after this many cycles.
+
+        Returns:
+            int: The number of replayed cycles.
+        """
+        cycle_times = self.cycle_times()[:max_cycles]
+        utils.set_clock(lambda: self.virtual_time)
+        try:
+            for cycle_time in cycle_times:
+                wall_start = time.perf_counter()
+                self.virtual_time = cycle_time / 1000
+
+                with metrics.cycle():
+                    if self.pipeline is not None:
+                        confirmations_data, higher_confirmations_data = await self.pipeline.run_cycle(self.engine, self.pairs, self.timeframe)
+                    else:
+                        pairs_data = await self.candle_store.update(self.pairs, self.timeframe)
+                        confirmations_data, higher_confirmations_data = self.engine.evaluate(pairs_data)
+                    with metrics.stage("scoring"):
+                        # Pairs screened out by the engine have no confirmations
+                        scored_pairs = score_pairs(confirmations_data, higher_confirmations_data,
+                                                   [pair for pair in self.pairs if pair in confirmations_data])
+
+                if on_cycle is not None:
+                    result = on_cycle(cycle_time, scored_pairs)
+                    if asyncio.iscoroutine(result):
+                        await result
+
+                if self.speed is not None:
+                    await asyncio.sleep(max(0.0, self.timeframe_ms / 1000 / self.speed - (time.perf_counter() - wall_start)))
+        finally:
+            utils.set_clock(None)
+
+        return len(cycle_times)
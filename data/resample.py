@@ -0,0 +1,108 @@
+"""
+Derivation of higher-timeframe candles from the stored base-timeframe candles, so e.g. the 4h and 1d candles of a pair cost no extra API requests.
+The buckets are aligned to multiples of the timeframe since epoch, like the exchange's own candles, which holds for timeframes up to 1d.
+
+A CandleResampler keeps the derived candles of one pair and timeframe, and on every update only re-aggregates the base candles of the last
+(possibly still open) bucket and the ones after it.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+from data.candles import VALUE_COLUMNS, CandleBuffer
+
+
+def _aggregate(times: np.ndarray, columns: Dict[str, np.ndarray], timeframe_ms: int, drop_partial_first: bool) -> \
+        Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    if len(times) == 0:
+        return times, {column: values[:0] for column, values in columns.items()}
+
+    buckets = times // timeframe_ms * timeframe_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    if drop_partial_first and times[0] != buckets[0]:
+        starts = starts[1:]
+        if len(starts) == 0:
+            return times[:0], {column: values[:0] for column, values in columns.items()}
+    ends = np.r_[starts[1:], len(times)]
+
+    # reduceat reduces from each start to the next, so the values before the first start are sliced off
+    offsets = starts - starts[0]
+    aggregated = {
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"][starts[0]:], offsets),
+        "low": np.minimum.reduceat(columns["low"][starts[0]:], offsets),
+        "close": columns["close"][ends - 1]
+    }
+    if "volume" in columns:
+        aggregated["volume"] = np.add.reduceat(columns["volume"][starts[0]:], offsets)
+
+    return buckets[starts], aggregated
+
+
+def _columns(candles) -> Dict[str, np.ndarray]:
+    return {column: np.asarray(candles[column]) for column in VALUE_COLUMNS if column in candles}
+
+
+def resample_candles(base_df: pd.DataFrame, timeframe: str, drop_partial_first: bool = True) -> pd.DataFrame:
+    """
+    Aggregate base-timeframe candles into candles of a higher timeframe.
+
+    Args:
+        base_df (pd.DataFrame): The base candles, sorted by time, as a DataFrame in the format of utils.parse_klines() or a CandleBuffer.
+        timeframe (str): The timeframe to aggregate into (e.g., '4h', '1d').
+        drop_partial_first (bool): Drop the first bucket if base_df starts after its open time, since its open, high and low would be wrong.
+
+    Returns:
+        pd.DataFrame: The aggregated candles in the format of utils.parse_klines(). The last candle covers whatever base candles of its bucket
+        are available.
+    """
+    times, aggregated = _aggregate(utils.to_milliseconds(base_df["time"]), _columns(base_df), utils.timeframe_to_ms(timeframe), drop_partial_first)
+
+    return pd.DataFrame({"time": pd.to_datetime(times, unit="ms", utc=True), **aggregated})
+
+
+class CandleResampler:
+    def __init__(self, base_timeframe: str, timeframe: str, capacity: int = 1000):
+        """
+        Args:
+            base_timeframe (str): The timeframe of the candles fed to update().
+            timeframe (str): The higher timeframe to derive. Must be a multiple of base_timeframe, up to 1d.
+            capacity (int): The maximum number of derived candles kept.
+        """
+        if timeframe[-1] in ("w", "M"):
+            raise ValueError(f"Timeframe {timeframe} isn't aligned to epoch multiples and can't be derived")
+        if utils.timeframe_to_ms(timeframe) % utils.timeframe_to_ms(base_timeframe) != 0:
+            raise ValueError(f"Timeframe {timeframe} isn't a multiple of the base timeframe {base_timeframe}")
+
+        self.base_timeframe = base_timeframe
+        self.timeframe = timeframe
+        self.timeframe_ms = utils.timeframe_to_ms(timeframe)
+        self.candles = CandleBuffer(capacity)
+
+    def update(self, base_candles: CandleBuffer) -> CandleBuffer:
+        """
+        Bring the derived candles up to date with the base candles and return them. Only the base candles from the open time of the last derived
+        candle onwards are aggregated, unless base_candles doesn't cover that bucket anymore, in which case everything is rebuilt.
+
+        Args:
+            base_candles (CandleBuffer): The base candles of the pair, or a DataFrame of them.
+
+        Returns:
+            CandleBuffer: The derived candles, at most capacity of them.
+        """
+        times = utils.to_milliseconds(base_candles["time"])
+        columns = _columns(base_candles)
+
+        last_bucket_time = self.candles.last_time
+        start = 0 if last_bucket_time is None else int(np.searchsorted(times, last_bucket_time, side="left"))
+        if last_bucket_time is None or start == len(times) or (start == 0 and times[0] != last_bucket_time):
+            self.candles.clear()
+            self.candles.extend(*_aggregate(times, columns, self.timeframe_ms, drop_partial_first=True))
+            return self.candles
+
+        self.candles.merge(*_aggregate(times[start:], {column: values[start:] for column, values in columns.items()}, self.timeframe_ms,
+                                       drop_partial_first=False))
+
+        return self.candles
@@ -0,0 +1,225 @@
+"""
+Scoring of the confirmation values of a pair. The weighted score combines the confirmations using the group and indicator weights, and the signal
+confidence categorizes the signal by how many confirmations agree on a direction. Both are also available as vectorized versions that score every
+bar of a (pairs x candles) panel at once, which the backtester uses.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Indicator Weights
+indicator_weights = {
+    # Trend Indicators Group
+    'ichimoku_group': {
+        'total_weight': 1,
+        'indicators': {
+            'ichimoku_cloud_color': 0.2,
+            'ichimoku_crossover': 0.5,
+            'ichimoku_kumo_relative_position': 0.3
+        }
+    },
+
+    # Momentum Indicators Group
+    'momentum_group': {
+        'total_weight': 0,
+        'indicators': {
+            'rsi': 0.5,
+            'stochastic_osc': 0.5
+        }
+    },
+
+    # Volatility Indicators Group
+    'volatility_group': {
+        'total_weight': 0,
+        'indicators': {
+            'keltner': 1.0  # Only one indicator in this group
+        }
+    }
+}
+
+
+def calculate_weighted_score(confirmations_dict, weights=None):
+    weights = indicator_weights if weights is None else weights
+    group_scores = {}
+
+    # Calculate group scores
+    for group_name, group_config in weights.items():
+        group_total = 0
+        for ind_name, ind_weight in group_config['indicators'].items():
+            group_total += confirmations_dict[ind_name] * ind_weight
+
+        # Apply group-level weight
+        group_scores[group_name] = group_total * group_config['total_weight']
+
+    # Final score is sum of weighted group scores
+    final_score = sum(group_scores.values())
+
+    return final_score, group_scores
+
+
+def calculate_signal_confidence(confirmations_dict, sign_threshold=0.5, timeframe_consensus: Optional[Dict[str, float]] = None,
+                                min_timeframe_agreement=0.5):
+    """
+    Categorize the signal of a pair by how many confirmations agree on a direction.
+
+    Args:
+        confirmations_dict (dict): The confirmation values of the pair.
+        sign_threshold (float): The minimum absolute confirmation value that counts as agreeing on a direction.
+        timeframe_consensus (dict, optional): The directional consensus of the pair on other timeframes, keyed by timeframe. If given, the
+            fraction of them pointing in the same direction is added as 'timeframe_agreement', and a strong signal is downgraded to moderate if
+            the agreement is below min_timeframe_agreement.
+        min_timeframe_agreement (float): The minimum timeframe agreement of a strong signal.
+
+    Returns:
+        dict: The confidence metrics and the signal type.
+    """
+    # Count indicators agreeing on direction
+    total_indicators = len(confirmations_dict)
+    bullish_indicators = sum(1 for val in confirmations_dict.values() if val >= sign_threshold)
+    bearish_indicators = sum(1 for val in confirmations_dict.values() if val <= -sign_threshold)
+    neutral_indicators = total_indicators - bullish_indicators - bearish_indicators
+
+    # Calculate confidence metrics
+    confidence_metrics = {
+        'bullish_confidence': bullish_indicators / total_indicators,
+        'bearish_confidence': bearish_indicators / total_indicators,
+        'neutral_percentage': neutral_indicators / total_indicators,
+
+        # Directional agreement score (-1 to 1)
+        'directional_consensus': (bullish_indicators - bearish_indicators) / total_indicators
+    }
+
+    # Categorize signal strength
+    if confidence_metrics['directional_consensus'] > 0.8:
+        signal_type = 'Strong Bullish'
+    elif confidence_metrics['directional_consensus'] < -0.8:
+        signal_type = 'Strong Bearish'
+    elif abs(confidence_metrics['directional_consensus']) > 0.3:
+        signal_type = 'Moderate ' + ('Bullish' if confidence_metrics['directional_consensus'] > 0 else 'Bearish')
+    else:
+        signal_type = 'Neutral'
+
+    if timeframe_consensus:
+        direction = np.sign(confidence_metrics['directional_consensus'])
+        agreeing_timeframes = sum(1 for consensus in timeframe_consensus.values() if direction != 0 and np.sign(consensus) == direction)
+        confidence_metrics['timeframe_agreement'] = agreeing_timeframes / len(timeframe_consensus)
+
+        if signal_type.startswith('Strong') and confidence_metrics['timeframe_agreement'] < min_timeframe_agreement:
+            signal_type = signal_type.replace('Strong', 'Moderate')
+
+    confidence_metrics['signal_type'] = signal_type
+
+    return confidence_metrics
+
+
+# The signal types that are alerted on
+STRONG_SIGNAL_TYPES = ('Strong Bullish', 'Strong Bearish')
+
+
+def score_pairs(confirmations_data: Dict[str, dict], higher_confirmations_data: Dict[str, Dict[str, dict]] = None, pairs=None, weights=None) -> \
+        Dict[str, dict]:
+    """
+    Score the confirmations of every pair. The directional consensus of the pair on the higher timeframes is taken into account by the signal
+    confidence.
+
+    Args:
+        confirmations_data (dict): The confirmation values of every pair on the base timeframe.
+        higher_confirmations_data (dict, optional): The confirmation values of every pair on each higher timeframe, keyed by timeframe.
+        pairs (list, optional): The pairs to score, in order. Defaults to every pair in confirmations_data.
+        weights (dict, optional): The group and indicator weights. Defaults to indicator_weights.
+
+    Returns:
+        dict: The confirmations dict of every scored pair, with the weighted score added as 'average' and the confidence metrics as 'confidence'.
+    """
+    higher_confirmations_data = higher_confirmations_data or {}
+    scored_pairs = {}
+    for pair in confirmations_data if pairs is None else pairs:
+        try:
+            confirmations_dict = confirmations_data[pair]
+
+            score = calculate_weighted_score(confirmations_dict, weights)
+            timeframe_consensus = {
+                higher_timeframe: calculate_signal_confidence(higher_data[pair])['directional_consensus']
+                for higher_timeframe, higher_data in higher_confirmations_data.items() if pair in higher_data
+            }
+            confidence = calculate_signal_confidence(confirmations_dict, timeframe_consensus=timeframe_consensus)
+            confirmations_dict['average'] = score
+            confirmations_dict['confidence'] = confidence
+
+            scored_pairs[pair] = confirmations_dict
+        except Exception as e:
+            print(e)
+            continue
+
+    return scored_pairs
+
+
+# Integer codes of the signal types, used by the vectorized scoring
+SIGNAL_TYPE_CODES = {
+    'Strong Bullish': 2,
+    'Moderate Bullish': 1,
+    'Neutral': 0,
+    'Moderate Bearish': -1,
+    'Strong Bearish': -2
+}
+
+
+def weighted_score_series(confirmations: Dict[str, np.ndarray], weights=None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Vectorized version of calculate_weighted_score(). Each value of the confirmations dict is an array of confirmation values (e.g. pairs x candles)
+    instead of a single value, and the scores are computed for every element in the same order of operations.
+
+    Args:
+        confirmations (dict): The confirmation value arrays, keyed by confirmation name.
+        weights (dict, optional): The group and indicator weights. Defaults to indicator_weights.
+
+    Returns:
+        tuple: The final score array and a dictionary with the weighted score array of each group.
+    """
+    weights = indicator_weights if weights is None else weights
+    group_scores = {}
+
+    for group_name, group_config in weights.items():
+        group_total = 0
+        for ind_name, ind_weight in group_config['indicators'].items():
+            group_total = group_total + confirmations[ind_name] * ind_weight
+
+        group_scores[group_name] = group_total * group_config['total_weight']
+
+    final_score = sum(group_scores.values())
+
+    return final_score, group_scores
+
+
+def signal_confidence_series(confirmations: Dict[str, np.ndarray], sign_threshold=0.5) -> Dict[str, np.ndarray]:
+    """
+    Vectorized version of calculate_signal_confidence(). The signal type is returned as an array of SIGNAL_TYPE_CODES instead of strings.
+
+    Args:
+        confirmations (dict): The confirmation value arrays, keyed by confirmation name.
+        sign_threshold (float): The minimum absolute confirmation value that counts as agreeing on a direction.
+
+    Returns:
+        dict: The confidence metric arrays, with the same keys as calculate_signal_confidence().
+    """
+    values = np.stack(list(confirmations.values()))
+    total_indicators = len(confirmations)
+    bullish_indicators = (values >= sign_threshold).sum(axis=0)
+    bearish_indicators = (values <= -sign_threshold).sum(axis=0)
+    neutral_indicators = total_indicators - bullish_indicators - bearish_indicators
+
+    directional_consensus = (bullish_indicators - bearish_indicators) / total_indicators
+
+    signal_type = np.zeros(directional_consensus.shape, dtype=np.int8)
+    moderate = np.abs(directional_consensus) > 0.3
+    signal_type[moderate] = np.sign(directional_consensus[moderate])
+    signal_type[directional_consensus > 0.8] = SIGNAL_TYPE_CODES['Strong Bullish']
+    signal_type[directional_consensus < -0.8] = SIGNAL_TYPE_CODES['Strong Bearish']
+
+    return {
+        'bullish_confidence': bullish_indicators / total_indicators,
+        'bearish_confidence': bearish_indicators / total_indicators,
+        'neutral_percentage': neutral_indicators / total_indicators,
+        'directional_consensus': directional_consensus,
+        'signal_type': signal_type
+    }
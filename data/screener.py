@@ -0,0 +1,134 @@
+"""
+Cross-pair screening of the signal universe. After the base timeframe confirmations of every pair are evaluated in one vectorized pass, the
+ScreeningIndex computes an upper bound on the directional consensus each pair can reach, and only the pairs whose bound is above the strong
+signal threshold of calculate_signal_confidence() go on to the higher timeframes and scoring. Checks that weren't evaluated by the screen count
+as agreeing with the direction, so the bound is never below the actual consensus, and the higher timeframes can only downgrade a strong signal,
+so a pair screened out can't have become a strong signal.
+
+The index also keeps the pairs sorted by weighted score and by directional consensus after every update, so top-N queries over the whole
+universe don't need any evaluation, and keeps the screened values, so the pairs screened out can still be logged (see rows()).
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from data.scoring import signal_confidence_series, weighted_score_series
+
+
+def consensus_bound(confirmations: Dict[str, np.ndarray], n_checks: int, sign_threshold: float = 0.5) -> np.ndarray:
+    """
+    Return the highest absolute directional consensus every pair can reach.
+
+    Args:
+        confirmations (dict): The known confirmation values of every pair, as one array per check.
+        n_checks (int): The total number of checks of the signal. The checks missing from confirmations are assumed to agree with the direction.
+        sign_threshold (float): The minimum absolute confirmation value that counts as agreeing on a direction.
+
+    Returns:
+        np.ndarray: The bound of each pair.
+    """
+    values = np.stack(list(confirmations.values())) if confirmations else np.zeros((0, 0))
+    bullish = (values >= sign_threshold).sum(axis=0)
+    bearish = (values <= -sign_threshold).sum(axis=0)
+    n_unknown = n_checks - len(confirmations)
+
+    return np.maximum(bullish - bearish, bearish - bullish) / n_checks + n_unknown / n_checks
+
+
+class ScreeningIndex:
+    def __init__(self, strong_threshold: float = 0.8, sign_threshold: float = 0.5, weights: dict = None):
+        """
+        Args:
+            strong_threshold (float): The directional consensus a strong signal has to exceed, see calculate_signal_confidence().
+            sign_threshold (float): The minimum absolute confirmation value that counts as agreeing on a direction.
+            weights (dict, optional): The group and indicator weights the pairs are ranked by. Defaults to scoring.indicator_weights.
+        """
+        self.strong_threshold = strong_threshold
+        self.sign_threshold = sign_threshold
+        self.weights = weights
+
+        self.pairs: List[str] = []
+        self.bound = np.empty(0)
+        self.consensus = np.empty(0)
+        self.score = np.empty(0)
+        self.confirmations: Dict[str, np.ndarray] = {}
+        self.group_scores: Dict[str, np.ndarray] = {}
+        self.confidence: Dict[str, np.ndarray] = {}
+        # Pair indices sorted by descending value, per ranking key
+        self.order: Dict[str, np.ndarray] = {}
+
+    def update(self, pairs: List[str], confirmations: Dict[str, np.ndarray], n_checks: int):
+        """
+        Replace the screened values with the latest confirmations of every pair.
+
+        Args:
+            pairs (list): The pair of each element of the confirmation arrays.
+            confirmations (dict): The confirmation values evaluated by the screen, as one array per check.
+            n_checks (int): The total number of enabled checks, including those the screen didn't evaluate.
+        """
+        self.pairs = list(pairs)
+        self.confirmations = {name: np.asarray(values, dtype=np.float64) for name, values in confirmations.items()}
+        self.bound = consensus_bound(confirmations, n_checks, self.sign_threshold)
+
+        # The confidence and the scores are only known if every check was evaluated (and, for the scores, every weighted check)
+        self.confidence = {}
+        self.consensus = np.full(len(self.pairs), np.nan)
+        if len(confirmations) == n_checks and n_checks:
+            self.confidence = signal_confidence_series(confirmations, self.sign_threshold)
+            self.consensus = self.confidence["directional_consensus"]
+        try:
+            final_score, group_scores = weighted_score_series(confirmations, self.weights)
+            self.score = np.asarray(final_score, dtype=np.float64) * np.ones(len(self.pairs))
+            self.group_scores = {name: np.asarray(score, dtype=np.float64) * np.ones(len(self.pairs)) for name, score in group_scores.items()}
+        except KeyError:
+            self.score = np.full(len(self.pairs), np.nan)
+            self.group_scores = {}
+
+        # NaN sorts last in both directions
+        self.order = {
+            "score": np.argsort(-self.score, kind="stable"),
+            "consensus": np.argsort(-self.consensus, kind="stable")
+        }
+
+    def candidates(self, keep_pairs: Iterable[str] = ()) -> List[str]:
+        """
+        Return the pairs that can reach a strong signal, and the pairs of keep_pairs (e.g. pairs with an active signal, whose changes have to be
+        followed even when they're not strong anymore), in the order of the last update.
+        """
+        keep_pairs = set(keep_pairs)
+        return [pair for pair, bound in zip(self.pairs, self.bound) if bound > self.strong_threshold or pair in keep_pairs]
+
+    def rows(self, pairs: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """
+        Return the screened values of pairs in the columns of the signal log (see signal_log.scored_row()): the confirmations evaluated by the
+        screen, and the weighted score, group scores and base timeframe confidence metrics where they are known. The timeframe agreement is never
+        known, since the screen doesn't evaluate the higher timeframes. Pairs that weren't in the last update are left out.
+        """
+        indices = {pair: i for i, pair in enumerate(self.pairs)}
+        rows = {}
+        for pair in pairs:
+            if pair not in indices:
+                continue
+
+            i = indices[pair]
+            row = {name: float(values[i]) for name, values in self.confirmations.items()}
+            row["score"] = float(self.score[i])
+            for group_name, group_score in self.group_scores.items():
+                row[f"score_{group_name}"] = float(group_score[i])
+            for name, values in self.confidence.items():
+                row[name] = int(values[i]) if name == "signal_type" else float(values[i])
+            rows[pair] = row
+
+        return rows
+
+    def top(self, n: int = 10, key: str = "score", bearish: bool = False) -> List[Tuple[str, float]]:
+        """
+        Return the n pairs with the highest (or, if bearish, the lowest) value of key, "score" or "consensus", with their values. Pairs without
+        a value are left out.
+        """
+        values = getattr(self, key)
+        order = self.order.get(key, np.empty(0, dtype=int))
+        if bearish:
+            order = order[::-1]
+
+        return [(self.pairs[i], float(values[i])) for i in order if not np.isnan(values[i])][:n]
@@ -0,0 +1,170 @@
+"""
+Sharded multi-process signal engine. The pair list is split into shards, and each shard is handled by a long-lived worker process that owns its
+own candle store, Binance client and SignalEngine, so the indicator state of a pair always lives in the same process. On every cycle the
+coordinator tells all workers to fetch and evaluate their pairs in parallel, and merges the confirmation values they send back for scoring and
+alerting in the main process. Only the confirmation values cross the process boundary, never the candles or the indicator state.
+
+The per-minute request weight budget of the IP is split evenly between the workers.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import Connection
+from typing import Dict, List, Tuple
+
+from data.binance_client import BINANCE_API_URL, BinanceClient
+from data.candle_store import CandleStore
+from data.engine import SignalEngine
+from data.metrics import metrics
+
+
+def shard_pairs(pairs: List[str], num_shards: int) -> List[List[str]]:
+    """
+    Split the pairs into num_shards shards of (almost) equal size, leaving out empty shards.
+    """
+    return [shard for shard in (pairs[i::num_shards] for i in range(num_shards)) if shard]
+
+
+def _worker_main(conn: Connection, pairs: List[str], timeframe: str, candle_store_dir: str, candle_history_size: int, base_url: str,
+                 weight_limit: int, max_concurrency: int, engine_kwargs: dict):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    client = BinanceClient(base_url, max_concurrency=max_concurrency, weight_limit=weight_limit)
+    candle_store = CandleStore(candle_store_dir, capacity=candle_history_size, client=client)
+    engine = SignalEngine(timeframe=timeframe, **engine_kwargs)
+
+    try:
+        while True:
+            command = conn.recv()
+            if command is None:
+                break
+
+            try:
+                fetch_start = time.perf_counter()
+                pairs_data = loop.run_until_complete(candle_store.update(pairs, timeframe))
+                evaluate_start = time.perf_counter()
+                results = engine.evaluate(pairs_data)
+                timings = {"shard_fetch": evaluate_start - fetch_start, "shard_evaluate": time.perf_counter() - evaluate_start}
+                conn.send((results, timings, None))
+            except Exception as e:
+                conn.send((None, None, repr(e)))
+
+            # After the results are sent, so writing the candles doesn't hold up the cycle
+            loop.run_until_complete(candle_store.persist())
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        loop.run_until_complete(candle_store.persist(force=True))
+        loop.run_until_complete(client.close())
+        loop.close()
+
+
+class ShardedEngine:
+    def __init__(self, pairs: List[str], timeframe: str = "1h", num_shards: int = None, candle_store_dir: str = "./candle_store",
+                 candle_history_size: int = 1000, base_url: str = BINANCE_API_URL, weight_limit: int = 6000, max_concurrency: int = 10,
+                 **engine_kwargs):
+        """
+        Args:
+            pairs (list): The trading pair symbols to evaluate.
+            timeframe (str): The base timeframe of the candles.
+            num_shards (int, optional): The number of worker processes. Defaults to the number of CPU cores.
+            candle_store_dir (str): The directory of the candle store. The workers share it, since every pair is only written by one worker.
+            candle_history_size (int): The number of candles stored for each pair.
+            base_url (str): The base URL of the Binance REST API.
+            weight_limit (int): The request weight allowed per minute for the whole IP, split between the workers.
+            max_concurrency (int): The maximum number of requests in flight at once in each worker.
+            **engine_kwargs: Passed on to the SignalEngine of every worker.
+        """
+        self.shards = shard_pairs(list(pairs), num_shards or os.cpu_count())
+        self.timeframe = timeframe
+        self.candle_store_dir = candle_store_dir
+        self.candle_history_size = candle_history_size
+        self.base_url = base_url
+        self.weight_limit = weight_limit // max(len(self.shards), 1)
+        self.max_concurrency = max_concurrency
+        self.engine_kwargs = engine_kwargs
+
+        # Spawned rather than forked, since the coordinator runs in a process that already has threads and an event loop
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: List[multiprocessing.Process] = [None] * len(self.shards)
+        self.connections: List[Connection] = [None] * len(self.shards)
+
+    def _start_worker(self, shard_index: int):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.shards[shard_index], self.timeframe, self.candle_store_dir, self.candle_history_size, self.base_url,
+                  self.weight_limit, self.max_concurrency, self.engine_kwargs),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        self.processes[shard_index] = process
+        self.connections[shard_index] = parent_conn
+
+    def start(self):
+        """
+        Start a worker process for every shard.
+        """
+        for shard_index in range(len(self.shards)):
+            self._start_worker(shard_index)
+
+    def close(self):
+        """
+        Stop all worker processes.
+        """
+        for shard_index, (process, conn) in enumerate(zip(self.processes, self.connections)):
+            if process is None:
+                continue
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+            self.processes[shard_index] = None
+
+    def _run_shard(self, shard_index: int):
+        self.connections[shard_index].send("cycle")
+        return self.connections[shard_index].recv()
+
+    async def run_cycle(self) -> Tuple[Dict[str, dict], Dict[str, Dict[str, dict]]]:
+        """
+        Fetch and evaluate every shard in parallel and merge the results. A worker that died is restarted, and its pairs are left out of this cycle.
+
+        Returns:
+            tuple: The confirmation values of every pair on the base timeframe, and those on each higher timeframe keyed by timeframe, like
+            SignalEngine.evaluate().
+        """
+        loop = asyncio.get_running_loop()
+        replies = await asyncio.gather(*(loop.run_in_executor(None, self._run_shard, i) for i in range(len(self.shards))), return_exceptions=True)
+
+        confirmations_data = {}
+        higher_confirmations_data = {}
+        for shard_index, reply in enumerate(replies):
+            if isinstance(reply, Exception):
+                print(f"Worker of shard {shard_index} died ({reply!r}), restarting it")
+                self.processes[shard_index].terminate()
+                self._start_worker(shard_index)
+                continue
+
+            results, timings, error = reply
+            if error is not None:
+                print(f"Shard {shard_index} failed: {error}")
+                continue
+
+            for stage, seconds in timings.items():
+                metrics.observe(stage, seconds)
+
+            shard_confirmations, shard_higher_confirmations = results
+            confirmations_data.update(shard_confirmations)
+            for higher_timeframe, higher_data in shard_higher_confirmations.items():
+                higher_confirmations_data.setdefault(higher_timeframe, {}).update(higher_data)
+
+        metrics.increment("pairs_evaluated_total", len(confirmations_data))
+        return confirmations_data, higher_confirmations_data
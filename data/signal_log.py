@@ -0,0 +1,345 @@
+"""
+Append-only columnar log of the scored signals. Every cycle appends one row per scored pair with its confirmation values, the weighted score and
+group scores, and the confidence metrics, so the history of the signals can be analysed (or fed to the backtester and dashboards) without
+fetching and recomputing anything.
+
+The log is partitioned by UTC day and pair, under <root_dir>/<YYYY-MM-DD>/<pair>/ (pairs of other exchanges than the default one get a
+subdirectory per exchange, like in the candle store). A partition holds one raw little-endian binary file per column, and a schema.json listing
+the columns and their dtypes. Rows are appended to the end of every column file, and the time column is written last, so its length is the
+number of complete rows: a crash mid-append leaves at most a partial row behind, which is ignored by reads and truncated by the first append to
+the partition after a restart. The schema and the row count of the partitions being appended to are cached, so an append only opens the column
+files. The column files are read with np.memmap, so a query only pages in the columns and partitions it reads.
+
+submit() appends in a background thread, so the live loop doesn't wait on the disk. The appends are written in order by a single thread, which
+is the only one touching the cached partitions, so submit() and append() shouldn't be mixed on the same log.
+
+With screening (see data.screener), the pairs screened out of a cycle can be logged along with the scored ones, with the values of the screen and
+a screened_out column of 1: the confirmations evaluated by the screen, and the scores and confidence metrics where the screen knows them (the
+others are NaN, and the signal type of a screened-out row whose confidence isn't known is 0). A pair screened out can't be a strong signal.
+
+A column that first appears in a partition (e.g. after a confirmation check was enabled) is filled with NaN for the earlier rows, and a column
+missing from a row gets NaN, so every column of a partition always has the same number of rows.
+"""
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data import utils
+from data.exchanges.router import split_pair
+from data.scoring import SIGNAL_TYPE_CODES
+
+TIME_COLUMN = "time"
+
+# The dtype of the columns that aren't float64
+COLUMN_DTYPES = {
+    TIME_COLUMN: "<i8",
+    "signal_type": "<i1",
+    "screened_out": "<i1"
+}
+
+# The confidence metrics logged as columns, besides the signal type
+CONFIDENCE_COLUMNS = ("bullish_confidence", "bearish_confidence", "neutral_percentage", "directional_consensus", "timeframe_agreement")
+
+
+def day_of(time_ms: int) -> str:
+    """
+    Return the UTC day of a time in milliseconds since epoch, in the format of the partition directories.
+    """
+    return time.strftime("%Y-%m-%d", time.gmtime(time_ms / 1000))
+
+
+def scored_row(scored: dict) -> Dict[str, float]:
+    """
+    Flatten the scored confirmations of a pair (see scoring.score_pairs()) into the columns of a log row. The group scores are prefixed with
+    "score_", and the signal type is stored as its SIGNAL_TYPE_CODES code.
+    """
+    row = {name: value for name, value in scored.items() if name not in ("average", "confidence")}
+
+    final_score, group_scores = scored["average"]
+    row["score"] = final_score
+    for group_name, group_score in group_scores.items():
+        row[f"score_{group_name}"] = group_score
+
+    confidence = scored["confidence"]
+    for name in CONFIDENCE_COLUMNS:
+        row[name] = confidence.get(name, np.nan)
+    row["signal_type"] = SIGNAL_TYPE_CODES[confidence["signal_type"]]
+    row["screened_out"] = 0
+
+    return row
+
+
+class SignalLog:
+    def __init__(self, root_dir: str = "./signal_log"):
+        """
+        Args:
+            root_dir (str): The directory the log is stored in.
+        """
+        self.root_dir = root_dir
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+        # The schema and the number of rows of the partitions appended to by this process, for the day of the last append
+        self.partitions: Dict[str, Tuple[Dict[str, str], int]] = {}
+        self.partitions_day: Optional[str] = None
+
+    def _partition_dir(self, day: str, pair: str) -> str:
+        exchange, symbol = split_pair(pair)
+        if exchange is None:
+            return os.path.join(self.root_dir, day, pair)
+
+        return os.path.join(self.root_dir, day, exchange, symbol)
+
+    @staticmethod
+    def _column_path(partition_dir: str, column: str) -> str:
+        return os.path.join(partition_dir, f"{column}.bin")
+
+    @staticmethod
+    def _load_schema(partition_dir: str) -> Dict[str, str]:
+        schema_path = os.path.join(partition_dir, "schema.json")
+        if not os.path.exists(schema_path):
+            return {}
+
+        with open(schema_path) as schema_file:
+            return json.load(schema_file)["columns"]
+
+    @staticmethod
+    def _save_schema(partition_dir: str, schema: Dict[str, str]):
+        # Written to a temporary path first and moved into place, like the candle store files
+        schema_path = os.path.join(partition_dir, "schema.json")
+        with open(schema_path + ".tmp", "w") as schema_file:
+            json.dump({"columns": schema}, schema_file)
+        os.replace(schema_path + ".tmp", schema_path)
+
+    def _num_rows(self, partition_dir: str) -> int:
+        time_path = self._column_path(partition_dir, TIME_COLUMN)
+        if not os.path.exists(time_path):
+            return 0
+
+        return os.path.getsize(time_path) // np.dtype(COLUMN_DTYPES[TIME_COLUMN]).itemsize
+
+    def append_rows(self, pair: str, times: Iterable[int], rows: List[Dict[str, float]]):
+        """
+        Append rows to the partitions of a pair. The rows are split by the day of their time.
+
+        Args:
+            pair (str): The pair of the rows.
+            times (list): The time of each row in milliseconds since epoch.
+            rows (list): The column values of each row.
+        """
+        times = np.asarray(list(times), dtype=COLUMN_DTYPES[TIME_COLUMN])
+        days = [day_of(int(time_ms)) for time_ms in times]
+        for day in dict.fromkeys(days):
+            if day != self.partitions_day:
+                # The partitions of earlier days aren't appended to anymore
+                self.partitions = {}
+                self.partitions_day = day
+
+            indices = [i for i, row_day in enumerate(days) if row_day == day]
+            partition_dir = self._partition_dir(day, pair)
+            try:
+                self.partitions[partition_dir] = self._append_partition(partition_dir, times[indices], [rows[i] for i in indices])
+            except BaseException:
+                # The files may hold a partial row now, so the next append reads the partition again and truncates it
+                self.partitions.pop(partition_dir, None)
+                raise
+
+    def _append_partition(self, partition_dir: str, times: np.ndarray, rows: List[Dict[str, float]]) -> Tuple[Dict[str, str], int]:
+        cached = self.partitions.get(partition_dir)
+        if cached is None:
+            os.makedirs(partition_dir, exist_ok=True)
+            schema = self._load_schema(partition_dir)
+            num_rows = self._num_rows(partition_dir)
+        else:
+            schema, num_rows = cached
+        # The files of a cached partition were all written by this process, so they have no partial row to drop
+        truncate = cached is None
+
+        new_columns = [column for row in rows for column in row if column not in schema]
+        if new_columns:
+            for column in dict.fromkeys(new_columns):
+                schema[column] = COLUMN_DTYPES.get(column, "<f8")
+                # The rows logged before the column existed are NaN (or 0 for integer columns)
+                np.full(num_rows, np.nan if np.dtype(schema[column]).kind == "f" else 0, dtype=schema[column]).tofile(
+                    self._column_path(partition_dir, column))
+            schema[TIME_COLUMN] = COLUMN_DTYPES[TIME_COLUMN]
+            self._save_schema(partition_dir, schema)
+
+        for column, dtype in schema.items():
+            if column == TIME_COLUMN:
+                continue
+
+            fill_value = np.nan if np.dtype(dtype).kind == "f" else 0
+            values = np.array([row.get(column, fill_value) for row in rows], dtype=dtype)
+            with open(self._column_path(partition_dir, column), "ab") as column_file:
+                if truncate:
+                    # Drop a partial row left behind by an interrupted append
+                    column_file.truncate(num_rows * values.itemsize)
+                values.tofile(column_file)
+
+        with open(self._column_path(partition_dir, TIME_COLUMN), "ab") as time_file:
+            if truncate:
+                time_file.truncate(num_rows * times.itemsize)
+            times.tofile(time_file)
+
+        return schema, num_rows + len(times)
+
+    def append(self, scored_pairs: Dict[str, dict], time_ms: Optional[int] = None, screened_rows: Dict[str, Dict[str, float]] = None):
+        """
+        Append the scored confirmations of every pair as one row per pair.
+
+        Args:
+            scored_pairs (dict): The scored confirmations of every pair, see scoring.score_pairs().
+            time_ms (int, optional): The time of the rows in milliseconds since epoch. Defaults to utils.now_ms().
+            screened_rows (dict, optional): The screened values of the pairs screened out, see ScreeningIndex.rows(). Logged with screened_out = 1.
+        """
+        time_ms = utils.now_ms() if time_ms is None else time_ms
+        self._append_scored_rows(time_ms, self._build_rows(scored_pairs, screened_rows))
+
+    @staticmethod
+    def _build_rows(scored_pairs: Dict[str, dict], screened_rows: Optional[Dict[str, Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+        rows = {pair: scored_row(scored) for pair, scored in scored_pairs.items()}
+        for pair, row in (screened_rows or {}).items():
+            if pair not in rows:
+                rows[pair] = dict(row, screened_out=1)
+
+        return rows
+
+    def _append_scored_rows(self, time_ms: int, rows: Dict[str, Dict[str, float]]):
+        for pair, row in rows.items():
+            self.append_rows(pair, [time_ms], [row])
+
+    def submit(self, scored_pairs: Dict[str, dict], time_ms: Optional[int] = None, screened_rows: Dict[str, Dict[str, float]] = None) -> Future:
+        """
+        Append the scored confirmations of every pair like append(), in the background thread of the log. The rows are built right away, so the
+        scored pairs can change once this returns.
+
+        Returns:
+            Future: Completed once the rows are written, with the error of the append if it failed.
+        """
+        time_ms = utils.now_ms() if time_ms is None else time_ms
+        rows = self._build_rows(scored_pairs, screened_rows)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="signal-log")
+
+        return self.executor.submit(self._append_scored_rows, time_ms, rows)
+
+    def close(self):
+        """
+        Wait for the submitted appends to be written and stop the background thread.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def days(self) -> List[str]:
+        """
+        Return the days that have a partition, in order.
+        """
+        if not os.path.isdir(self.root_dir):
+            return []
+
+        return sorted(day for day in os.listdir(self.root_dir) if os.path.isdir(os.path.join(self.root_dir, day)))
+
+    def pairs(self, day: str) -> List[str]:
+        """
+        Return the pairs that have a partition on a day.
+        """
+        day_dir = os.path.join(self.root_dir, day)
+        pairs = []
+        for root, _, file_names in os.walk(day_dir):
+            if "schema.json" in file_names:
+                relative_path = os.path.relpath(root, day_dir).split(os.sep)
+                pairs.append(relative_path[0] if len(relative_path) == 1 else f"{relative_path[0]}:{relative_path[1]}")
+
+        return sorted(pairs)
+
+    def read_partition(self, day: str, pair: str, columns: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Memory-map the columns of a partition. The arrays are read-only views of the files, so nothing is read until they are accessed.
+
+        Args:
+            day (str): The day of the partition, as YYYY-MM-DD.
+            pair (str): The pair of the partition.
+            columns (list, optional): The columns to map. Defaults to every column. The time column is always included.
+
+        Returns:
+            dict: The array of each column, empty if the partition doesn't exist. Columns missing from the partition are left out.
+        """
+        partition_dir = self._partition_dir(day, pair)
+        schema = self._load_schema(partition_dir)
+        num_rows = self._num_rows(partition_dir)
+        if not num_rows:
+            return {}
+
+        columns = schema if columns is None else [TIME_COLUMN] + [column for column in columns if column != TIME_COLUMN]
+        return {
+            column: np.memmap(self._column_path(partition_dir, column), dtype=schema[column], mode="r", shape=(num_rows,))
+            for column in columns if column in schema
+        }
+
+    def read(self, pair: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None, columns: Iterable[str] = None) -> pd.DataFrame:
+        """
+        Read the rows of a pair logged between start_ms and end_ms (inclusive).
+
+        Args:
+            pair (str): The pair to read.
+            start_ms (int, optional): The earliest time to read in milliseconds since epoch. Defaults to the start of the log.
+            end_ms (int, optional): The latest time to read in milliseconds since epoch. Defaults to the end of the log.
+            columns (list, optional): The columns to read. Defaults to every column.
+
+        Returns:
+            pd.DataFrame: The rows in time order, with the time column as the index.
+        """
+        frames = []
+        for day in self.days():
+            if (start_ms is not None and day < day_of(start_ms)) or (end_ms is not None and day > day_of(end_ms)):
+                continue
+
+            partition = self.read_partition(day, pair, columns)
+            if not partition:
+                continue
+
+            times = partition[TIME_COLUMN]
+            selected = np.ones(len(times), dtype=bool)
+            if start_ms is not None:
+                selected &= times >= start_ms
+            if end_ms is not None:
+                selected &= times <= end_ms
+            frames.append(pd.DataFrame({column: np.asarray(values[selected]) for column, values in partition.items()}))
+
+        if not frames:
+            return pd.DataFrame(columns=[TIME_COLUMN]).set_index(TIME_COLUMN)
+
+        return pd.concat(frames, ignore_index=True).set_index(TIME_COLUMN)
+
+    def read_column(self, column: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None, pairs: Iterable[str] = None) -> \
+            pd.DataFrame:
+        """
+        Read one column of several pairs as a (times x pairs) table, e.g. the score of every pair for a dashboard, or the confirmations of a
+        check for the backtester.
+
+        Args:
+            column (str): The column to read.
+            start_ms (int, optional): The earliest time to read in milliseconds since epoch.
+            end_ms (int, optional): The latest time to read in milliseconds since epoch.
+            pairs (list, optional): The pairs to read. Defaults to every pair with a partition in the time range.
+
+        Returns:
+            pd.DataFrame: The values indexed by time, with one column per pair. Times a pair wasn't logged at are NaN.
+        """
+        if pairs is None:
+            pairs = sorted({pair for day in self.days() if (start_ms is None or day >= day_of(start_ms)) and
+                            (end_ms is None or day <= day_of(end_ms)) for pair in self.pairs(day)})
+
+        series = {}
+        for pair in pairs:
+            pair_df = self.read(pair, start_ms, end_ms, [column])
+            if column in pair_df:
+                series[pair] = pair_df[column]
+
+        return pd.DataFrame(series)
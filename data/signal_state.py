@@ -0,0 +1,157 @@
+"""
+Per-pair signal state machine. Instead of re-sending the whole set of strong signals whenever it changes, every pair keeps the state of its
+active signal and only the transitions between states are emitted:
+
+- new: a strong signal appears on a pair without an active signal.
+- strengthened: the weighted score of an active signal grew by at least strengthen_delta since its last alert, or a weakened signal became
+  strong again.
+- weakened: the directional consensus of a strong signal dropped below exit_threshold. Entering a strong signal takes a consensus above the
+  strong threshold of the signal confidence (0.8), so the gap between the two thresholds is the hysteresis that keeps a signal hovering around
+  0.8 from flapping.
+- flipped: a strong signal appears in the opposite direction of the active signal.
+- expired: the consensus of an active signal dropped to neutral_threshold or below, or the pair wasn't scored for stale_after seconds.
+
+A new signal within cooldown seconds of the last alert of the pair, and a strengthened or weakened transition within cooldown seconds of the
+last alert of the signal, are deferred until the cooldown has passed. Flips and expiries are never deferred. The states are persisted to a JSON
+file after every update, so a restart doesn't alert again on signals that were already sent.
+"""
+import json
+import os
+from typing import Dict, List
+
+from data import utils
+from data.scoring import STRONG_SIGNAL_TYPES
+
+TRANSITIONS = ["new", "strengthened", "weakened", "flipped", "expired"]
+
+
+class SignalStateMachine:
+    def __init__(self, state_path: str = "./signal_state.json", exit_threshold: float = 0.5, neutral_threshold: float = 0.3,
+                 strengthen_delta: float = 0.2, cooldown: float = 3600, stale_after: float = None):
+        """
+        Args:
+            state_path (str): The JSON file the states are persisted to, None to keep them in memory only.
+            exit_threshold (float): The directional consensus below which a strong signal is weakened.
+            neutral_threshold (float): The directional consensus at or below which an active signal expires.
+            strengthen_delta (float): The growth of the absolute weighted score since the last alert that counts as strengthening.
+            cooldown (float): The time in seconds new, strengthened and weakened transitions are deferred for after the last alert of the pair.
+            stale_after (float, optional): The time in seconds after which the signal of a pair that isn't scored anymore expires. None keeps
+                it until the pair is scored again.
+        """
+        self.state_path = state_path
+        self.exit_threshold = exit_threshold
+        self.neutral_threshold = neutral_threshold
+        self.strengthen_delta = strengthen_delta
+        self.cooldown = cooldown
+        self.stale_after = stale_after
+
+        # The active signal of every pair, and the time of the last alert of pairs whose signal expired
+        self.states: Dict[str, dict] = {}
+        self.last_alerts: Dict[str, float] = {}
+        self.load()
+
+    def load(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return
+
+        with open(self.state_path) as state_file:
+            stored = json.load(state_file)
+        self.states = stored.get("states", {})
+        self.last_alerts = stored.get("last_alerts", {})
+
+    def save(self):
+        """
+        Write the states to disk. The file is written to a temporary path first and then moved into place, so a crash mid-write never leaves a
+        corrupted file behind.
+        """
+        if self.state_path is None:
+            return
+
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump({"states": self.states, "last_alerts": self.last_alerts}, state_file)
+        os.replace(tmp_path, self.state_path)
+
+    def _in_cooldown(self, last_alert: float, now: float) -> bool:
+        return last_alert is not None and now - last_alert < self.cooldown
+
+    def _transition(self, pair: str, transition: str, scored: dict, now: float, previous_state: dict = None) -> dict:
+        confidence = scored["confidence"] if scored is not None else {}
+        return {
+            "pair": pair,
+            "transition": transition,
+            "time": now,
+            "signal_type": confidence.get("signal_type", "Neutral"),
+            "previous_signal_type": previous_state["signal_type"] if previous_state is not None else None,
+            "score": scored["average"][0] if scored is not None else None,
+            "consensus": confidence.get("directional_consensus"),
+            "confirmations": {name: value for name, value in scored.items() if name not in ("average", "confidence")} if scored is not None else {}
+        }
+
+    def _activate(self, pair: str, scored: dict, now: float, level: str = "strong"):
+        consensus = scored["confidence"]["directional_consensus"]
+        previous_state = self.states.get(pair)
+        self.states[pair] = {
+            "direction": 1 if consensus > 0 else -1,
+            "level": level,
+            "signal_type": scored["confidence"]["signal_type"],
+            "score": scored["average"][0],
+            "since": previous_state["since"] if previous_state is not None and level != "strong" else now,
+            "last_seen": now,
+            "last_alert": now
+        }
+
+    def update(self, scored_pairs: Dict[str, dict], now: float = None) -> List[dict]:
+        """
+        Advance the state of every pair with its latest scores and return the transitions.
+
+        Args:
+            scored_pairs (dict): The scored confirmations of every pair, see scoring.score_pairs().
+            now (float, optional): The current time in seconds since epoch. Defaults to utils.now_ms().
+
+        Returns:
+            list: One dict per transition with the pair, the transition, the new and previous signal type, the weighted score, the directional
+            consensus and the confirmation values.
+        """
+        now = utils.now_ms() / 1000 if now is None else now
+        transitions = []
+
+        for pair, scored in scored_pairs.items():
+            confidence = scored["confidence"]
+            consensus = confidence["directional_consensus"]
+            is_strong = confidence["signal_type"] in STRONG_SIGNAL_TYPES
+            state = self.states.get(pair)
+
+            if state is None:
+                if is_strong and not self._in_cooldown(self.last_alerts.get(pair), now):
+                    self._activate(pair, scored, now)
+                    transitions.append(self._transition(pair, "new", scored, now))
+                continue
+
+            state["last_seen"] = now
+            aligned_consensus = consensus * state["direction"]
+
+            if is_strong and aligned_consensus < 0:
+                transitions.append(self._transition(pair, "flipped", scored, now, state))
+                self._activate(pair, scored, now)
+            elif aligned_consensus <= self.neutral_threshold:
+                transitions.append(self._transition(pair, "expired", scored, now, state))
+                self.last_alerts[pair] = now
+                del self.states[pair]
+            elif self._in_cooldown(state["last_alert"], now):
+                continue
+            elif state["level"] == "strong" and aligned_consensus < self.exit_threshold:
+                transitions.append(self._transition(pair, "weakened", scored, now, state))
+                self._activate(pair, scored, now, level="weak")
+            elif is_strong and (state["level"] == "weak" or abs(scored["average"][0]) - abs(state["score"]) >= self.strengthen_delta):
+                transitions.append(self._transition(pair, "strengthened", scored, now, state))
+                self._activate(pair, scored, now)
+
+        if self.stale_after is not None:
+            for pair in [pair for pair, state in self.states.items() if pair not in scored_pairs and now - state["last_seen"] > self.stale_after]:
+                transitions.append(self._transition(pair, "expired", None, now, self.states[pair]))
+                self.last_alerts[pair] = now
+                del self.states[pair]
+
+        self.save()
+        return transitions
@@ -1,17 +1,21 @@
-import aiohttp
 import asyncio
+import numpy as np
 import pandas as pd
 import time
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
 
+from data.binance_client import BinanceClient
+from data.metrics import metrics
 
-async def fetch_candlestick_data(session: aiohttp.ClientSession, symbol: str, timeframe: str, start_time: int, end_time: int, num_candles: int) -> \
-        Optional[Tuple[str, List[List]]]:
+
+async def fetch_candlestick_data(client: BinanceClient, symbol: str, timeframe: str, start_time: int, end_time: int, num_candles: int) -> \
+        Tuple[str, List[List]]:
     """
-    Fetch historical candlestick data for a given trading pair from the Binance API.
+    Fetch historical candlestick data for a given trading pair from the Binance API. Requests for more candles than the per-request limit are
+    split into several requests.
 
     Args:
-        session (aiohttp.ClientSession): The aiohttp session to use for the request.
+        client (BinanceClient): The client to send the requests with.
         symbol (str): The trading pair symbol (e.g., 'BTCUSDT').
         timeframe (str): The timeframe of the candles (e.g., '1m', '5m', '1h', '1d').
         start_time (int): The start time in milliseconds since epoch.
@@ -19,60 +23,150 @@ async def fetch_candlestick_data(session: aiohttp.ClientSession, symbol: str, ti
         num_candles (int): The number of candles to fetch.
 
     Returns:
-        Optional[Tuple[str, List[List]]]: A tuple containing the symbol and the fetched data, or None if the fetching fails.
+        Tuple[str, List[List]]: A tuple containing the symbol and the fetched data.
+
+    Raises:
+        BinanceAPIError: If the data couldn't be fetched.
+    """
+    data = await client.get_klines(symbol, timeframe, start_time, end_time, num_candles, timeframe_to_ms(timeframe))
+    return symbol, data
+
+
+_default_client: Optional[BinanceClient] = None
+
+
+def get_default_client() -> BinanceClient:
+    """
+    Return the shared client used when no client is passed in, so every fetch reuses the same connection pool and weight tracking.
     """
-    url = f"https://api.binance.com/api/v3/klines"
-    params = {
-        "symbol": symbol,
-        "interval": timeframe,
-        "startTime": start_time,
-        "endTime": end_time,
-        "limit": num_candles
-    }
-    try:
-        async with session.get(url, params=params) as response:
-            data = await response.json()
-            return symbol, data
-    except Exception as e:
-        print(f"Failed to fetch data for {symbol}: {e}")
-        return None
+    global _default_client
+    if _default_client is None:
+        _default_client = BinanceClient()
+
+    return _default_client
 
 
-async def get_multiple_pairs_data(pairs: List[str], timeframe: str, num_candles: int) -> Dict[str, pd.DataFrame]:
+def timeframe_to_ms(timeframe: str) -> int:
     """
-    Fetch historical candlestick data for multiple trading pairs concurrently.
+    Convert a Binance timeframe string (e.g., '1m', '1h', '1d') to its length in milliseconds.
+    """
+    return int(pd.Timedelta(timeframe).total_seconds() * 1000)
+
+
+def seconds_until_candle_close(timeframe: str) -> float:
+    """
+    Return the number of seconds until the currently open candle of the given timeframe closes.
+    """
+    timeframe_ms = timeframe_to_ms(timeframe)
+    return (timeframe_ms - now_ms() % timeframe_ms) / 1000
+
+
+# The clock now_ms() reads, replaced by a virtual clock when replaying recorded candles
+_clock: Callable[[], float] = time.time
+
+
+def set_clock(clock: Optional[Callable[[], float]] = None):
+    """
+    Replace the clock now_ms() reads with a function returning seconds since epoch. None restores the system clock.
+    """
+    global _clock
+    _clock = clock or time.time
+
+
+def now_ms() -> int:
+    """
+    Return the current time in milliseconds since epoch.
+    """
+    return int(_clock() * 1000)
+
+
+def to_milliseconds(times: pd.Series) -> np.ndarray:
+    """
+    Convert a series of tz-aware timestamps to integer milliseconds since epoch. Open times that are already integer milliseconds, like the time
+    column of a CandleBuffer, are returned as they are.
+    """
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.integer):
+        return times.astype(np.int64, copy=False)
+    return ((times - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)).to_numpy(dtype=np.int64)
+
+
+KLINE_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+
+def parse_klines(data: List[List]) -> pd.DataFrame:
+    """
+    Parse a Binance kline response into a DataFrame. The open times and the price/volume strings are decoded in bulk into typed NumPy arrays, and
+    the open times are converted to timestamps in a single vectorized call.
+
+    Args:
+        data (list): The kline rows as returned by the /api/v3/klines endpoint.
+
+    Returns:
+        pd.DataFrame: A DataFrame with a tz-aware "time" column and float64 open, high, low, close and volume columns.
+    """
+    if not isinstance(data, list):
+        raise ValueError(f"Unexpected kline response: {data}")
+
+    open_times = np.fromiter((row[0] for row in data), dtype=np.int64, count=len(data))
+    values = np.array([row[1:6] for row in data], dtype=np.float64).reshape(len(data), 5)
+
+    return pd.DataFrame({
+        "time": pd.to_datetime(open_times, unit="ms", utc=True),
+        "open": values[:, 0],
+        "high": values[:, 1],
+        "low": values[:, 2],
+        "close": values[:, 3],
+        "volume": values[:, 4]
+    })
+
+
+async def get_multiple_pairs_data(pairs: List[str], timeframe: str, num_candles: int, start_times: Optional[Dict[str, int]] = None,
+                                  client: Optional[BinanceClient] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch historical candlestick data for multiple trading pairs concurrently. Pairs that fail to fetch or parse are reported and left out of the
+    result.
 
     Args:
         pairs (list): A list of trading pair symbols (e.g., ['BTCUSDT', 'ETHUSDT']).
         timeframe (str): The timeframe of the candles (e.g., '1m', '5m', '1h', '1d').
         num_candles (int): The number of candles to fetch for each pair.
+        start_times (dict, optional): Per-pair start times in milliseconds since epoch. Pairs present in this dict are fetched starting from the
+            given open time instead of the last num_candles candles, which is used for incremental updates.
+        client (BinanceClient, optional): The client to send the requests with. Defaults to the shared client.
 
     Returns:
         dict: A dictionary where keys are trading pair symbols and values are pandas DataFrames containing the candlestick data.
     """
-    end_time = int(time.time() * 1000)
-    timeframe_seconds = pd.Timedelta(timeframe).total_seconds()
-    start_time = end_time - (num_candles * int(timeframe_seconds * 1000))
+    client = client or get_default_client()
+    end_time = now_ms()
+    start_time = end_time - (num_candles * timeframe_to_ms(timeframe))
+    start_times = start_times or {}
 
-    async with aiohttp.ClientSession(trust_env=True) as session:
-        # Create a list of tasks for fetching data for each pair
-        tasks = [fetch_candlestick_data(session, pair, timeframe, start_time, end_time, num_candles) for pair in pairs]
-        # Run the tasks concurrently
-        results = await asyncio.gather(*tasks)
+    # Create a list of tasks for fetching data for each pair
+    tasks = [fetch_candlestick_data(client, pair, timeframe, start_times.get(pair, start_time), end_time, num_candles) for pair in pairs]
+    # Run the tasks concurrently, the client limits how many requests are actually in flight
+    with metrics.stage("fetch"):
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
     data_frames = {}
-    for result in results:
-        if result is not None:
-            symbol, data = result
-            # Convert the data to a pandas DataFrame
-            try:
-                data = [[pd.to_datetime(row[0], unit='ms', utc=True)] + row[1:5] for row in data]
-            except:
-                continue
-
-            df = pd.DataFrame(data, columns=["time", "open", "high", "low", "close"])
-            # Convert the open, high, low, and close columns to numeric
-            df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].apply(pd.to_numeric)
-            data_frames[symbol] = df
+    failed_pairs = {}
+    for pair, result in zip(pairs, results):
+        if isinstance(result, Exception):
+            failed_pairs[pair] = result
+            continue
+
+        symbol, data = result
+        # Convert the data to a pandas DataFrame
+        try:
+            with metrics.stage("parse"):
+                data_frames[symbol] = parse_klines(data)
+            metrics.increment("candles_fetched_total", len(data))
+        except (ValueError, TypeError, IndexError) as e:
+            failed_pairs[symbol] = e
+
+    if failed_pairs:
+        print(f"Failed to fetch data for {len(failed_pairs)}/{len(pairs)} pairs:")
+        for pair, error in failed_pairs.items():
+            print(f"    {pair}: {error}")
 
     return data_frames
@@ -1,162 +1,414 @@
 import pandas as pd
 import asyncio
-import json
-import requests
+from concurrent.futures import Future
 from datetime import datetime
 from dotenv import dotenv_values
 
-from data import utils
-from data.indicators.keltner import keltner
-from data.indicators.ichimoku import Ichimoku
-from data.indicators.rsi import rsi
-from data.indicators.macd import macd
-from data.confirmations import Confirmations
-from data.indicators.stochastic_osc import stochastic_osc
+from data import scoring, utils
+from data.candle_store import CandleStore
+from data.config import ConfigWatcher, number_dict_validator, validate_positive_int, validate_str_list, validate_timeframe, validate_timeframe_list, \
+    weights_validator
+from data.confirmations import CONFIRMATION_CHECKS
+from data.kline_stream import KlineStream
+from data.metrics import metrics
+from data.notifier import TELEGRAM_API_URL, TelegramNotifier
+from data.engine import SignalEngine
+from data.exchanges.local_client import LocalFileClient
+from data.exchanges.nobitex_client import NobitexClient
+from data.exchanges.router import ExchangeRouter
+from data.pipeline import StagedPipeline
+from data.sharding import ShardedEngine
+from data.signal_log import SignalLog
+from data.signal_state import SignalStateMachine
 
 # Telegram bot token and chat ID
 envs = dotenv_values("./.env.secret")
 TELEGRAM_BOT_TOKEN = envs["TELEGRAM_BOT_TOKEN"]
 TELEGRAM_CHAT_ID = envs["TELEGRAM_CHAT_ID"]
+TELEGRAM_API_URL = envs.get("TELEGRAM_API_URL", TELEGRAM_API_URL)
 
 timeframe = "1h"
+# Higher timeframes derived from the stored base timeframe candles. A strong signal needs most of them to agree on its direction.
+higher_timeframes = ["4h", "1d"]
 recent_window_size = 5
 pair_list = pd.read_csv("./pair_list.csv")["pairs"].tolist()
-
-ichimoku = Ichimoku(pd.DataFrame())
-confirmations = Confirmations(pd.DataFrame(), pd.DataFrame(), recent_window_size)
-previous_signals = {}
-
-
-def send_telegram_message(message):
-    print(message)
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-    }
-    response = requests.post(url, json=payload)
-    return response
-
-
-# Indicator Weights
-indicator_weights = {
-    # Trend Indicators Group
-    'ichimoku_group': {
-        'total_weight': 1,
-        'indicators': {
-            'ichimoku_cloud_color': 0.2,
-            'ichimoku_crossover': 0.5,
-            'ichimoku_kumo_relative_position': 0.3
-        }
-    },
-
-    # Momentum Indicators Group
-    'momentum_group': {
-        'total_weight': 0,
-        'indicators': {
-            'rsi': 0.5,
-            'stochastic_osc': 0.5
-        }
-    },
-
-    # Volatility Indicators Group
-    'volatility_group': {
-        'total_weight': 0,
-        'indicators': {
-            'keltner': 1.0  # Only one indicator in this group
-        }
-    }
+# Enough base candles to cover the Ichimoku windows on the highest timeframe (78 daily candles)
+candle_history_size = 2000
+# "streaming" keeps per-pair indicator state and only feeds new candles, "panel" recomputes every pair at once as a vectorized (pairs x candles)
+# panel, which scales better when the pair list has hundreds of symbols
+indicator_mode = "streaming"
+indicator_history_size = 100
+# Screen the pairs with the vectorized checks first, and only evaluate the higher timeframes and score the pairs that can reach a strong signal or
+# have an active one (see data.screener). Doesn't apply to the sharded engine.
+screen_pairs = True
+# "rest" polls the klines endpoint once per candle close, "websocket" subscribes to the kline streams and evaluates as soon as candles close
+ingestion_mode = "rest"
+candle_close_delay = 2
+# The number of worker processes the pair list is sharded across, each with its own candle store and indicator state. 1 evaluates every pair in
+# this process. Sharding only applies to the "rest" ingestion mode.
+num_shards = 1
+# Overlap the candle downloads with the indicator computation: each pair's indicators are updated in a worker thread as soon as its candles
+# arrive (see data.pipeline). Only applies to the "rest" ingestion mode without sharding.
+pipelined_cycles = True
+# The indicator state of the engine is snapshotted to snapshot_path every snapshot_interval cycles (None to disable) and restored on startup, so a
+# restart only feeds the indicators the candles that closed while it was down. The candles themselves are kept in the candle store, which only
+# fetches the missing ones. Doesn't apply to the sharded engine. Catching up on the candles since an older snapshot is cheap, so the snapshot is
+# only written every few cycles.
+snapshot_path = "./engine_snapshot.pkl"
+snapshot_interval = 12
+# Port of the local Prometheus /metrics endpoint (None to disable), and how many cycles pass between two printed timing summaries
+metrics_port = 9100
+metrics_summary_interval = 24
+# Run the first cycle under cProfile and dump it to ./profiles. Later cycles can be profiled by requesting /profile on the metrics port.
+metrics.profile_next_cycle = False
+
+# Signal changes are only sent once the directional consensus moves past the hysteresis thresholds, and new, strengthened or weakened signals of
+# a pair are held back for signal_cooldown seconds after its last alert. The signal states survive restarts in signal_state_path.
+signal_state_path = "./signal_state.json"
+signal_cooldown = 3600
+# Every scored pair's confirmations, scores and confidence metrics are appended to the columnar log in signal_log_dir each cycle (None to disable),
+# along with the screened values of the pairs screened out, see data.signal_log for reading them back
+signal_log_dir = "./signal_log"
+
+# The exchanges the candles are fetched from. Pairs of other exchanges than Binance are listed as "<exchange>:<symbol>", e.g. "nobitex:BTCIRT", or
+# "local:BTCUSDT" for recordings in ./recordings (see data.replay), and are fetched concurrently and evaluated in the same cycle as the Binance
+# pairs. Only Binance pairs are supported by the websocket ingestion and the sharded engine.
+exchange_clients = {
+    "binance": utils.get_default_client(),
+    "nobitex": NobitexClient(max_concurrency=5, requests_per_minute=60),
+    "local": LocalFileClient("./recordings")
 }
-
-
-def calculate_weighted_score(confirmations_dict):
-    group_scores = {}
-
-    # Calculate group scores
-    for group_name, group_config in indicator_weights.items():
-        group_total = 0
-        for ind_name, ind_weight in group_config['indicators'].items():
-            group_total += confirmations_dict[ind_name] * ind_weight
-
-        # Apply group-level weight
-        group_scores[group_name] = group_total * group_config['total_weight']
-
-    # Final score is sum of weighted group scores
-    final_score = sum(group_scores.values())
-
-    return final_score, group_scores
-
-
-def calculate_signal_confidence(confirmations_dict, sign_threshold=0.5):
-    # Count indicators agreeing on direction
-    total_indicators = len(confirmations_dict)
-    bullish_indicators = sum(1 for val in confirmations_dict.values() if val >= sign_threshold)
-    bearish_indicators = sum(1 for val in confirmations_dict.values() if val <= -sign_threshold)
-    neutral_indicators = total_indicators - bullish_indicators - bearish_indicators
-
-    # Calculate confidence metrics
-    confidence_metrics = {
-        'bullish_confidence': bullish_indicators / total_indicators,
-        'bearish_confidence': bearish_indicators / total_indicators,
-        'neutral_percentage': neutral_indicators / total_indicators,
-
-        # Directional agreement score (-1 to 1)
-        'directional_consensus': (bullish_indicators - bearish_indicators) / total_indicators
-    }
-
-    # Categorize signal strength
-    if confidence_metrics['directional_consensus'] > 0.8:
-        signal_type = 'Strong Bullish'
-    elif confidence_metrics['directional_consensus'] < -0.8:
-        signal_type = 'Strong Bearish'
-    elif abs(confidence_metrics['directional_consensus']) > 0.3:
-        signal_type = 'Moderate ' + ('Bullish' if confidence_metrics['directional_consensus'] > 0 else 'Bearish')
+# Symbols that are named differently on an exchange than in the pair list, per exchange, e.g. {"nobitex": {"BTCTMN": "BTCIRT"}}
+exchange_symbols = {}
+
+candle_store = CandleStore("./candle_store", capacity=candle_history_size, client=ExchangeRouter(exchange_clients, symbols=exchange_symbols))
+
+# The confirmation checks to evaluate, None for every registered check. Only the indicators these checks read are computed.
+enabled_confirmations = None
+# Indicator parameters overriding the defaults, e.g. {"rsi_window": 10}, see data.indicators.streaming.INDICATOR_PARAMS
+indicator_params = {}
+indicator_weights = scoring.indicator_weights
+signal_thresholds = {"exit_threshold": 0.5, "neutral_threshold": 0.3, "strengthen_delta": 0.2, "cooldown": signal_cooldown}
+
+# The settings above can be overridden in config_path. The file is checked for changes before every cycle, and the changes are applied between
+# cycles without restarting: only the indicators affected by a change are recomputed, and added pairs are backfilled in the background.
+config_path = "./strategy_config.json"
+config_watcher = ConfigWatcher(config_path, {
+    "timeframe": timeframe,
+    "higher_timeframes": higher_timeframes,
+    "recent_window_size": recent_window_size,
+    "pairs": pair_list,
+    "enabled_confirmations": enabled_confirmations,
+    "indicator_params": indicator_params,
+    "weights": indicator_weights,
+    "signal_thresholds": signal_thresholds
+}, {
+    "timeframe": validate_timeframe,
+    "pairs": validate_str_list,
+    "higher_timeframes": validate_timeframe_list,
+    "enabled_confirmations": validate_str_list,
+    "recent_window_size": validate_positive_int,
+    "weights": weights_validator(CONFIRMATION_CHECKS, checks_setting="enabled_confirmations"),
+    "signal_thresholds": number_dict_validator(signal_thresholds)
+})
+
+engine = SignalEngine(timeframe, higher_timeframes, indicator_mode, indicator_history_size, recent_window_size, enabled_confirmations,
+                      indicator_params, screen_pairs)
+signal_state = SignalStateMachine(signal_state_path, stale_after=3 * utils.timeframe_to_ms(timeframe) / 1000, **signal_thresholds)
+pipeline = StagedPipeline(candle_store, fetch_window=20, queue_size=50)
+signal_log = SignalLog(signal_log_dir) if signal_log_dir is not None else None
+notifier = TelegramNotifier(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, base_url=TELEGRAM_API_URL)
+
+
+def print_metrics_summary():
+    """
+    Print the timing summary, and the top pairs of the screen, every metrics_summary_interval cycles.
+    """
+    if metrics.counters["cycles_total"] % metrics_summary_interval != 0:
+        return
+
+    print(metrics.summary())
+    top_pairs = engine.screening_index.top(5) + engine.screening_index.top(5, bearish=True) if engine.screening_index is not None else []
+    if top_pairs:
+        print(f"Top pairs by score: {', '.join(f'{pair} {score:.2f}' for pair, score in top_pairs)}")
+
+
+async def save_snapshot():
+    """
+    Snapshot the indicator state of the engine every snapshot_interval cycles. The snapshot is written in the engine's compute thread (see
+    data.pipeline), so the event loop goes on meanwhile, and the cycle waits for it, so the engine isn't changed while it's being pickled.
+    """
+    if snapshot_path is None or metrics.counters["cycles_total"] % snapshot_interval != 0:
+        return
+
+    try:
+        with metrics.stage("snapshot"):
+            await asyncio.get_running_loop().run_in_executor(pipeline.executor, engine.save_snapshot, snapshot_path)
+    except OSError as e:
+        print(f"Writing the engine snapshot failed: {e}")
+
+
+async def process_cycle(pairs_data: dict):
+    """
+    Evaluate the confirmations of every pair and send the changes of their signals. Every stage of the cycle is timed in the shared metrics.
+    """
+    with metrics.cycle():
+        # Pairs with an active signal are always evaluated, so their weakening and expiry are noticed
+        confirmations_data, higher_confirmations_data = engine.evaluate(pairs_data, keep_pairs=list(signal_state.states))
+        process_confirmations(confirmations_data, higher_confirmations_data)
+
+    await save_snapshot()
+    print_metrics_summary()
+
+
+async def process_pipelined_cycle():
+    """
+    Fetch and evaluate every pair with the fetching and the indicator computation overlapped, then score them and send the signal changes.
+    """
+    with metrics.cycle():
+        confirmations_data, higher_confirmations_data = await pipeline.run_cycle(engine, pair_list, timeframe,
+                                                                                 keep_pairs=list(signal_state.states))
+        process_confirmations(confirmations_data, higher_confirmations_data)
+
+    await save_snapshot()
+    print_metrics_summary()
+
+
+async def process_sharded_cycle(sharded_engine: ShardedEngine):
+    """
+    Fetch and evaluate every shard in the worker processes, then score and send the signals of all pairs together.
+    """
+    with metrics.cycle():
+        confirmations_data, higher_confirmations_data = await sharded_engine.run_cycle()
+        process_confirmations(confirmations_data, higher_confirmations_data)
+
+    print_metrics_summary()
+
+
+def report_signal_log_error(append: Future):
+    if append.exception() is not None:
+        print(f"Writing the signal log failed: {append.exception()}")
+
+
+def process_confirmations(confirmations_data: dict, higher_confirmations_data: dict):
+    """
+    Score the evaluated confirmations of every pair and queue the signal changes.
+    """
+    with metrics.stage("scoring"):
+        # Pairs screened out by the engine have no confirmations
+        scored_pairs = scoring.score_pairs(confirmations_data, higher_confirmations_data, [pair for pair in pair_list if pair in confirmations_data],
+                                           indicator_weights)
+
+    # Time from the close of the last candle until its signals are ready
+    timeframe_ms = utils.timeframe_to_ms(timeframe)
+    metrics.set_gauge("cycle_to_signal_latency_seconds", (utils.now_ms() % timeframe_ms) / 1000)
+
+    if signal_log is not None:
+        with metrics.stage("signal_log"):
+            # The pairs screened out are logged with the values of the screen, so the log still covers the whole universe
+            screened_rows = {}
+            if engine.screening_index is not None:
+                screened_rows = engine.screening_index.rows(pair for pair in engine.screening_index.pairs if pair not in scored_pairs)
+            # Written in the background thread of the log, so the notifications don't wait on the disk
+            signal_log.submit(scored_pairs, screened_rows=screened_rows).add_done_callback(report_signal_log_error)
+
+    with metrics.stage("notify"):
+        send_signals(scored_pairs)
+
+
+def format_transition(transition: dict) -> str:
+    """
+    Format a signal transition as a compact message. Only new, flipped and strengthened signals list their confirmation values.
+    """
+    lines = [f"Pair: {transition['pair']}", f"Change: {transition['transition']}"]
+    if transition["previous_signal_type"] is not None and transition["previous_signal_type"] != transition["signal_type"]:
+        lines.append(f"Signal: {transition['previous_signal_type']} -> {transition['signal_type']}")
     else:
-        signal_type = 'Neutral'
-
-    confidence_metrics['signal_type'] = signal_type
-
-    return confidence_metrics
+        lines.append(f"Signal: {transition['signal_type']}")
+
+    if transition["score"] is not None:
+        lines.append(f"Average: {transition['score']:.3f}, consensus: {transition['consensus']:.2f}")
+    if transition["transition"] in ("new", "flipped", "strengthened"):
+        lines.append("Confirmations: " + ", ".join(f"{name}={value}" for name, value in transition["confirmations"].items()))
+
+    return "\n".join(lines)
+
+
+def send_signals(scored_pairs: dict):
+    """
+    Advance the signal state of every pair and queue a message for each transition (new, strengthened, weakened, flipped or expired signals).
+    """
+    transitions = signal_state.update(scored_pairs)
+    metrics.increment("signal_transitions_total", len(transitions))
+
+    messages = {}
+    for transition in transitions:
+        message = format_transition(transition)
+        print(message)
+        messages[f"{transition['pair']}:{transition['transition']}:{transition['time']}"] = message
+
+    if messages:
+        notifier.notify_many(messages, header="---------SIGNAL CHANGES---------\n")
+
+
+def static_settings() -> set:
+    """
+    The settings that can't be changed without a restart in the current mode: the worker processes of the sharded engine keep the settings
+    they were started with, and the websocket streams are subscribed to a fixed pair list and timeframe.
+    """
+    if ingestion_mode == "rest" and num_shards > 1:
+        return set(config_watcher.defaults) - {"weights", "signal_thresholds"}
+    if ingestion_mode == "websocket":
+        return {"timeframe", "pairs"}
+
+    return set()
+
+
+backfilling_pairs = set()
+backfill_tasks = set()
+
+
+async def backfill_pairs(pairs: list):
+    """
+    Download the history of newly configured pairs, then add them to the evaluated pairs. Runs in the background, so the cycles of the other
+    pairs go on meanwhile. If the backfill fails, the pairs are added anyway and the regular cycle fetches their history.
+    """
+    global pair_list
+    try:
+        await candle_store.update(pairs, timeframe)
+    except Exception as e:
+        print(f"Backfilling {len(pairs)} new pairs failed: {e}")
+    finally:
+        backfilling_pairs.difference_update(pairs)
+
+    # Pairs removed from the config while they were being backfilled aren't added
+    pair_list = [pair for pair in config_watcher.config["pairs"] if pair in pair_list or pair in pairs]
+    print(f"Added {len(pairs)} new pairs")
+
+
+def update_pairs(pairs: list):
+    global pair_list
+    removed_pairs = set(pair_list) - set(pairs)
+    engine.drop_pairs(removed_pairs)
+    pair_list = [pair for pair in pairs if pair in pair_list]
+
+    new_pairs = [pair for pair in pairs if pair not in pair_list and pair not in backfilling_pairs]
+    if new_pairs:
+        backfilling_pairs.update(new_pairs)
+        task = asyncio.get_running_loop().create_task(backfill_pairs(new_pairs))
+        backfill_tasks.add(task)
+        task.add_done_callback(backfill_tasks.discard)
+
+
+def apply_config_changes(startup: bool = False):
+    """
+    Apply the changes of the config file since the last cycle. This runs between cycles, so every cycle sees one consistent set of settings.
+
+    Args:
+        startup (bool): Whether the engine hasn't run yet. Every setting is applied then, and the pairs are fetched by the first cycle instead of
+            being backfilled in the background.
+    """
+    global timeframe, higher_timeframes, recent_window_size, enabled_confirmations, indicator_params, indicator_weights, pair_list, engine
+    changes = config_watcher.poll()
+    if not changes:
+        return
+
+    print(f"Applying config changes: {', '.join(sorted(changes))}")
+    config = config_watcher.config
+    skipped_settings = set() if startup else set(changes) & static_settings()
+    if skipped_settings:
+        print(f"Restart to apply {', '.join(sorted(skipped_settings))}")
+    changes = {key: value for key, value in changes.items() if key not in skipped_settings}
+
+    if "weights" in changes:
+        indicator_weights = config["weights"]
+        if engine.screening_index is not None:
+            engine.screening_index.weights = indicator_weights
+    if "signal_thresholds" in changes:
+        for name in signal_thresholds:
+            setattr(signal_state, name, config["signal_thresholds"].get(name, signal_thresholds[name]))
+
+    engine_settings = {"timeframe", "higher_timeframes", "recent_window_size", "enabled_confirmations", "indicator_params"}
+    if changes.keys() & engine_settings:
+        engine_config = [config["higher_timeframes"], config["recent_window_size"], config["enabled_confirmations"], config["indicator_params"]]
+        try:
+            if "timeframe" in changes:
+                # Nothing of the indicator state carries over to another base timeframe. The new engine is only swapped in once every setting
+                # was applied to it, so invalid settings leave the running engine as it was.
+                new_engine = SignalEngine(config["timeframe"], indicator_mode=indicator_mode, indicator_history_size=indicator_history_size,
+                                          screen_pairs=screen_pairs)
+                if new_engine.screening_index is not None:
+                    new_engine.screening_index.weights = indicator_weights
+                new_engine.configure(*engine_config)
+                stale_after = 3 * utils.timeframe_to_ms(config["timeframe"]) / 1000
+
+                engine, timeframe = new_engine, config["timeframe"]
+                signal_state.stale_after = stale_after
+            else:
+                # configure() validates every setting before it changes anything
+                recomputed_indicators = engine.configure(*engine_config)
+                if recomputed_indicators:
+                    print(f"Recomputing {', '.join(sorted(recomputed_indicators))} on the next cycle")
+            higher_timeframes, recent_window_size, enabled_confirmations, indicator_params = engine_config
+        except (TypeError, ValueError, KeyError) as e:
+            print(f"Ignoring the invalid engine settings: {e}")
+
+    if "pairs" in changes:
+        if startup:
+            pair_list = config["pairs"]
+        else:
+            update_pairs(config["pairs"])
+
+
+async def on_candle_close(closed_pairs: list):
+    apply_config_changes()
+    pairs_data = {pair: candle_store.get(pair, timeframe) for pair in pair_list}
+    await process_cycle({pair: pair_df for pair, pair_df in pairs_data.items() if pair_df is not None})
 
 
 async def fetch_signals():
-    global previous_signals
-    while True:
-        pairs_data = await utils.get_multiple_pairs_data(pair_list, timeframe, 1000)
-        current_signals = {}
-        for pair in pair_list:
-            try:
-                pair_df = pairs_data[pair]
-                ichimoku_df = ichimoku.update_ichimoku_df(pair_df)
-                rsi_df = rsi(pair_df)
-                macd_df = macd(pair_df)
-                keltner_df = keltner(pair_df)
-                stoch_df = stochastic_osc(pair_df)
-
-                indicators_df = pd.concat([ichimoku_df, rsi_df, macd_df, keltner_df, stoch_df], axis="columns")
-                confirmations.update_indicators(indicators_df, pair_df)
-                confirmations_dict = confirmations.aggregate_sentiments()
-
-                score = calculate_weighted_score(confirmations_dict)
-                confidence = calculate_signal_confidence(confirmations_dict)
-                confirmations_dict["average"] = score
-                confirmations_dict["confidence"] = confidence
-
-                if confidence["signal_type"] == "Strong Bullish" or confidence["signal_type"] == "Strong Bearish":
-                    current_signals[pair] = confirmations_dict
-            except Exception as e:
-                print(e)
-                continue
-
-        if current_signals.keys() != previous_signals.keys():
-            send_telegram_message(
-                "---------RECENT SIGNALS---------\n"
-            )
-            previous_signals = current_signals.copy()
-            for pair, signal in current_signals.items():
-                message = f"Pair: {pair}\nAverage: {signal['average'][0]}\nConfidence: {signal['confidence']["signal_type"]}\n\nDetails: {json.dumps(signal, indent=4)}"
-                print(message)
-                send_telegram_message(message)
+    apply_config_changes(startup=True)
+    if snapshot_path is not None and not (ingestion_mode == "rest" and num_shards > 1):
+        restored_streams = engine.load_snapshot(snapshot_path, pair_list)
+        if restored_streams:
+            print(f"Restored {restored_streams} indicator streams from {snapshot_path}")
+    notifier.start()
+    if metrics_port is not None:
+        await metrics.start_server(port=metrics_port)
+
+    if ingestion_mode == "websocket":
+        await KlineStream(candle_store, pair_list, timeframe, on_candle_close).run()
+        return
+
+    sharded_engine = None
+    if num_shards > 1:
+        sharded_engine = ShardedEngine(pair_list, timeframe, num_shards, candle_store.root_dir, candle_history_size,
+                                       higher_timeframes=higher_timeframes, indicator_mode=indicator_mode,
+                                       indicator_history_size=indicator_history_size, recent_window_size=recent_window_size,
+                                       enabled_confirmations=enabled_confirmations, indicator_params=indicator_params)
+        sharded_engine.start()
+
+    try:
+        while True:
+            apply_config_changes()
+            if sharded_engine is not None:
+                await process_sharded_cycle(sharded_engine)
+            elif pipelined_cycles:
+                await process_pipelined_cycle()
+            else:
+                pairs_data = await candle_store.update(pair_list, timeframe)
+                await process_cycle(pairs_data)
+            await candle_store.persist()
+
+            # Poll again right after the current candle closes, giving the exchange a moment to finalize it
+            await asyncio.sleep(utils.seconds_until_candle_close(timeframe) + candle_close_delay)
+    finally:
+        if sharded_engine is not None:
+            sharded_engine.close()
+        pipeline.close()
+        await candle_store.persist(force=True)
+        if signal_log is not None:
+            signal_log.close()
 
 
 def run_asyncio_loop():
@@ -165,7 +417,8 @@ def run_asyncio_loop():
     loop.run_until_complete(fetch_signals())
 
 
-# Run the asyncio loop in a separate thread
+# Run the asyncio loop in a separate thread. Guarded, since the worker processes of the sharded engine import this module again.
 import threading
 
-threading.Thread(target=run_asyncio_loop).start()
+if __name__ == "__main__":
+    threading.Thread(target=run_asyncio_loop).start()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are imported as in main.py (e.g. "from data import utils"), relative to the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
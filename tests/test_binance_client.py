@@ -0,0 +1,40 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from data.binance_client import KLINES_WEIGHT, BinanceClient
+
+
+def test_used_weight_follows_the_reported_weight():
+    # The second report is lower, like the response of an earlier request arriving late
+    reported_weights = iter([40, 7, 60])
+    client = BinanceClient(max_concurrency=1)
+    pending_weights = []
+    used_weights = []
+
+    async def klines(request: web.Request) -> web.Response:
+        pending_weights.append(client.pending_weight)
+        used_weights.append(client.used_weight)
+        return web.json_response([], headers={"X-MBX-USED-WEIGHT-1M": str(next(reported_weights))})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/api/v3/klines", klines)
+        server = TestServer(app)
+        await server.start_server()
+        client.base_url = str(server.make_url("")).rstrip("/")
+        try:
+            for _ in range(3):
+                await client.get_klines("BTCUSDT", "1h", 0, 3600_000, 1000, 3600_000)
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=15))
+
+    # The weight of a request is reserved while it's in flight, and replaced by the reported weight once it's answered
+    assert pending_weights == [KLINES_WEIGHT] * 3
+    assert used_weights[1:] == [40, 40]
+    assert client.pending_weight == 0
+    assert client.used_weight == 60
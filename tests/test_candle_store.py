@@ -0,0 +1,41 @@
+import asyncio
+
+import numpy as np
+
+from data import utils
+from data.candle_store import CandleStore
+from data.replay import ReplayClient, generate_klines
+
+TIMEFRAME_MS = utils.timeframe_to_ms("1h")
+START_TIME = 1_700_000_000_000 // TIMEFRAME_MS * TIMEFRAME_MS
+
+
+def test_updates_are_persisted_periodically(tmp_path):
+    recording = {"BTCUSDT": generate_klines(START_TIME, 50, TIMEFRAME_MS)}
+    candle_store = CandleStore(str(tmp_path), capacity=40, client=ReplayClient(recording), persist_interval=3600)
+
+    async def scenario():
+        await candle_store.update(["BTCUSDT"], "1h")
+        # Within the interval of the store's creation nothing is written
+        await candle_store.persist()
+        assert CandleStore(str(tmp_path)).load("BTCUSDT", "1h") is None
+
+        await candle_store.persist(force=True)
+        assert not candle_store.dirty
+
+        candle_store.append("BTCUSDT", "1h", START_TIME + 50 * TIMEFRAME_MS, 1, 2, 0.5, 1.5, 10)
+        persist = asyncio.ensure_future(candle_store.persist(force=True))
+        await asyncio.sleep(0)
+        # The candles were copied before the write, so the buffer can change meanwhile
+        candle_store.append("BTCUSDT", "1h", START_TIME + 51 * TIMEFRAME_MS, 1, 2, 0.5, 1.5, 10)
+        await persist
+
+    utils.set_clock(lambda: (START_TIME + 49 * TIMEFRAME_MS + 1) / 1000)
+    try:
+        asyncio.run(scenario())
+    finally:
+        utils.set_clock()
+
+    stored = CandleStore(str(tmp_path), capacity=40).load("BTCUSDT", "1h")
+    np.testing.assert_array_equal(stored["time"], START_TIME + np.arange(11, 51) * TIMEFRAME_MS)
+    assert candle_store.dirty == {("BTCUSDT", "1h")}
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from data import scoring
+from data.config import ConfigWatcher, number_dict_validator, validate_positive_int, validate_str_list, validate_timeframe, validate_timeframe_list, \
+    weights_validator
+from data.confirmations import CONFIRMATION_CHECKS
+
+SIGNAL_THRESHOLDS = {"exit_threshold": 0.5, "neutral_threshold": 0.3, "strengthen_delta": 0.2, "cooldown": 3600}
+
+
+def make_watcher(path) -> ConfigWatcher:
+    return ConfigWatcher(str(path), {
+        "timeframe": "1h",
+        "pairs": ["BTCUSDT"],
+        "higher_timeframes": [],
+        "recent_window_size": 5,
+        "enabled_confirmations": None,
+        "weights": scoring.indicator_weights,
+        "signal_thresholds": SIGNAL_THRESHOLDS
+    }, {
+        "timeframe": validate_timeframe,
+        "pairs": validate_str_list,
+        "higher_timeframes": validate_timeframe_list,
+        "enabled_confirmations": validate_str_list,
+        "recent_window_size": validate_positive_int,
+        "weights": weights_validator(CONFIRMATION_CHECKS, checks_setting="enabled_confirmations"),
+        "signal_thresholds": number_dict_validator(SIGNAL_THRESHOLDS)
+    })
+
+
+def write_config(path, config: dict, mtime_ns: int):
+    with open(path, "w") as config_file:
+        json.dump(config, config_file)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_valid_changes_are_applied(tmp_path):
+    path = tmp_path / "config.json"
+    watcher = make_watcher(path)
+
+    write_config(path, {"timeframe": "4h", "higher_timeframes": ["1d"], "pairs": ["BTCUSDT", "ETHUSDT"], "signal_thresholds": {"cooldown": 60}}, 1)
+    changes = watcher.poll()
+
+    assert changes == {"timeframe": "4h", "higher_timeframes": ["1d"], "pairs": ["BTCUSDT", "ETHUSDT"], "signal_thresholds": {"cooldown": 60}}
+    assert watcher.poll() == {}
+
+
+@pytest.mark.parametrize("config", [
+    {"signal_thresholds": {"cooldown": "1h"}},
+    {"signal_thresholds": {"foo": 1}},
+    {"weights": {"trend": "x"}},
+    {"weights": {"trend": {"total_weight": 1, "indicators": {"unknown_check": 1}}}},
+    {"enabled_confirmations": ["rsi"]},
+    {"pairs": ["BTCUSDT", 1]},
+    {"pairs": "BTCUSDT"},
+    {"recent_window_size": 0},
+    {"recent_window_size": 2.5},
+    {"unknown_setting": 1},
+    {"timeframe": "2x"},
+    {"timeframe": ""},
+    {"higher_timeframes": ["4h", "1y2"]}
+])
+def test_invalid_config_is_ignored_as_a_whole(tmp_path, config):
+    path = tmp_path / "config.json"
+    watcher = make_watcher(path)
+
+    write_config(path, {"pairs": ["ETHUSDT"], **config}, 1)
+
+    assert watcher.poll() == {}
+    assert watcher.config["pairs"] == ["BTCUSDT"]
+
+
+def test_weights_of_enabled_checks_are_accepted(tmp_path):
+    path = tmp_path / "config.json"
+    watcher = make_watcher(path)
+    weights = {"momentum_group": {"total_weight": 1, "indicators": {"rsi": 1.0}}}
+
+    write_config(path, {"enabled_confirmations": ["rsi"], "weights": weights}, 1)
+
+    assert watcher.poll() == {"enabled_confirmations": ["rsi"], "weights": weights}
@@ -0,0 +1,23 @@
+import pytest
+
+from data import utils
+from data.engine import SignalEngine
+from data.replay import generate_klines
+
+TIMEFRAME_MS = utils.timeframe_to_ms("1h")
+START_TIME = 1_700_000_000_000 // TIMEFRAME_MS * TIMEFRAME_MS
+
+
+@pytest.mark.parametrize("indicator_mode", ["streaming", "panel"])
+def test_kept_pair_with_short_history_is_evaluated(indicator_mode):
+    pairs_data = {pair: utils.parse_klines(generate_klines(START_TIME, 200, TIMEFRAME_MS, seed)) for seed, pair in enumerate(["BTCUSDT", "ETHUSDT"])}
+    # A pair listed recently, with less history than the vectorized checks look back over
+    pairs_data["NEWUSDT"] = utils.parse_klines(generate_klines(START_TIME + 190 * TIMEFRAME_MS, 10, TIMEFRAME_MS, 2))
+    engine = SignalEngine("1h", indicator_mode=indicator_mode, screen_pairs=True)
+
+    confirmations_data, higher_confirmations_data = engine.evaluate(pairs_data, keep_pairs=["NEWUSDT"])
+
+    # The pair has an active signal, so it's evaluated even though the screen couldn't rank it
+    assert "NEWUSDT" in confirmations_data
+    assert confirmations_data["NEWUSDT"].keys() == {check.name for check in engine.confirmations.checks}
+    assert engine.evaluate(pairs_data)[0].keys() <= {"BTCUSDT", "ETHUSDT"}
@@ -0,0 +1,131 @@
+import asyncio
+
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from data import utils
+from data.candle_store import CandleStore
+from data.kline_stream import KlineStream
+from data.replay import ReplayClient, generate_klines
+
+PAIRS = ["BTCUSDT", "ETHUSDT"]
+TIMEFRAME = "1m"
+TIMEFRAME_MS = utils.timeframe_to_ms(TIMEFRAME)
+START_TIME = 1_700_000_000_000 // TIMEFRAME_MS * TIMEFRAME_MS
+
+# The candle that closes while the first connection is up, and the one that closes after the reconnection. The candles in between are missed.
+FIRST_CLOSE = 20
+SECOND_CLOSE = 24
+
+
+def kline_message(pair: str, row: list, closed: bool) -> dict:
+    """
+    Build a combined stream kline event from a recorded kline row.
+    """
+    return {
+        "stream": f"{pair.lower()}@kline_{TIMEFRAME}",
+        "data": {
+            "e": "kline",
+            "s": pair,
+            "k": {"t": row[0], "T": row[6], "s": pair, "i": TIMEFRAME, "o": row[1], "h": row[2], "l": row[3], "c": row[4], "v": row[5],
+                  "x": closed}
+        }
+    }
+
+
+class StubKlineServer:
+    """
+    Local stand-in for the combined stream endpoint, serving recorded klines. The first connection sends the close of FIRST_CLOSE and is then
+    dropped by the server, and the candles until SECOND_CLOSE pass before the client reconnects. The second connection sends the close of
+    SECOND_CLOSE.
+    """
+
+    def __init__(self, recording: dict, first_close_handled: asyncio.Event):
+        self.recording = recording
+        self.first_close_handled = first_close_handled
+        self.requested_streams = []
+
+        app = web.Application()
+        app.router.add_get("/stream", self.stream)
+        self.server = TestServer(app)
+
+    async def stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.requested_streams.append(request.query["streams"])
+
+        if len(self.requested_streams) == 1:
+            for pair in PAIRS:
+                # An update of the still-open candle, which isn't stored
+                await ws.send_json(kline_message(pair, self.recording[pair][FIRST_CLOSE + 1], closed=False))
+                await ws.send_json(kline_message(pair, self.recording[pair][FIRST_CLOSE], closed=True))
+
+            await self.first_close_handled.wait()
+            utils.set_clock(lambda: (START_TIME + SECOND_CLOSE * TIMEFRAME_MS + TIMEFRAME_MS // 2) / 1000)
+            await ws.close()
+        else:
+            for pair in PAIRS:
+                await ws.send_json(kline_message(pair, self.recording[pair][SECOND_CLOSE], closed=True))
+            # Keep the connection open until the client is cancelled
+            async for _ in ws:
+                pass
+
+        return ws
+
+
+def test_closed_klines_are_stored_and_gaps_backfilled(tmp_path):
+    recording = {pair: generate_klines(START_TIME, SECOND_CLOSE + 2, TIMEFRAME_MS, seed) for seed, pair in enumerate(PAIRS)}
+
+    async def scenario():
+        first_close_handled = asyncio.Event()
+        callbacks = []
+
+        async def on_candle_close(pairs):
+            callbacks.append((list(pairs), {pair: candle_store.last_open_time(pair, TIMEFRAME) for pair in pairs}))
+            if len(callbacks) == 1:
+                first_close_handled.set()
+
+        stub = StubKlineServer(recording, first_close_handled)
+        await stub.server.start_server()
+        candle_store = CandleStore(str(tmp_path), capacity=100, client=ReplayClient(recording), persist_interval=0)
+        stream = KlineStream(candle_store, PAIRS, TIMEFRAME, on_candle_close, stream_url=str(stub.server.make_url("")).rstrip("/"),
+                             settle_delay=0.05)
+
+        task = asyncio.create_task(stream.run())
+        try:
+            while len(callbacks) < 2:
+                await asyncio.sleep(0.05)
+            # The closed candles are persisted after the callback
+            await asyncio.gather(*stream.flush_tasks)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await stub.server.close()
+
+        return stub, candle_store, callbacks
+
+    utils.set_clock(lambda: (START_TIME + FIRST_CLOSE * TIMEFRAME_MS + TIMEFRAME_MS // 2) / 1000)
+    try:
+        stub, candle_store, callbacks = asyncio.run(asyncio.wait_for(scenario(), timeout=15))
+    finally:
+        utils.set_clock()
+
+    # Both pairs are subscribed to over one combined connection, and it was re-established after the server dropped it
+    assert stub.requested_streams == ["btcusdt@kline_1m/ethusdt@kline_1m"] * 2
+
+    # One callback per candle close with every pair that closed, after the closed candle was stored
+    first_close_time = START_TIME + FIRST_CLOSE * TIMEFRAME_MS
+    second_close_time = START_TIME + SECOND_CLOSE * TIMEFRAME_MS
+    assert callbacks == [(PAIRS, dict.fromkeys(PAIRS, first_close_time)), (PAIRS, dict.fromkeys(PAIRS, second_close_time))]
+
+    for pair in PAIRS:
+        # The candles missed while disconnected were backfilled on the reconnection, so the stored candles have no gaps
+        candles = candle_store.get(pair, TIMEFRAME)
+        expected = recording[pair][:SECOND_CLOSE + 1]
+        np.testing.assert_array_equal(candles["time"], [row[0] for row in expected])
+        np.testing.assert_allclose(candles["close"], [float(row[4]) for row in expected])
+
+        # The closed candles were persisted
+        stored = CandleStore(str(tmp_path), capacity=100).load(pair, TIMEFRAME)
+        np.testing.assert_array_equal(stored["time"], candles["time"])
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from data.notifier import TELEGRAM_MESSAGE_LIMIT, TelegramNotifier
+
+BOT_TOKEN = "123:test"
+
+
+class StubBotAPI:
+    """
+    Local stand-in for the Bot API's sendMessage method. Records every request, and answers with the queued responses, then with success.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+
+        app = web.Application()
+        app.router.add_post(f"/bot{BOT_TOKEN}/sendMessage", self.send_message)
+        self.server = TestServer(app)
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        self.requests.append((time.monotonic(), await request.json()))
+        if self.responses:
+            status, body = self.responses.pop(0)
+            return web.json_response(body, status=status)
+
+        return web.json_response({"ok": True, "result": {}})
+
+    @property
+    def texts(self):
+        return [payload["text"] for _, payload in self.requests]
+
+    async def __aenter__(self) -> "StubBotAPI":
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.server.close()
+
+    def notifier(self, **kwargs) -> TelegramNotifier:
+        kwargs = {"batch_delay": 0.05, "min_interval": 0, "backoff_base": 0.01, **kwargs}
+        return TelegramNotifier(BOT_TOKEN, "42", base_url=str(self.server.make_url("")).rstrip("/"), **kwargs)
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+def test_messages_are_batched_up_to_the_limit():
+    async def scenario():
+        async with StubBotAPI() as api:
+            notifier = api.notifier()
+            notifier.start()
+            messages = {f"pair{i}": f"{i}" * 1500 for i in range(5)}
+            assert notifier.notify_many(messages, header="Signals") == 6
+            # Longer than a single message on its own, split at the line breaks
+            notifier.notify("\n".join(["x" * 1000] * 6))
+            await notifier.close()
+            return api
+
+    api = run(scenario())
+    assert all(len(text) <= TELEGRAM_MESSAGE_LIMIT for text in api.texts)
+    assert all(payload["chat_id"] == "42" for _, payload in api.requests)
+    # The header and two messages fit in the first text, two more in the second, the last one in the third, and the long message is split in two
+    assert len(api.texts) == 5
+    assert api.texts[0] == "Signals\n\n" + "0" * 1500 + "\n\n" + "1" * 1500
+    assert "".join(api.texts).replace("\n", "").count("x") == 6000
+    for i in range(5):
+        assert sum(text.count(f"{i}" * 1500) for text in api.texts) == 1
+
+
+def test_rate_limited_message_is_retried_after_the_requested_wait():
+    async def scenario():
+        async with StubBotAPI() as api:
+            api.responses = [(429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 0.3}})]
+            notifier = api.notifier()
+            notifier.start()
+            notifier.notify("signal", dedup_key="BTCUSDT")
+            await notifier.close()
+            return api, notifier
+
+    api, notifier = run(scenario())
+    assert api.texts == ["signal", "signal"]
+    assert api.requests[1][0] - api.requests[0][0] >= 0.3
+    assert notifier.is_duplicate("BTCUSDT")
+
+
+def test_server_errors_back_off_and_give_up():
+    async def scenario():
+        async with StubBotAPI() as api:
+            api.responses = [(500, {"ok": False})] * 3
+            notifier = api.notifier(max_retries=2)
+            notifier.start()
+            notifier.notify("signal", dedup_key="BTCUSDT")
+            await notifier.close()
+            return api, notifier
+
+    api, notifier = run(scenario())
+    assert len(api.requests) == 3
+    # Backoff of 0.01s, then 0.02s
+    assert api.requests[2][0] - api.requests[0][0] >= 0.03
+    # The failed signal can be sent again by the next cycle
+    assert not notifier.is_duplicate("BTCUSDT")
+
+
+def test_duplicates_are_dropped_within_the_ttl():
+    async def scenario():
+        async with StubBotAPI() as api:
+            notifier = api.notifier(dedup_ttl=0.5)
+            notifier.start()
+            assert notifier.notify_many({"BTCUSDT": "BTC bullish"}, header="Signals") == 2
+            # Neither the duplicate nor the header of a cycle without new signals is sent
+            assert notifier.notify_many({"BTCUSDT": "BTC bullish"}, header="Signals") == 0
+            assert notifier.notify_many({"BTCUSDT": "BTC bullish", "ETHUSDT": "ETH bearish"}, header="Signals") == 2
+            await notifier.queue.join()
+
+            await asyncio.sleep(0.6)
+            assert notifier.notify("BTC bullish", dedup_key="BTCUSDT")
+            await notifier.close()
+            return api
+
+    api = run(scenario())
+    # The messages queued together are batched into one text
+    assert api.texts == ["Signals\n\nBTC bullish\n\nSignals\n\nETH bearish", "BTC bullish"]
@@ -0,0 +1,35 @@
+import pytest
+
+from data import utils
+from data.candles import CandleBuffer
+from data.indicators.panel import CandlePanel
+from data.optimize import grid_search
+from data.replay import generate_klines
+
+TIMEFRAME_MS = utils.timeframe_to_ms("1h")
+
+
+@pytest.fixture(scope="module")
+def panel() -> CandlePanel:
+    return CandlePanel.from_frames({
+        pair: CandleBuffer.from_frame(utils.parse_klines(generate_klines(1_700_000_000_000 // TIMEFRAME_MS * TIMEFRAME_MS, 300, TIMEFRAME_MS, seed)))
+        for seed, pair in enumerate(["BTCUSDT", "ETHUSDT"])
+    })
+
+
+def test_weight_sweep_is_ranked_by_the_score_ic(panel):
+    results = grid_search(panel, weight_grid={"momentum_group": [0, 1]}, holding_period=6, max_workers=1)
+
+    assert len(results) == 2
+    # The trades follow the confidence, so only the information coefficient tells the weight sets apart
+    assert results["trades"].nunique() == 1
+    assert results["score_ic"].iloc[0] >= results["score_ic"].iloc[1]
+
+
+def test_weight_sweep_rejects_a_trade_objective(panel):
+    with pytest.raises(ValueError):
+        grid_search(panel, weight_grid={"momentum_group": [0, 1]}, objective="mean_return", max_workers=1)
+
+    # Without different weights the trade statistics rank the indicator parameters
+    results = grid_search(panel, {"rsi_window": [7, 14]}, objective="mean_return", holding_period=6, max_workers=1)
+    assert len(results) == 2
@@ -0,0 +1,84 @@
+import asyncio
+import math
+
+import pytest
+
+from data import utils
+from data.engine import SignalEngine
+from data.replay import ReplayClient, Replayer, generate_klines, write_synthetic_recording
+
+PAIRS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
+HISTORY = 200
+CYCLES = 8
+
+
+@pytest.fixture(scope="module")
+def recording_dir(tmp_path_factory):
+    recording_dir = tmp_path_factory.mktemp("recording")
+    write_synthetic_recording(str(recording_dir), PAIRS, "1h", HISTORY + CYCLES + 4)
+    return str(recording_dir)
+
+
+def normalize(value):
+    """
+    Make scored pairs comparable with ==: numbers become floats (the indicator modes return some confirmations as ints) and NaN becomes a string.
+    """
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, str):
+        return value
+
+    value = float(value)
+    return "nan" if math.isnan(value) else value
+
+
+def test_open_candle_has_no_lookahead():
+    timeframe_ms = utils.timeframe_to_ms("1h")
+    klines = generate_klines(0, 10, timeframe_ms)
+    client = ReplayClient({"BTCUSDT": klines})
+
+    # Two seconds after the close of candle 4, candle 5 has just opened
+    served = asyncio.run(client.get_klines("BTCUSDT", "1h", 0, 5 * timeframe_ms + 2000, 100, timeframe_ms))
+    assert served[:5] == klines[:5]
+    assert served[5][:7] == [klines[5][0], klines[5][1], klines[5][1], klines[5][1], klines[5][1], "0", klines[5][6]]
+
+    # Once closed, the candle has its recorded values
+    served = asyncio.run(client.get_klines("BTCUSDT", "1h", 0, 6 * timeframe_ms + 2000, 100, timeframe_ms))
+    assert served[5] == klines[5]
+
+
+def replay(recording_dir: str, store_dir: str, indicator_mode: str = "streaming", pipelined: bool = False) -> list:
+    """
+    Replay the recording and return the normalized scored pairs of every cycle.
+    """
+    engine = SignalEngine("1h", higher_timeframes=["4h"], indicator_mode=indicator_mode)
+    replayer = Replayer(recording_dir, "1h", engine=engine, candle_history_size=HISTORY, candle_store_dir=store_dir, pipelined=pipelined)
+    cycles = []
+
+    def on_cycle(cycle_time, scored_pairs):
+        cycles.append((cycle_time, normalize(scored_pairs)))
+
+    try:
+        assert asyncio.run(replayer.run(on_cycle, max_cycles=CYCLES)) == CYCLES
+    finally:
+        if replayer.pipeline is not None:
+            replayer.pipeline.close()
+
+    return cycles
+
+
+def test_replay_is_deterministic(recording_dir, tmp_path):
+    cycles = replay(recording_dir, str(tmp_path / "first"))
+
+    assert len(cycles) == CYCLES
+    assert all(pair in scored_pairs for _, scored_pairs in cycles for pair in PAIRS)
+    assert replay(recording_dir, str(tmp_path / "second")) == cycles
+
+
+@pytest.mark.parametrize("indicator_mode, pipelined", [("streaming", True), ("panel", False)])
+def test_replay_modes_score_the_same(recording_dir, tmp_path, indicator_mode, pipelined):
+    expected = replay(recording_dir, str(tmp_path / "serial"))
+
+    assert replay(recording_dir, str(tmp_path / "other"), indicator_mode, pipelined) == expected
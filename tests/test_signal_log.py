@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+from data import utils
+from data.engine import SignalEngine
+from data.replay import generate_klines
+from data.scoring import SIGNAL_TYPE_CODES, score_pairs
+from data.signal_log import SignalLog, day_of
+
+HOUR_MS = 3600_000
+START_TIME = 1_700_000_000_000 // (24 * HOUR_MS) * 24 * HOUR_MS
+
+
+def scored(rsi: float, score: float) -> dict:
+    return {
+        "rsi": rsi,
+        "average": (score, {"momentum_group": score}),
+        "confidence": {"bullish_confidence": 0.5, "bearish_confidence": 0.0, "neutral_percentage": 0.5, "directional_consensus": 0.5,
+                       "timeframe_agreement": 1.0, "signal_type": "Moderate Bullish"}
+    }
+
+
+def test_submitted_rows_are_appended_in_order(tmp_path, monkeypatch):
+    log = SignalLog(str(tmp_path))
+    schema_loads = []
+    load_schema = SignalLog._load_schema
+
+    def counting_load_schema(partition_dir):
+        schema_loads.append(partition_dir)
+        return load_schema(partition_dir)
+
+    monkeypatch.setattr(SignalLog, "_load_schema", staticmethod(counting_load_schema))
+
+    for i in range(5):
+        log.submit({"BTCUSDT": scored(i / 10, i / 5), "nobitex:BTCIRT": scored(-i / 10, -i / 5)}, START_TIME + i * HOUR_MS)
+    # A check enabled later gets a column of NaN for the earlier rows
+    log.submit({"BTCUSDT": dict(scored(0.5, 1.0), keltner=0.5)}, START_TIME + 5 * HOUR_MS)
+    log.close()
+
+    # The schema of every partition was only read by the first append
+    assert len(schema_loads) == 2
+
+    btc = log.read("BTCUSDT")
+    np.testing.assert_array_equal(btc.index, START_TIME + np.arange(6) * HOUR_MS)
+    np.testing.assert_allclose(btc["rsi"], [0, 0.1, 0.2, 0.3, 0.4, 0.5])
+    np.testing.assert_allclose(btc["score_momentum_group"], [0, 0.2, 0.4, 0.6, 0.8, 1.0])
+    np.testing.assert_array_equal(btc["keltner"], [np.nan] * 5 + [0.5])
+    assert (btc["signal_type"] == SIGNAL_TYPE_CODES["Moderate Bullish"]).all()
+    np.testing.assert_allclose(log.read("nobitex:BTCIRT")["score"], [0, -0.2, -0.4, -0.6, -0.8])
+
+
+def test_partial_row_is_dropped_after_a_restart(tmp_path):
+    log = SignalLog(str(tmp_path))
+    log.append({"BTCUSDT": scored(0.1, 0.2)}, START_TIME)
+    log.append({"BTCUSDT": scored(0.2, 0.4)}, START_TIME + HOUR_MS)
+
+    # A crash in the middle of the third append wrote some of its columns, but not the time column
+    partition_dir = os.path.join(str(tmp_path), day_of(START_TIME), "BTCUSDT")
+    with open(os.path.join(partition_dir, "rsi.bin"), "ab") as rsi_file:
+        np.array([0.3]).tofile(rsi_file)
+    assert len(log.read("BTCUSDT")) == 2
+
+    restarted_log = SignalLog(str(tmp_path))
+    restarted_log.append({"BTCUSDT": scored(0.4, 0.8)}, START_TIME + 2 * HOUR_MS)
+
+    np.testing.assert_allclose(restarted_log.read("BTCUSDT")["rsi"], [0.1, 0.2, 0.4])
+    assert os.path.getsize(os.path.join(partition_dir, "rsi.bin")) == 3 * 8
+
+
+def test_screened_out_pairs_are_logged(tmp_path):
+    pairs = [f"PAIR{seed}USDT" for seed in range(8)]
+    pairs_data = {pair: utils.parse_klines(generate_klines(START_TIME, 200, HOUR_MS, seed)) for seed, pair in enumerate(pairs)}
+    engine = SignalEngine("1h", screen_pairs=True)
+    # None of the random pairs can reach a strong signal, so only the kept pair passes the screen
+    confirmations_data, higher_confirmations_data = engine.evaluate(pairs_data, keep_pairs=pairs[:1])
+    scored_pairs = score_pairs(confirmations_data, higher_confirmations_data)
+    screened_rows = engine.screening_index.rows(pair for pair in pairs if pair not in scored_pairs)
+    assert list(scored_pairs) == pairs[:1] and sorted(screened_rows) == sorted(pairs[1:])
+
+    log = SignalLog(str(tmp_path))
+    log.append(scored_pairs, START_TIME, screened_rows=screened_rows)
+
+    # Every pair of the universe has a row, and the screened-out rows hold the values of the screen
+    assert sorted(log.pairs(day_of(START_TIME))) == sorted(pairs)
+    for pair in pairs:
+        row = log.read(pair).iloc[0]
+        assert row["screened_out"] == (pair in screened_rows)
+        if pair in screened_rows:
+            assert row["rsi"] == screened_rows[pair]["rsi"]
+            assert np.isnan(row.get("timeframe_agreement", np.nan))
+            assert abs(row["signal_type"]) < SIGNAL_TYPE_CODES["Strong Bullish"]
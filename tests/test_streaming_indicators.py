@@ -0,0 +1,110 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import utils
+from data.indicators.ichimoku import Ichimoku
+from data.indicators.keltner import keltner
+from data.indicators.macd import macd
+from data.indicators.rolling import Diff, EWMean, RollingMax, RollingMean, RollingMin, Shift, WilderMean
+from data.indicators.rsi import RSIStream, rsi
+from data.indicators.stochastic_osc import stochastic_osc
+from data.indicators.streaming import INDICATOR_STREAMS, IndicatorStream
+
+TIMEFRAME_MS = utils.timeframe_to_ms("1h")
+START_TIME = 1_700_000_000_000 // TIMEFRAME_MS * TIMEFRAME_MS
+
+
+def random_candles(n_candles: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_candles)))
+    high = close * (1 + np.abs(rng.normal(0, 0.005, n_candles)))
+    low = close * (1 - np.abs(rng.normal(0, 0.005, n_candles)))
+    # A few repeated values and gaps, which take the special cases of the rolling windows
+    close[40:45] = close[40]
+    high[70] = low[70] = close[70] = np.nan
+
+    return high, low, close
+
+
+def assert_same_values(peeked, updated):
+    np.testing.assert_array_equal(np.array(peeked, dtype=float), np.array(updated, dtype=float))
+
+
+@pytest.mark.parametrize("make_block", [lambda: RollingMax(5), lambda: RollingMin(5), lambda: RollingMean(5), lambda: EWMean(5),
+                                        lambda: WilderMean(5), lambda: Shift(3), lambda: Shift(0), lambda: Diff()])
+def test_rolling_peek_matches_update(make_block):
+    block = make_block()
+    _, _, close = random_candles(100)
+    for value in close:
+        # Peeking at an open value any number of times leaves the state as it was
+        for open_value in (value * 1.01, value):
+            assert_same_values(block.peek(open_value), copy.deepcopy(block).update(open_value))
+        assert_same_values(block.peek(value), block.update(value))
+
+
+@pytest.mark.parametrize("smoothing", ["sma", "wilder"])
+def test_rsi_stream_matches_batch_across_a_gap(smoothing):
+    _, _, close = random_candles(150)
+    stream = RSIStream(smoothing=smoothing)
+    streamed = [stream.update(value)["rsi"] for value in close]
+    batch = rsi(pd.DataFrame({"close": close}), smoothing=smoothing)["rsi"].to_numpy()
+
+    assert_same_values(streamed, batch)
+    if smoothing == "wilder":
+        # The changes from and to the NaN close are skipped, and the RSI goes on after the gap
+        assert np.isnan(batch[70:72]).all()
+        assert not np.isnan(batch[72:]).any()
+
+
+@pytest.mark.parametrize("name", INDICATOR_STREAMS)
+def test_indicator_peek_matches_update(name):
+    stream = INDICATOR_STREAMS[name]()
+    high, low, close = random_candles(150)
+    for i in range(len(close)):
+        candle = (high[i], low[i]) if name == "ichimoku" else (close[i],) if name in ("rsi", "macd") else (high[i], low[i], close[i])
+        peeked = stream.peek(*candle)
+        updated = stream.update(*candle)
+        assert peeked.keys() == updated.keys()
+        for column in updated:
+            assert_same_values(peeked[column], updated[column])
+
+
+def test_open_candle_does_not_change_the_state():
+    high, low, close = random_candles(150)
+    stream = IndicatorStream()
+    reference = IndicatorStream()
+    for i in range(len(close)):
+        # Every candle is first seen while still open, with other values than it closes with
+        open_row = stream.update(i, high[i] * 1.002, low[i], close[i] * 1.001, closed=False)
+        expected_open_row = copy.deepcopy(reference).update(i, high[i] * 1.002, low[i], close[i] * 1.001)
+        row = stream.update(i, high[i], low[i], close[i])
+        expected_row = reference.update(i, high[i], low[i], close[i])
+
+        for column in expected_row:
+            assert_same_values(open_row[column], expected_open_row[column])
+            assert_same_values(row[column], expected_row[column])
+
+
+def test_sync_matches_batch_indicators():
+    high, low, close = random_candles(200)
+    pair_df = pd.DataFrame({"time": pd.to_datetime(START_TIME + np.arange(200) * TIMEFRAME_MS, unit="ms", utc=True),
+                            "open": np.r_[close[0], close[:-1]], "high": high, "low": low, "close": close})
+    batch = pd.concat([Ichimoku(pd.DataFrame()).update_ichimoku_df(pair_df), rsi(pair_df), macd(pair_df), keltner(pair_df),
+                       stochastic_osc(pair_df)], axis=1).reset_index(drop=True)
+
+    stream = IndicatorStream(history_size=200)
+    # The first candles arrive in one sync, and the rest in a later one, while the last candle is still open
+    stream.sync(pair_df.iloc[:120], TIMEFRAME_MS, now_ms=START_TIME + 120 * TIMEFRAME_MS)
+    streamed = stream.sync(pair_df, TIMEFRAME_MS, now_ms=START_TIME + 199 * TIMEFRAME_MS + TIMEFRAME_MS // 2)
+    assert stream.open_candle is not None
+
+    # Same columns in the same order, and the same floats, across the gap at candle 70 and including the lagging span shifted from the future
+    assert list(streamed.columns) == list(batch.columns)
+    for column in batch:
+        assert_same_values(streamed[column], batch[column])
+    assert streamed["tenkan"].iloc[70:79].isna().all() and not np.isnan(streamed["tenkan"].iloc[79])
+    assert np.isnan(streamed["lagging_span"].iloc[70 - 26])
+    assert streamed["lagging_span"].iloc[-27] == close[-1] and streamed["lagging_span"].iloc[-26:].isna().all()